@@ -0,0 +1,129 @@
+"""
+Pluggable speech-to-text engines behind one interface.
+
+  whisper         openai-whisper on PyTorch (fp32 on CPU) — the original engine
+  faster-whisper  CTranslate2 Whisper, int8-quantized on CPU by default;
+                  several times faster on our GPU-less workers
+
+Loaded models live in model_registry under "<engine>:<size>" keys.
+
+Config (env):
+  VIRSA_ASR_ENGINE         whisper | faster-whisper (default whisper)
+  VIRSA_ASR_COMPUTE_TYPE   CTranslate2 compute type (default int8)
+  VIRSA_ASR_SIZE_BY_PLAN   plan:size list (default "free:base,family:base,legacy:small")
+  VIRSA_ASR_LONG_SEC       recordings longer than this drop one size (default 2700)
+"""
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+DEFAULT_ENGINE = "whisper"
+
+# Smallest → largest; used to step down for long recordings
+SIZE_LADDER = ["tiny", "base", "small", "medium", "large"]
+
+
+class TranscriptionBackend(ABC):
+    """Interface: load a model once, then decode many 16 kHz mono arrays with it."""
+
+    name = ""
+
+    @abstractmethod
+    def load(self, model_size: str, device: str) -> Any:
+        """Load and return a model; called once per (engine, size)."""
+
+    @abstractmethod
+    def decode(self, model: Any, audio: Any, task: str) -> List[Dict[str, Any]]:
+        """Return [{"start", "end", "text"}] with times relative to `audio`."""
+
+
+class WhisperTorchBackend(TranscriptionBackend):
+    name = "whisper"
+
+    def load(self, model_size: str, device: str) -> Any:
+        import whisper
+
+        return whisper.load_model(model_size, device=device)
+
+    def decode(self, model: Any, audio: Any, task: str) -> List[Dict[str, Any]]:
+        result = model.transcribe(audio, task=task)
+        return [
+            {"start": float(s["start"]), "end": float(s["end"]), "text": s["text"]}
+            for s in result.get("segments") or []
+        ]
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    name = "faster-whisper"
+
+    def __init__(self, compute_type: Optional[str] = None):
+        self.compute_type = compute_type or os.getenv("VIRSA_ASR_COMPUTE_TYPE", "int8")
+
+    def load(self, model_size: str, device: str) -> Any:
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(
+            model_size,
+            device=device,
+            compute_type=self.compute_type,
+            cpu_threads=int(os.getenv("VIRSA_ASR_THREADS", "0") or 0),
+        )
+
+    def decode(self, model: Any, audio: Any, task: str) -> List[Dict[str, Any]]:
+        segments, _info = model.transcribe(audio, task=task, beam_size=5)
+        # segments is a lazy generator — decoding happens while iterating
+        return [
+            {"start": float(s.start), "end": float(s.end), "text": s.text}
+            for s in segments
+        ]
+
+
+BACKENDS: Dict[str, TranscriptionBackend] = {
+    WhisperTorchBackend.name: WhisperTorchBackend(),
+    FasterWhisperBackend.name: FasterWhisperBackend(),
+}
+
+
+def get_backend(engine: Optional[str] = None) -> TranscriptionBackend:
+    name = (engine or os.getenv("VIRSA_ASR_ENGINE") or DEFAULT_ENGINE).strip().lower()
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown ASR engine '{name}' (have: {', '.join(BACKENDS)})")
+    return backend
+
+
+def model_key(engine: str, model_size: str) -> str:
+    return f"{engine}:{model_size}"
+
+
+def load_model_for_key(key: str, device: str) -> Any:
+    """model_registry loader: "<engine>:<size>" (bare sizes mean the whisper engine)."""
+    engine, _, size = key.rpartition(":")
+    return get_backend(engine or DEFAULT_ENGINE).load(size, device)
+
+
+def _plan_sizes() -> Dict[str, str]:
+    raw = os.getenv("VIRSA_ASR_SIZE_BY_PLAN", "free:base,family:base,legacy:small")
+    out: Dict[str, str] = {}
+    for part in raw.split(","):
+        plan, _, size = part.partition(":")
+        if plan.strip() and size.strip():
+            out[plan.strip().lower()] = size.strip()
+    return out
+
+
+def select_model_size(
+    plan: Optional[str] = None,
+    duration_sec: Optional[float] = None,
+    default: str = "base",
+) -> str:
+    """Pick a Whisper size from the vault plan, stepping down one size for very long audio."""
+    size = _plan_sizes().get((plan or "").lower(), default)
+    long_sec = float(os.getenv("VIRSA_ASR_LONG_SEC", "2700") or 0)
+    if duration_sec and long_sec and duration_sec > long_sec and size in SIZE_LADDER:
+        idx = SIZE_LADDER.index(size)
+        if idx > 1:  # never below base
+            size = SIZE_LADDER[idx - 1]
+    return size
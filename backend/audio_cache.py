@@ -0,0 +1,146 @@
+"""
+Decode-once PCM cache for uploaded recordings.
+
+Each media file is decoded by ffmpeg a single time into 16 kHz mono
+float32 samples stored as a .npy file named by the content hash. Every
+later reader — chunk planner, VAD, decode workers, retries, re-runs with a
+different model size — memory-maps that file instead of decoding again,
+and decode processes share the pages through the OS cache.
+
+Every open refreshes the file's mtime (prepare_pcm, the pipeline, and each
+chunk worker process as it maps its slice), so a file some job is still
+transcribing — in this process or another, e.g. bulk_import workers — stays
+inside the in-use window and is never pruned from under it.
+
+Config (env):
+  VIRSA_PCM_CACHE_DIR    default backend/cache/pcm
+  VIRSA_PCM_CACHE_MB     prune least recently used files past this (default 4096)
+  VIRSA_PCM_IN_USE_SEC   files opened within this many seconds are never pruned (default 900)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_DEFAULT_DIR = Path(__file__).resolve().parent / "cache" / "pcm"
+# One decode per hash even when two jobs upload the same file at once;
+# entries are [lock, holders] and dropped when the last holder leaves
+_decode_locks: Dict[str, List] = {}
+_decode_locks_guard = threading.Lock()
+
+
+@dataclass
+class PcmAsset:
+    checksum: str        # sha256 of the source file
+    path: str            # cached .npy (float32, mono, 16 kHz)
+    samples: int
+
+    @property
+    def duration_sec(self) -> float:
+        return self.samples / SAMPLE_RATE
+
+
+def _cache_dir() -> Path:
+    return Path(os.getenv("VIRSA_PCM_CACHE_DIR") or _DEFAULT_DIR)
+
+
+def file_checksum(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ffmpeg_decode(path: str) -> np.ndarray:
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')[-400:]}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+@contextmanager
+def _decode_lock(checksum: str) -> Iterator[None]:
+    with _decode_locks_guard:
+        entry = _decode_locks.setdefault(checksum, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _decode_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _decode_locks.pop(checksum, None)
+
+
+def prepare_pcm(path: str) -> PcmAsset:
+    """Return the cached PCM for `path`, decoding it on first use."""
+    checksum = file_checksum(path)
+    target = _cache_dir() / f"{checksum}.npy"
+    with _decode_lock(checksum):
+        if not target.exists():
+            audio = _ffmpeg_decode(path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f"{checksum}.{os.getpid()}.tmp.npy")
+            np.save(tmp, audio)
+            os.replace(tmp, target)
+            samples = len(audio)
+            print(f"[pcm] decoded {Path(path).name} → {samples / SAMPLE_RATE:.0f}s cached")
+            prune_cache()
+        else:
+            samples = len(open_pcm(str(target)))
+    return PcmAsset(checksum=checksum, path=str(target), samples=samples)
+
+
+def open_pcm(pcm_path: str) -> np.ndarray:
+    """Read-only memory map of a cached PCM file (no decode, no full read)."""
+    try:
+        os.utime(pcm_path)  # mtime = last use: LRU order and the in-use window
+    except OSError:
+        pass
+    return np.load(pcm_path, mmap_mode="r")
+
+
+def prune_cache() -> int:
+    limit = int(os.getenv("VIRSA_PCM_CACHE_MB", "4096") or 0) * 1024 * 1024
+    if limit <= 0:
+        return 0
+    try:
+        files = sorted(
+            ((p.stat(), p) for p in _cache_dir().glob("*.npy") if ".tmp" not in p.name),
+            key=lambda f: f[0].st_mtime,
+        )
+    except OSError:
+        return 0
+    total = sum(st.st_size for st, _ in files)
+    in_use_since = time.time() - float(os.getenv("VIRSA_PCM_IN_USE_SEC", "900") or 0)
+    removed = 0
+    for st, p in files[:-1]:  # never drop the newest (just written) file
+        if total <= limit or st.st_mtime >= in_use_since:
+            break  # oldest first: everything after this is in use too
+        try:
+            if p.stat().st_mtime >= in_use_since:
+                break  # opened since the listing
+            p.unlink()
+            total -= st.st_size
+            removed += 1
+        except OSError:
+            pass
+    return removed
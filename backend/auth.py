@@ -456,103 +456,73 @@ def set_vault_plan(vault_id: str, plan: str) -> bool:
             return cur.rowcount > 0
 
 
-def check_story_quota(vault_id: str) -> Dict[str, Any]:
-    with get_db_connection() as conn:
+_QUOTA_VAULT_SQL = "SELECT plan, story_limit FROM family_vaults WHERE id = %s"
+_QUOTA_USED_SQL = "SELECT COUNT(*) FROM stories WHERE vault_id = %s AND status = 'ready'"
+
+
+def _quota_result(plan: Optional[str], limit: Optional[int], used: int) -> Dict[str, Any]:
+    if limit is not None and used >= limit:
+        return {
+            "allowed": False,
+            "reason": f"{plan} plan limit reached ({used}/{limit} stories)",
+            "used": used,
+            "limit": limit,
+            "plan": plan,
+        }
+    return {
+        "allowed": True,
+        "used": used,
+        "limit": limit,
+        "plan": plan,
+    }
+
+
+def check_story_quota(vault_id: str, conn: Optional[Any] = None) -> Dict[str, Any]:
+    with get_db_connection(conn) as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT plan, story_limit FROM family_vaults WHERE id = %s",
-                (vault_id,),
-            )
+            cur.execute(_QUOTA_VAULT_SQL, (vault_id,))
             row = cur.fetchone()
             if not row:
                 return {"allowed": False, "reason": "Vault not found"}
-            plan, limit = row[0], row[1]
-            cur.execute(
-                """
-                SELECT COUNT(*) FROM stories
-                WHERE vault_id = %s AND status = 'ready'
-                """,
-                (vault_id,),
-            )
-            used = cur.fetchone()[0]
-            if limit is not None and used >= limit:
-                return {
-                    "allowed": False,
-                    "reason": f"{plan} plan limit reached ({used}/{limit} stories)",
-                    "used": used,
-                    "limit": limit,
-                    "plan": plan,
-                }
-            return {
-                "allowed": True,
-                "used": used,
-                "limit": limit,
-                "plan": plan,
-            }
+            cur.execute(_QUOTA_USED_SQL, (vault_id,))
+            return _quota_result(row[0], row[1], cur.fetchone()[0])
 
 
-def vault_dashboard_stats(vault_id: str) -> Dict[str, Any]:
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT name, plan, plan_status, kinship_system, story_limit, member_limit
-                FROM family_vaults WHERE id = %s
-                """,
-                (vault_id,),
-            )
-            v = cur.fetchone()
-            if not v:
-                raise ValueError("Vault not found")
+_DASHBOARD_VAULT_SQL = """
+    SELECT name, plan, plan_status, kinship_system, story_limit, member_limit
+    FROM family_vaults WHERE id = %s
+"""
 
-            def count(sql: str) -> int:
-                cur.execute(sql, (vault_id,))
-                return cur.fetchone()[0]
+_DASHBOARD_COUNT_SQL = {
+    "stories": "SELECT COUNT(*) FROM stories WHERE vault_id = %s AND status = 'ready'",
+    "people": "SELECT COUNT(*) FROM persons WHERE vault_id = %s",
+    "events": "SELECT COUNT(*) FROM timeline_events WHERE vault_id = %s AND status = 'confirmed'",
+    "artifacts": "SELECT COUNT(*) FROM artifacts WHERE vault_id = %s",
+    "shared_memories": "SELECT COUNT(*) FROM shared_memories WHERE vault_id = %s",
+    "members": "SELECT COUNT(*) FROM vault_members WHERE vault_id = %s",
+}
 
-            stories = count(
-                "SELECT COUNT(*) FROM stories WHERE vault_id = %s AND status = 'ready'"
-            )
-            people = count("SELECT COUNT(*) FROM persons WHERE vault_id = %s")
-            events = count(
-                "SELECT COUNT(*) FROM timeline_events WHERE vault_id = %s AND status = 'confirmed'"
-            )
-            artifacts = count("SELECT COUNT(*) FROM artifacts WHERE vault_id = %s")
-            shared = count("SELECT COUNT(*) FROM shared_memories WHERE vault_id = %s")
-            members = count("SELECT COUNT(*) FROM vault_members WHERE vault_id = %s")
+_DASHBOARD_RECENT_STORIES_SQL = """
+    SELECT id, title, summary, updated_at, status
+    FROM stories WHERE vault_id = %s
+    ORDER BY updated_at DESC NULLS LAST LIMIT 5
+"""
 
-            cur.execute(
-                """
-                SELECT id, title, summary, updated_at, status
-                FROM stories WHERE vault_id = %s
-                ORDER BY updated_at DESC NULLS LAST LIMIT 5
-                """,
-                (vault_id,),
-            )
-            recent_stories = [
-                {
-                    "id": str(r[0]),
-                    "title": r[1],
-                    "summary": r[2],
-                    "updated_at": r[3],
-                    "status": r[4],
-                }
-                for r in cur.fetchall()
-            ]
+_DASHBOARD_RECENT_EVENTS_SQL = """
+    SELECT year, title, person_id FROM timeline_events
+    WHERE vault_id = %s AND status = 'confirmed' AND year IS NOT NULL
+    ORDER BY year DESC LIMIT 8
+"""
 
-            cur.execute(
-                """
-                SELECT year, title, person_id FROM timeline_events
-                WHERE vault_id = %s AND status = 'confirmed' AND year IS NOT NULL
-                ORDER BY year DESC LIMIT 8
-                """,
-                (vault_id,),
-            )
-            recent_events = [
-                {"year": r[0], "title": r[1], "person_id": str(r[2])}
-                for r in cur.fetchall()
-            ]
 
-    quota = check_story_quota(vault_id)
+def _dashboard_result(
+    vault_id: str,
+    v: tuple,
+    counts: Dict[str, int],
+    story_rows: list,
+    event_rows: list,
+    quota: Dict[str, Any],
+) -> Dict[str, Any]:
     return {
         "vault": {
             "id": vault_id,
@@ -563,16 +533,43 @@ def vault_dashboard_stats(vault_id: str) -> Dict[str, Any]:
             "story_limit": v[4],
             "member_limit": v[5],
         },
-        "counts": {
-            "stories": stories,
-            "people": people,
-            "events": events,
-            "artifacts": artifacts,
-            "shared_memories": shared,
-            "members": members,
-        },
+        "counts": counts,
         "quota": quota,
-        "recent_stories": recent_stories,
-        "recent_events": recent_events,
+        "recent_stories": [
+            {
+                "id": str(r[0]),
+                "title": r[1],
+                "summary": r[2],
+                "updated_at": r[3],
+                "status": r[4],
+            }
+            for r in story_rows
+        ],
+        "recent_events": [
+            {"year": r[0], "title": r[1], "person_id": str(r[2])}
+            for r in event_rows
+        ],
         "plans": PLAN_LIMITS,
     }
+
+
+def vault_dashboard_stats(vault_id: str, conn: Optional[Any] = None) -> Dict[str, Any]:
+    with get_db_connection(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(_DASHBOARD_VAULT_SQL, (vault_id,))
+            v = cur.fetchone()
+            if not v:
+                raise ValueError("Vault not found")
+
+            counts = {}
+            for key, sql in _DASHBOARD_COUNT_SQL.items():
+                cur.execute(sql, (vault_id,))
+                counts[key] = cur.fetchone()[0]
+
+            cur.execute(_DASHBOARD_RECENT_STORIES_SQL, (vault_id,))
+            story_rows = cur.fetchall()
+            cur.execute(_DASHBOARD_RECENT_EVENTS_SQL, (vault_id,))
+            event_rows = cur.fetchall()
+
+        quota = check_story_quota(vault_id, conn)
+    return _dashboard_result(vault_id, v, counts, story_rows, event_rows, quota)
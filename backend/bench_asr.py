@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Benchmark transcription engines on the bundled audio fixtures.
+
+Reports model load time, decode real-time factor (decode seconds / audio
+seconds, lower is faster) and word error rate. WER is measured against
+audio_files/<name>.txt when a reference transcript exists, otherwise
+against the output of --reference (default: the last engine/size run).
+
+Usage (from backend/):
+  python bench_asr.py
+  python bench_asr.py --engines whisper,faster-whisper --sizes tiny,base,small
+  python bench_asr.py --files audio_files/harvard.wav --json bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from asr_backends import get_backend
+from transcription import SAMPLE_RATE, load_audio
+
+FIXTURES = Path(__file__).resolve().parent / "audio_files"
+AUDIO_EXTS = {".wav", ".mp3", ".webm", ".m4a", ".ogg", ".flac"}
+
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^a-z0-9' ]+", " ", (text or "").lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def run_config(engine: str, size: str, audio, task: str) -> Dict:
+    backend = get_backend(engine)
+    t0 = time.perf_counter()
+    model = backend.load(size, "cpu")
+    load_sec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    segments = backend.decode(model, audio, task)
+    decode_sec = time.perf_counter() - t0
+    return {
+        "load_sec": round(load_sec, 2),
+        "decode_sec": round(decode_sec, 2),
+        "text": "".join(s["text"] for s in segments).strip(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", default="whisper,faster-whisper")
+    parser.add_argument("--sizes", default="base")
+    parser.add_argument("--files", nargs="*", help="defaults to every file in audio_files/")
+    parser.add_argument("--task", default="translate")
+    parser.add_argument(
+        "--reference",
+        help="engine:size whose output is the WER reference when no .txt exists",
+    )
+    parser.add_argument("--json", help="write full results (incl. text) here")
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] if args.files else sorted(
+        p for p in FIXTURES.iterdir() if p.suffix.lower() in AUDIO_EXTS
+    )
+    configs: List[Tuple[str, str]] = [
+        (e.strip(), s.strip())
+        for e in args.engines.split(",") if e.strip()
+        for s in args.sizes.split(",") if s.strip()
+    ]
+    ref_config = args.reference or f"{configs[-1][0]}:{configs[-1][1]}"
+
+    results: List[Dict] = []
+    for path in files:
+        audio = load_audio(str(path))
+        duration = len(audio) / SAMPLE_RATE
+        ref_file = path.with_suffix(".txt")
+        per_file: Dict[str, Dict] = {}
+        for engine, size in configs:
+            name = f"{engine}:{size}"
+            try:
+                r = run_config(engine, size, audio, args.task)
+            except Exception as e:
+                print(f"  {path.name} {name}: skipped ({e})", file=sys.stderr)
+                continue
+            r["rtf"] = round(r["decode_sec"] / duration, 3) if duration else None
+            per_file[name] = r
+
+        if ref_file.exists():
+            reference, ref_label = ref_file.read_text(), ref_file.name
+        else:
+            reference = (per_file.get(ref_config) or {}).get("text")
+            ref_label = ref_config
+        for name, r in per_file.items():
+            r["wer"] = (
+                round(word_error_rate(reference, r["text"]), 3)
+                if reference is not None
+                else None
+            )
+            results.append(
+                {"file": path.name, "audio_sec": round(duration, 1), "config": name,
+                 "wer_reference": ref_label, **r}
+            )
+
+    header = f"{'file':<26}{'config':<24}{'audio s':>8}{'load s':>8}{'decode s':>10}{'RTF':>7}{'WER':>7}  ref"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        wer = "—" if r["wer"] is None else f"{r['wer']:.3f}"
+        print(
+            f"{r['file']:<26}{r['config']:<24}{r['audio_sec']:>8.1f}{r['load_sec']:>8.2f}"
+            f"{r['decode_sec']:>10.2f}{r['rtf']:>7.3f}{wer:>7}  {r['wer_reference']}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
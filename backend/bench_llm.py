@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Compare the three-pass and combined LLM flows on transcript fixtures.
+
+For each transcript, runs biography + extract + family both ways (cache
+bypassed) and reports wall time, Gemini calls, prompt/output tokens and
+how closely the combined extract agrees with the three-pass one (timeline
+event, place and family-member overlap).
+
+Transcripts come from --transcripts (.txt files) or are transcribed once
+from --audio (default: the life_story fixtures in audio_files/).
+
+Usage (from backend/):
+  python bench_llm.py
+  python bench_llm.py --transcripts story1.txt story2.txt --json llm_bench.json
+  VIRSA_LLM_PROVIDER=stub python bench_llm.py --transcripts story1.txt
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from llm_providers import get_provider
+from pipeline import (
+    _require_llm_key,
+    extract_combined,
+    extract_family_tree,
+    extract_key_data,
+    parse_text_gemini,
+    transcribe_audio,
+)
+
+FIXTURES = Path(__file__).resolve().parent / "audio_files"
+
+
+def _norm(value: Any) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", str(value or "").lower()))
+
+
+def _usage() -> Tuple[int, int, int]:
+    usage = get_provider().stats()
+    return usage["calls"], usage["prompt_tokens"], usage["output_tokens"]
+
+
+def _measure(fn) -> Tuple[Any, Dict[str, Any]]:
+    calls0, prompt0, out0 = _usage()
+    t0 = time.perf_counter()
+    result = fn()
+    wall = time.perf_counter() - t0
+    calls1, prompt1, out1 = _usage()
+    return result, {
+        "wall_sec": round(wall, 2),
+        "calls": calls1 - calls0,
+        "prompt_tokens": prompt1 - prompt0,
+        "output_tokens": out1 - out0,
+    }
+
+
+def _three_pass(transcript: str, api_key: str) -> Tuple[str, dict, list]:
+    biography = parse_text_gemini(transcript, api_key, use_cache=False)
+    extracted = extract_key_data(transcript, api_key, use_cache=False) or {}
+    storyteller = (extracted.get("person_info") or {}).get("name")
+    family = extract_family_tree(transcript, api_key, storyteller, use_cache=False)
+    return biography, extracted, family
+
+
+def _keys(extracted: dict, family: list) -> Dict[str, Set[str]]:
+    return {
+        "events": {
+            f"{e.get('year')}:{_norm(e.get('event'))}"
+            for e in extracted.get("timeline_events") or []
+        },
+        "places": {_norm(l.get("place")) for l in extracted.get("locations") or []},
+        "family": {
+            f"{_norm(m.get('name'))}:{m.get('relationship')}" for m in family or []
+        },
+    }
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float | None:
+    if not a and not b:
+        return None
+    return round(len(a & b) / len(a | b), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transcripts", nargs="*", help=".txt transcripts")
+    parser.add_argument("--audio", nargs="*", help="audio to transcribe first")
+    parser.add_argument("--json", help="write full results here")
+    args = parser.parse_args()
+
+    try:
+        api_key = _require_llm_key()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
+    inputs: List[Tuple[str, str]] = [
+        (Path(p).name, Path(p).read_text()) for p in args.transcripts or []
+    ]
+    if not args.transcripts:
+        audio = args.audio or [str(p) for p in sorted(FIXTURES.glob("life_story*"))]
+        for path in audio:
+            inputs.append((Path(path).name, transcribe_audio(path)))
+
+    results: List[Dict[str, Any]] = []
+    for name, transcript in inputs:
+        three, three_m = _measure(lambda: _three_pass(transcript, api_key))
+        combined, combined_m = _measure(
+            lambda: extract_combined(transcript, api_key, None, use_cache=False)
+        )
+        row: Dict[str, Any] = {
+            "file": name,
+            "chars": len(transcript),
+            "three_pass": three_m,
+            "combined": {**combined_m, "valid": combined is not None},
+        }
+        if combined is not None:
+            a, b = _keys(three[1], three[2]), _keys(combined[1], combined[2])
+            row["agreement"] = {k: _jaccard(a[k], b[k]) for k in a}
+            row["counts"] = {
+                "three_pass": {k: len(v) for k, v in a.items()},
+                "combined": {k: len(v) for k, v in b.items()},
+            }
+        results.append(row)
+
+    header = f"{'file':<26}{'mode':<12}{'wall s':>8}{'calls':>7}{'in tok':>9}{'out tok':>9}  agreement"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        for mode in ("three_pass", "combined"):
+            m = r[mode]
+            agree = ""
+            if mode == "combined":
+                agree = (
+                    " ".join(f"{k}={v}" for k, v in (r.get("agreement") or {}).items())
+                    if m.get("valid")
+                    else "invalid reply"
+                )
+            print(
+                f"{r['file']:<26}{mode:<12}{m['wall_sec']:>8.2f}{m['calls']:>7}"
+                f"{m['prompt_tokens']:>9}{m['output_tokens']:>9}  {agree}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Bulk-import an archive of recordings and transcripts into a vault.
+
+Takes a directory (audio files and .txt transcripts, searched recursively)
+or a manifest (.jsonl or .csv with a `path` column and optional
+`person_name`, `title`, `vault_id`, `kind`). Each item gets a story shell
+and a status-only job, then runs the regular pipeline (transcribe →
+biography/extract/family → finalize_story_processing) in a process pool.
+LLM calls from all workers share one semaphore, so --llm-concurrency bounds
+in-flight requests no matter how many workers are transcribing.
+
+Progress is appended to a JSONL state file keyed by file checksum and
+vault. Re-running the same command after a crash skips finished items and
+resumes interrupted or failed ones on their original story and job. An
+item logged as started whose story is already ready (its worker finished
+after the last state write) is recorded as done, not re-run. The
+pipeline's per-job checkpoints mean a finished transcript or LLM pass is
+not redone, and finalize refuses to write a job's graph rows twice.
+
+A .txt next to an audio file with the same stem is treated as that
+recording's reference transcript and not imported on its own.
+
+Usage (from backend/):
+  python bulk_import.py /archive/recordings --workers 4 --llm-concurrency 8
+  python bulk_import.py manifest.csv --state import.state.jsonl --vault <vault-id>
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from audio_cache import file_checksum
+from db.db_operations import (
+    DEFAULT_VAULT_ID,
+    add_media_asset,
+    create_processing_job,
+    create_story_shell,
+    get_processing_status,
+    reset_processing_job,
+)
+
+AUDIO_EXTS = {".wav", ".mp3", ".webm", ".m4a", ".ogg", ".flac"}
+TRANSCRIPT_EXTS = {".txt"}
+
+
+# ---- inputs ----------------------------------------------------------------
+def _scan_dir(root: Path) -> Iterator[Dict[str, Any]]:
+    files = sorted(p for p in root.rglob("*") if p.is_file())
+    audio_stems = {p.with_suffix("") for p in files if p.suffix.lower() in AUDIO_EXTS}
+    for path in files:
+        ext = path.suffix.lower()
+        if ext in AUDIO_EXTS:
+            yield {"path": str(path), "kind": "audio"}
+        elif ext in TRANSCRIPT_EXTS and path.with_suffix("") not in audio_stems:
+            yield {"path": str(path), "kind": "transcript"}
+
+
+def _read_manifest(manifest: Path) -> Iterator[Dict[str, Any]]:
+    with open(manifest, newline="") as f:
+        if manifest.suffix.lower() == ".csv":
+            rows: Iterator[Dict[str, Any]] = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            row = {k: v for k, v in row.items() if v not in (None, "")}
+            if not row.get("path"):
+                continue
+            path = Path(row["path"])
+            if not path.is_absolute():
+                path = manifest.parent / path
+            row["path"] = str(path)
+            if not row.get("kind"):
+                row["kind"] = "transcript" if path.suffix.lower() in TRANSCRIPT_EXTS else "audio"
+            yield row
+
+
+def load_items(source: str) -> Iterator[Dict[str, Any]]:
+    path = Path(source)
+    if path.is_dir():
+        return _scan_dir(path)
+    return _read_manifest(path)
+
+
+# ---- resumable state -------------------------------------------------------
+class ImportState:
+    """Append-only JSONL log; the last line per key wins."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.items: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    self.items[entry["key"]] = entry
+        self._fh = open(path, "a")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.items.get(key)
+
+    def record(self, key: str, **fields: Any) -> None:
+        entry = {**(self.items.get(key) or {}), **fields, "key": key, "at": time.time()}
+        self.items[key] = entry
+        self._fh.write(json.dumps(entry) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+# ---- worker process --------------------------------------------------------
+def _init_worker(llm_slots) -> None:
+    from pipeline import set_llm_slots
+
+    set_llm_slots(llm_slots)
+
+
+def _run_item(job: Dict[str, Any]) -> Dict[str, Any]:
+    from job_queue import run_job
+
+    t0 = time.perf_counter()
+    run_job(job)
+    status = get_processing_status(job["story_id"]) or {}
+    return {
+        "ok": status.get("status") == "ready",
+        "error": status.get("job_error") or status.get("error_message"),
+        "sec": round(time.perf_counter() - t0, 1),
+    }
+
+
+# ---- driver ----------------------------------------------------------------
+def _finished_unrecorded(prev: Optional[Dict[str, Any]]) -> bool:
+    """A "started" item whose worker completed before the parent could log it."""
+    if not (prev and prev.get("status") == "started" and prev.get("story_id")):
+        return False
+    status = get_processing_status(prev["story_id"]) or {}
+    return status.get("status") == "ready" or status.get("stage") == "completed"
+
+
+def _start_item(item: Dict[str, Any], prev: Optional[Dict[str, Any]], vault_id: str,
+                auto_confirm: bool) -> Optional[Dict[str, Any]]:
+    """Create (or reuse) the story shell and job; returns the job for run_job."""
+    path = Path(item["path"])
+    payload: Dict[str, Any] = {
+        "person_name_hint": item.get("person_name"),
+        "auto_confirm": auto_confirm,
+    }
+    if item["kind"] == "transcript":
+        payload["transcript"] = path.read_text(encoding="utf-8", errors="replace")
+    else:
+        payload["audio_path"] = str(path.resolve())
+
+    if prev and prev.get("story_id") and prev.get("job_id"):
+        story_id, job_id = prev["story_id"], prev["job_id"]
+        reset_processing_job(job_id)
+    else:
+        story_id = create_story_shell(
+            vault_id=vault_id,
+            title=item.get("title") or item.get("person_name") or path.stem,
+        )
+        if not story_id:
+            return None
+        if item["kind"] == "audio":
+            add_media_asset(
+                story_id=story_id,
+                storage_path=payload["audio_path"],
+                byte_size=path.stat().st_size,
+            )
+        # No payload: a status record the API's queue workers will not claim
+        job_id = create_processing_job(story_id, kind=item["kind"])
+        if not job_id:
+            return None
+    return {"story_id": story_id, "job_id": job_id, "kind": item["kind"], "payload": payload}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="directory of recordings/transcripts, or a .jsonl/.csv manifest")
+    parser.add_argument("--state", help="resume log (default: <source>.import-state.jsonl)")
+    parser.add_argument("--vault", default=DEFAULT_VAULT_ID, help="vault for items without vault_id")
+    parser.add_argument("--workers", type=int, default=2, help="pipeline processes")
+    parser.add_argument("--llm-concurrency", type=int, default=4,
+                        help="max in-flight LLM calls across all workers")
+    parser.add_argument("--no-auto-confirm", action="store_true",
+                        help="leave extracted relationships as suggestions")
+    parser.add_argument("--skip-failed", action="store_true",
+                        help="do not retry items that failed in an earlier run")
+    parser.add_argument("--limit", type=int, help="stop after starting this many items")
+    args = parser.parse_args()
+
+    from pipeline import _require_llm_key
+
+    try:
+        _require_llm_key()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
+    source = Path(args.source).resolve()
+    state_path = Path(args.state) if args.state else source.with_name(source.name + ".import-state.jsonl")
+    state = ImportState(state_path)
+    workers = max(1, args.workers)
+
+    # Spawn, not fork: workers must not inherit the parent's DB pool or model threads
+    ctx = mp.get_context("spawn")
+    llm_slots = ctx.BoundedSemaphore(max(1, args.llm_concurrency))
+
+    counts = {"done": 0, "failed": 0, "skipped": 0, "started": 0}
+    seen: set = set()
+    pending: Dict[Any, Dict[str, Any]] = {}
+    items = load_items(str(source))
+    t0 = time.perf_counter()
+
+    def _finish(future) -> None:
+        info = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"ok": False, "error": f"worker crashed: {e}"}
+        status = "done" if result["ok"] else "failed"
+        counts[status] += 1
+        state.record(info["key"], status=status, error=None if result["ok"] else result.get("error"),
+                     sec=result.get("sec"))
+        print(
+            f"[bulk] {status} {info['path']} story={info['story_id']} "
+            f"({counts['done']} done, {counts['failed']} failed, {len(pending)} running, "
+            f"{time.perf_counter() - t0:.0f}s)"
+            + (f": {result.get('error')}" if not result["ok"] else "")
+        )
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(llm_slots,)
+    )
+    try:
+        for item in items:
+            if args.limit is not None and counts["started"] >= args.limit:
+                break
+            path = Path(item["path"])
+            if not path.exists():
+                print(f"[bulk] missing {path}")
+                counts["failed"] += 1
+                continue
+            vault_id = item.get("vault_id") or args.vault
+            key = f"{vault_id}:{file_checksum(str(path))}"
+            prev = state.get(key)
+            if key in seen or (prev and (
+                prev.get("status") == "done"
+                or (prev.get("status") == "failed" and args.skip_failed)
+            )):
+                counts["skipped"] += 1
+                continue
+            seen.add(key)
+            if _finished_unrecorded(prev):
+                counts["done"] += 1
+                state.record(key, status="done", error=None)
+                print(f"[bulk] done {path} story={prev['story_id']} (finished in an earlier run)")
+                continue
+
+            # Bounded in-flight work: shells are created only as slots free up
+            while len(pending) >= workers * 2:
+                finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    _finish(future)
+
+            job = _start_item(item, prev, vault_id, not args.no_auto_confirm)
+            if job is None:
+                print(f"[bulk] could not create story for {path}")
+                counts["failed"] += 1
+                continue
+            state.record(key, path=str(path), status="started",
+                         story_id=job["story_id"], job_id=job["job_id"])
+            counts["started"] += 1
+            pending[pool.submit(_run_item, job)] = {
+                "key": key, "path": str(path), "story_id": job["story_id"],
+            }
+
+        while pending:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in finished:
+                _finish(future)
+    except KeyboardInterrupt:
+        print("\n[bulk] interrupted; re-run the same command to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit(130)
+    finally:
+        pool.shutdown(wait=True)
+        state.close()
+
+    print(
+        f"[bulk] finished in {time.perf_counter() - t0:.0f}s: {counts['done']} done, "
+        f"{counts['failed']} failed, {counts['skipped']} skipped (state: {state_path})"
+    )
+
+
+if __name__ == "__main__":
+    main()
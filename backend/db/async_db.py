@@ -0,0 +1,231 @@
+"""
+Async read path for the API's hot read endpoints (/family, /master-timeline,
+/story/{id}/full, /archive/search, /dashboard).
+
+Runs the same SQL and row mappers as db_operations / auth on a psycopg 3
+AsyncConnectionPool, so a request waiting on Postgres holds no threadpool
+slot and results have the same dict shapes as the sync functions. Reads that
+need several statements send them in one pipeline (one round trip).
+Connections are autocommit: these are reads only, so no BEGIN/COMMIT round
+trips. Writes stay on the sync psycopg2 pool in db_connection.
+
+The pool is opened on API startup and closed on shutdown. Its connections
+come on top of the sync pool's VIRSA_DB_POOL_MAX, so count both against the
+server's max_connections.
+
+Config (env):
+  VIRSA_DB_ASYNC_POOL_MIN    connections kept open (default 2)
+  VIRSA_DB_ASYNC_POOL_MAX    connections per process (default 10)
+  VIRSA_DB_POOL_TIMEOUT_SEC  max wait for a free connection (default 10, shared with the sync pool)
+  VIRSA_DB_MAX_LIFETIME_SEC  recycle connections older than this (default 1800, shared)
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from auth import (
+    _DASHBOARD_COUNT_SQL,
+    _DASHBOARD_RECENT_EVENTS_SQL,
+    _DASHBOARD_RECENT_STORIES_SQL,
+    _DASHBOARD_VAULT_SQL,
+    _dashboard_result,
+    _quota_result,
+)
+from metrics import observe_db
+
+from .db_connection import DB_CONFIG, _env_float
+from .db_operations import (
+    DEFAULT_VAULT_ID,
+    _ARCHIVE_SEARCH_KEYS,
+    _FAMILY_PERSONS_SQL,
+    _FAMILY_RELATIONSHIPS_SQL,
+    _FAMILY_VAULT_SQL,
+    _PERSON_OCCUPATIONS_SQL,
+    _PERSON_PLACES_SQL,
+    _STORY_FULL_SQL,
+    _STORY_THEMES_SQL,
+    _archive_search_queries,
+    _assemble_family_graph,
+    _empty_family_graph,
+    _family_person_row,
+    _family_relationship_row,
+    _master_timeline_query,
+    _master_timeline_row,
+    _occupation_row,
+    _person_timeline_sql,
+    _place_row,
+    _story_full_row,
+    _timeline_event_row,
+)
+
+_pool: Optional[AsyncConnectionPool] = None
+
+
+def _get_pool() -> AsyncConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            make_conninfo(**DB_CONFIG),
+            min_size=max(0, int(os.getenv("VIRSA_DB_ASYNC_POOL_MIN", "2"))),
+            max_size=max(1, int(os.getenv("VIRSA_DB_ASYNC_POOL_MAX", "10"))),
+            timeout=_env_float("VIRSA_DB_POOL_TIMEOUT_SEC", 10),
+            max_lifetime=_env_float("VIRSA_DB_MAX_LIFETIME_SEC", 1800),
+            kwargs={"autocommit": True},
+            check=AsyncConnectionPool.check_connection,
+            name="virsa-async",
+            open=False,
+        )
+    return _pool
+
+
+async def open_async_pool() -> None:
+    await _get_pool().open()
+
+
+async def close_async_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    if _pool is None:
+        return {"open": False}
+    return {"open": True, **_pool.get_stats()}
+
+
+@asynccontextmanager
+async def _connection(op: str):
+    """Pooled connection for one read; the block is timed as virsa_db_seconds{op}."""
+    started = time.perf_counter()
+    pool = _get_pool()
+    await pool.open()  # no-op once open; covers use before the startup hook
+    try:
+        async with pool.connection() as conn:
+            yield conn
+    finally:
+        observe_db(op, time.perf_counter() - started)
+
+
+# ---------------------------------------------------------------------------
+# Reads (same shapes as the db_operations / auth functions of the same name)
+# ---------------------------------------------------------------------------
+async def get_story_full(story_id: str) -> Optional[Dict]:
+    try:
+        async with _connection("get_story_full") as conn:
+            cur = await conn.execute(_STORY_FULL_SQL, (story_id,))
+            row = await cur.fetchone()
+            if not row:
+                return None
+
+            story_obj = _story_full_row(row)
+            subject_id = story_obj["subject_person_id"]
+            async with conn.pipeline():
+                if subject_id:
+                    events = await conn.execute(
+                        _person_timeline_sql(confirmed_only=False), (subject_id,)
+                    )
+                    occupations = await conn.execute(_PERSON_OCCUPATIONS_SQL, (subject_id,))
+                    places = await conn.execute(_PERSON_PLACES_SQL, (subject_id,))
+                themes = await conn.execute(_STORY_THEMES_SQL, (story_id,))
+            if subject_id:
+                story_obj["timeline_events"] = [
+                    _timeline_event_row(r) for r in await events.fetchall()
+                ]
+                story_obj["occupations"] = [_occupation_row(r) for r in await occupations.fetchall()]
+                story_obj["locations"] = [_place_row(r) for r in await places.fetchall()]
+            story_obj["themes"] = [
+                {"id": str(r[0]), "name": r[1]} for r in await themes.fetchall()
+            ]
+            return story_obj
+    except Exception as e:
+        print(f"Error retrieving story (async): {e}")
+        return None
+
+
+async def get_master_timeline(
+    vault_id: str = DEFAULT_VAULT_ID,
+    person_ids: Optional[List[str]] = None,
+) -> List[Dict]:
+    try:
+        async with _connection("get_master_timeline") as conn:
+            cur = await conn.execute(*_master_timeline_query(vault_id, person_ids))
+            return [_master_timeline_row(r) for r in await cur.fetchall()]
+    except Exception as e:
+        print(f"Error retrieving master timeline (async): {e}")
+        return []
+
+
+async def get_family_graph(
+    vault_id: str = DEFAULT_VAULT_ID,
+    viewpoint_person_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    try:
+        async with _connection("get_family_graph") as conn:
+            async with conn.pipeline():
+                vault = await conn.execute(_FAMILY_VAULT_SQL, (vault_id,))
+                persons = await conn.execute(_FAMILY_PERSONS_SQL, (vault_id,))
+                relationships = await conn.execute(_FAMILY_RELATIONSHIPS_SQL, (vault_id,))
+            vault_row = await vault.fetchone()
+            person_rows = await persons.fetchall()
+            relationship_rows = await relationships.fetchall()
+        return _assemble_family_graph(
+            vault_id,
+            vault_row,
+            [_family_person_row(r) for r in person_rows],
+            [_family_relationship_row(r) for r in relationship_rows],
+            viewpoint_person_id,
+        )
+    except Exception as e:
+        print("Error get_family_graph (async):", e)
+        return _empty_family_graph()
+
+
+async def search_archive(
+    query: str, vault_id: str = DEFAULT_VAULT_ID, limit: int = 40
+) -> Dict[str, List]:
+    q = (query or "").strip()
+    if not q:
+        return {key: [] for key in _ARCHIVE_SEARCH_KEYS}
+
+    try:
+        queries = _archive_search_queries(q, vault_id, limit)
+        async with _connection("search_archive") as conn:
+            async with conn.pipeline():
+                cursors = [await conn.execute(sql, params) for _, sql, params, _ in queries]
+            results: Dict[str, Any] = {"query": q}
+            for (key, _, _, to_dict), cur in zip(queries, cursors):
+                results[key] = [to_dict(r) for r in await cur.fetchall()]
+        return results
+    except Exception as e:
+        print("Error search_archive (async):", e)
+        return {"query": q, **{key: [] for key in _ARCHIVE_SEARCH_KEYS}}
+
+
+async def vault_dashboard_stats(vault_id: str) -> Dict[str, Any]:
+    async with _connection("vault_dashboard_stats") as conn:
+        async with conn.pipeline():
+            vault = await conn.execute(_DASHBOARD_VAULT_SQL, (vault_id,))
+            count_cursors = {
+                key: await conn.execute(sql, (vault_id,))
+                for key, sql in _DASHBOARD_COUNT_SQL.items()
+            }
+            stories = await conn.execute(_DASHBOARD_RECENT_STORIES_SQL, (vault_id,))
+            events = await conn.execute(_DASHBOARD_RECENT_EVENTS_SQL, (vault_id,))
+        v = await vault.fetchone()
+        if not v:
+            raise ValueError("Vault not found")
+        counts = {key: (await cur.fetchone())[0] for key, cur in count_cursors.items()}
+        story_rows = await stories.fetchall()
+        event_rows = await events.fetchall()
+
+    # check_story_quota's inputs are already here: plan, story_limit and the ready-story count
+    quota = _quota_result(v[1], v[4], counts["stories"])
+    return _dashboard_result(vault_id, v, counts, story_rows, event_rows, quota)
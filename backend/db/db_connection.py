@@ -1,12 +1,32 @@
 """
 Database connection and utility functions for VirsaAI.
+
+One thread-safe pool per process is shared by FastAPI's threadpool, queue
+workers and pipeline threads. Connections are checked on checkout (closed,
+broken, or idle long enough to need a ping), recycled after a maximum
+lifetime, and a checkout waits for a free connection up to a timeout instead
+of failing or resetting the whole pool.
+
+Config (env):
+  VIRSA_DB_POOL_MAX            connections per process (default: VIRSA_DB_CONNECTION_BUDGET
+                               / VIRSA_DB_PROCESSES when both are set, else 20)
+  VIRSA_DB_CONNECTION_BUDGET   total connections all processes may open (e.g. max_connections - reserve)
+  VIRSA_DB_PROCESSES           API + worker processes sharing that budget
+  VIRSA_DB_POOL_TIMEOUT_SEC    max wait for a free connection (default 10)
+  VIRSA_DB_MAX_LIFETIME_SEC    recycle connections older than this (default 1800)
+  VIRSA_DB_PING_IDLE_SEC       ping connections idle longer than this on checkout (default 30)
 """
 import os
+import sys
+import threading
+import time
 import psycopg2
-from psycopg2 import pool
+from psycopg2 import extensions, pool
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from metrics import DB_CHECKOUT_SECONDS, DB_POOL_EVENTS, observe_db
+
 # Load environment variables
 load_dotenv()
 
@@ -21,39 +41,227 @@ DB_CONFIG = {
     "port": os.getenv("POSTGRES_PORT", "5433"),  # Default to 5433 for localhost
 }
 
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _pool_max() -> int:
+    explicit = os.getenv("VIRSA_DB_POOL_MAX")
+    if explicit:
+        return max(1, int(explicit))
+    budget = int(os.getenv("VIRSA_DB_CONNECTION_BUDGET", "0") or 0)
+    processes = int(os.getenv("VIRSA_DB_PROCESSES", "0") or 0)
+    if budget and processes:
+        return max(1, budget // processes)
+    return 20
+
+
+class PoolTimeout(pool.PoolError):
+    """No connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with checkout health checks, recycling and bounded waits."""
+
+    def __init__(self, maxconn: int, timeout: float, max_lifetime: float, ping_idle: float, **dsn):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_idle = ping_idle
+        self.pid = os.getpid()
+        self._dsn = dsn
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, created_at, returned_at)], most recently returned last
+        self._born = {}  # id(conn) -> created_at, for checked-out connections
+        self._size = 0
+        self._waiting = 0
+        self.counters = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "broken": 0,
+        }
+
+    # ---- checkout --------------------------------------------------------
+    def getconn(self, timeout=None):
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        started = time.perf_counter()
+        while True:
+            with self._cond:
+                candidate = None
+                while candidate is None:
+                    if self._idle:
+                        candidate = self._idle.pop()
+                    elif self._size < self.maxconn:
+                        self._size += 1  # reserve the slot; connect outside the lock
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._count("timeouts")
+                            raise PoolTimeout(
+                                f"no database connection free within {self.timeout:g}s "
+                                f"({self._size}/{self.maxconn} in use)"
+                            )
+                        self._waiting += 1
+                        try:
+                            self._cond.wait(remaining)
+                        finally:
+                            self._waiting -= 1
+
+            if candidate is None:
+                try:
+                    conn = psycopg2.connect(**self._dsn)
+                except Exception:
+                    self._release_slot()
+                    raise
+                return self._checked_out(conn, time.monotonic(), started, created=True)
+
+            conn, born, returned = candidate
+            reason = self._unusable(conn, born, returned)
+            if reason is None:
+                return self._checked_out(conn, born, started)
+            self._close(conn)
+            self._release_slot(reason)
+
+    def _checked_out(self, conn, born, started, created=False):
+        with self._cond:
+            self._born[id(conn)] = born
+            self._count("checkouts")
+            if created:
+                self._count("created")
+        DB_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+        return conn
+
+    def _unusable(self, conn, born, returned):
+        now = time.monotonic()
+        if conn.closed:
+            return "broken"
+        if self.max_lifetime and now - born > self.max_lifetime:
+            return "recycled"
+        if self.ping_idle and now - returned > self.ping_idle:
+            # One round trip, only for connections that sat idle (server or NAT may have dropped them)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return "broken"
+        return None
+
+    def _release_slot(self, reason=None) -> None:
+        with self._cond:
+            self._size -= 1
+            if reason:
+                self._count(reason)
+            self._cond.notify()
+
+    def _count(self, event: str) -> None:
+        # Called with the lock held
+        self.counters[event] += 1
+        DB_POOL_EVENTS.inc(event=event)
+
+    # ---- return ----------------------------------------------------------
+    def putconn(self, conn, discard: bool = False) -> None:
+        with self._cond:
+            born = self._born.pop(id(conn), time.monotonic())
+        if not conn.closed and not discard:
+            if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+        if conn.closed or discard:
+            self._close(conn)
+            self._release_slot("broken")
+        elif self.max_lifetime and time.monotonic() - born > self.max_lifetime:
+            self._close(conn)
+            self._release_slot("recycled")
+        else:
+            with self._cond:
+                self._idle.append((conn, born, time.monotonic()))
+                self._cond.notify()
+
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def closeall(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            in_use = self._size - len(self._idle)
+            return {
+                **self.counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "waiting": self._waiting,
+                "max": self.maxconn,
+                "utilization": round(in_use / self.maxconn, 3),
+            }
+
+
 _connection_pool = None
+_pool_lock = threading.Lock()
 
 
 def get_connection_pool():
-    """Initialize and return a connection pool."""
+    """The process's connection pool (a forked child gets its own)."""
     global _connection_pool
-    if _connection_pool is None:
-        try:
-            _connection_pool = psycopg2.pool.SimpleConnectionPool(
-                1, 20, **DB_CONFIG
-            )
-        except Exception as e:
-            print(f"Error creating connection pool: {e}")
-            return None
-    return _connection_pool
+    pool_obj = _connection_pool
+    if pool_obj is None or pool_obj.pid != os.getpid():
+        with _pool_lock:
+            if _connection_pool is None or _connection_pool.pid != os.getpid():
+                _connection_pool = ConnectionPool(
+                    maxconn=_pool_max(),
+                    timeout=_env_float("VIRSA_DB_POOL_TIMEOUT_SEC", 10),
+                    max_lifetime=_env_float("VIRSA_DB_MAX_LIFETIME_SEC", 1800),
+                    ping_idle=_env_float("VIRSA_DB_PING_IDLE_SEC", 30),
+                    **DB_CONFIG,
+                )
+            pool_obj = _connection_pool
+    return pool_obj
 
 
 @contextmanager
-def get_db_connection():
+def get_db_connection(conn=None):
     """
     Context manager for database connections.
     Automatically commits or rolls back transactions.
+    The block is timed as virsa_db_seconds, labelled with the calling function.
+
+    Passing `conn` (a request's unit_of_work) joins that connection's
+    transaction instead: nothing is committed or rolled back here, the owner
+    commits once at the end.
     """
+    # Frames: this generator, contextlib's __enter__, then the db_operations caller
+    op = sys._getframe(2).f_code.co_name
+    started = time.perf_counter()
+    if conn is not None:
+        try:
+            yield conn
+        finally:
+            observe_db(op, time.perf_counter() - started)
+        return
     pool_obj = get_connection_pool()
-    conn = None
-    from_pool = False
+    conn = pool_obj.getconn()
+    broken = False
     try:
-        if pool_obj is not None:
-            conn = pool_obj.getconn()
-            from_pool = True
-        else:
-            conn = psycopg2.connect(**DB_CONFIG)
-
         try:
             yield conn
             conn.commit()
@@ -61,33 +269,25 @@ def get_db_connection():
             try:
                 conn.rollback()
             except Exception:
-                pass
+                broken = True
             raise
     finally:
-        if conn is None:
-            return
-        if from_pool and pool_obj is not None:
-            try:
-                pool_obj.putconn(conn)
-            except Exception as e:
-                # Pool can get into a bad state after aborted connections;
-                # close and drop the pool so the next request recreates it.
-                print(f"Pool return error (resetting pool): {e}")
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-                try:
-                    pool_obj.closeall()
-                except Exception:
-                    pass
-                global _connection_pool
-                _connection_pool = None
-        else:
-            try:
-                conn.close()
-            except Exception:
-                pass
+        pool_obj.putconn(conn, discard=broken or conn.closed)
+        observe_db(op, time.perf_counter() - started)
+
+
+def unit_of_work():
+    """
+    FastAPI dependency: one pooled connection per request. db_operations
+    functions given it share its transaction, committed once when the
+    request finishes (rolled back if it raises).
+    """
+    with get_db_connection() as conn:
+        yield conn
+
+
+def pool_stats():
+    return get_connection_pool().stats()
 
 
 def close_all_connections():
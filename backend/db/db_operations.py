@@ -5,8 +5,11 @@ from __future__ import annotations
 
 import json
 import re
+import uuid
 from typing import Any, Dict, List, Optional, Tuple
 
+from psycopg2.extras import execute_values
+
 from .db_connection import get_db_connection
 
 DEFAULT_VAULT_ID = "00000000-0000-0000-0000-000000000001"
@@ -15,6 +18,8 @@ DEFAULT_VAULT_ID = "00000000-0000-0000-0000-000000000001"
 TREE_DISPLAY_TYPES = frozenset({"parent", "spouse"})
 # Edges kept for editing + kinship (siblings inferred from shared parents too).
 TREE_STRUCTURAL_TYPES = frozenset({"parent", "child", "spouse", "sibling"})
+# Rows per statement for multi-row INSERTs (execute_values)
+_BULK_PAGE_SIZE = 500
 
 
 
@@ -136,6 +141,70 @@ def get_or_create_person_by_name(
     )
 
 
+def resolve_persons_by_name(cur, vault_id: str, people: List[Dict[str, Any]]) -> List[str]:
+    """
+    get_or_create_person_by_name for a whole story's members in two statements.
+
+    `people` are dicts with display_name and optional birth_year, death_year,
+    birth_place, notes. All names are looked up in one query (the case-folded
+    match uses idx_persons_vault_lower_name). The missing ones are created in
+    one multi-row INSERT. Returns person ids in input order. A name repeated
+    in `people` resolves to one person, created from its first occurrence.
+    """
+    names = [(p.get("display_name") or "Unknown").strip() or "Unknown" for p in people]
+    if not names:
+        return []
+    unique = list(dict.fromkeys(names))
+    cur.execute(
+        """
+        SELECT n.name, p.id
+        FROM unnest(%s::text[]) AS n(name)
+        JOIN LATERAL (
+            SELECT id FROM persons
+            WHERE vault_id = %s AND lower(display_name) = lower(n.name)
+            ORDER BY created_at
+            LIMIT 1
+        ) p ON true
+        """,
+        (unique, vault_id),
+    )
+    ids: Dict[str, str] = {row[0]: str(row[1]) for row in cur.fetchall()}
+
+    # Same-name variants in this batch ("Ravi", "RAVI") share one new person
+    by_folded = {name.lower(): pid for name, pid in ids.items()}
+    new_rows = []
+    for name, person in zip(names, people):
+        if name in ids:
+            continue
+        pid = by_folded.get(name.lower())
+        if pid is None:
+            pid = by_folded[name.lower()] = str(uuid.uuid4())
+            new_rows.append(
+                (
+                    pid,
+                    vault_id,
+                    name,
+                    person.get("birth_year"),
+                    person.get("death_year"),
+                    person.get("birth_place"),
+                    person.get("notes"),
+                )
+            )
+        ids[name] = pid
+    if new_rows:
+        execute_values(
+            cur,
+            """
+            INSERT INTO persons (
+                id, vault_id, display_name, birth_year, death_year, birth_place, notes
+            ) VALUES %s
+            """,
+            new_rows,
+            page_size=_BULK_PAGE_SIZE,
+        )
+    return [ids[name] for name in names]
+
+
 def _insert_relationship(
     cur,
     vault_id: str,
@@ -554,63 +623,70 @@ def get_story(story_id: str) -> Optional[Dict]:
         return None
 
 
+_STORY_FULL_SQL = """
+    SELECT s.id, s.vault_id, s.subject_person_id, s.title, s.status,
+           s.transcript, s.biography, s.summary, s.extracted_data,
+           s.created_at, s.updated_at,
+           p.display_name, p.birth_year, p.birth_place, p.death_year
+    FROM stories s
+    LEFT JOIN persons p ON p.id = s.subject_person_id
+    WHERE s.id = %s
+"""
+
+_STORY_THEMES_SQL = """
+    SELECT t.id, t.name FROM themes t
+    JOIN story_themes st ON st.theme_id = t.id
+    WHERE st.story_id = %s
+"""
+
+
+def _story_full_row(row) -> Dict[str, Any]:
+    """Story fields of get_story_full; person-scoped lists are added by the caller."""
+    subject_id = row[2]
+    story_obj: Dict[str, Any] = {
+        "id": str(row[0]),
+        "vault_id": str(row[1]),
+        "subject_person_id": _as_str(subject_id),
+        "title": row[3],
+        "status": row[4],
+        "person_name": row[11] or row[3] or "Unknown",
+        "raw_body": row[5],
+        "story": row[6],
+        "summary": row[7],
+        "extracted_data": _loads(row[8]),
+        "created_at": row[9],
+        "updated_at": row[10],
+    }
+    if subject_id:
+        story_obj["person"] = {
+            "id": str(subject_id),
+            "name": row[11],
+            "birth_year": row[12],
+            "birth_place": row[13],
+            "death_year": row[14],
+        }
+    return story_obj
+
+
 def get_story_full(story_id: str) -> Optional[Dict]:
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT s.id, s.vault_id, s.subject_person_id, s.title, s.status,
-                           s.transcript, s.biography, s.summary, s.extracted_data,
-                           s.created_at, s.updated_at,
-                           p.display_name, p.birth_year, p.birth_place, p.death_year
-                    FROM stories s
-                    LEFT JOIN persons p ON p.id = s.subject_person_id
-                    WHERE s.id = %s
-                    """,
-                    (story_id,),
-                )
+                cur.execute(_STORY_FULL_SQL, (story_id,))
                 row = cur.fetchone()
                 if not row:
                     return None
 
-                subject_id = row[2]
-                story_obj: Dict[str, Any] = {
-                    "id": str(row[0]),
-                    "vault_id": str(row[1]),
-                    "subject_person_id": _as_str(subject_id),
-                    "title": row[3],
-                    "status": row[4],
-                    "person_name": row[11] or row[3] or "Unknown",
-                    "raw_body": row[5],
-                    "story": row[6],
-                    "summary": row[7],
-                    "extracted_data": _loads(row[8]),
-                    "created_at": row[9],
-                    "updated_at": row[10],
-                }
+                story_obj = _story_full_row(row)
+                subject_id = story_obj["subject_person_id"]
                 if subject_id:
-                    story_obj["person"] = {
-                        "id": str(subject_id),
-                        "name": row[11],
-                        "birth_year": row[12],
-                        "birth_place": row[13],
-                        "death_year": row[14],
-                    }
                     story_obj["timeline_events"] = _fetch_timeline_for_person(
-                        cur, str(subject_id), confirmed_only=False
+                        cur, subject_id, confirmed_only=False
                     )
-                    story_obj["occupations"] = _fetch_occupations(cur, str(subject_id))
-                    story_obj["locations"] = _fetch_places(cur, str(subject_id))
+                    story_obj["occupations"] = _fetch_occupations(cur, subject_id)
+                    story_obj["locations"] = _fetch_places(cur, subject_id)
 
-                cur.execute(
-                    """
-                    SELECT t.id, t.name FROM themes t
-                    JOIN story_themes st ON st.theme_id = t.id
-                    WHERE st.story_id = %s
-                    """,
-                    (story_id,),
-                )
+                cur.execute(_STORY_THEMES_SQL, (story_id,))
                 story_obj["themes"] = [
                     {"id": str(r[0]), "name": r[1]} for r in cur.fetchall()
                 ]
@@ -1003,81 +1079,87 @@ def get_all_people(vault_id: str = DEFAULT_VAULT_ID) -> List[Dict]:
         return []
 
 
+_PERSON_TIMELINE_SQL = """
+    SELECT id, year, title, description, place, category, created_at,
+           source_story_id, status, confidence
+    FROM timeline_events
+    WHERE person_id = %s {clause}
+    ORDER BY year NULLS LAST, created_at
+"""
+
+_PERSON_OCCUPATIONS_SQL = """
+    SELECT id, role, start_year, end_year, location, created_at
+    FROM occupations WHERE person_id = %s AND status = 'confirmed'
+    ORDER BY start_year NULLS LAST
+"""
+
+_PERSON_PLACES_SQL = """
+    SELECT id, place, start_year, end_year, purpose, created_at
+    FROM places WHERE person_id = %s AND status = 'confirmed'
+    ORDER BY start_year NULLS LAST
+"""
+
+
+def _person_timeline_sql(confirmed_only: bool = True) -> str:
+    return _PERSON_TIMELINE_SQL.format(
+        clause="AND status = 'confirmed'" if confirmed_only else ""
+    )
+
+
+def _timeline_event_row(row) -> Dict:
+    return {
+        "id": str(row[0]),
+        "year": row[1],
+        "event": row[2],
+        "title": row[2],
+        "description": row[3],
+        "location": row[4],
+        "place": row[4],
+        "category": row[5],
+        "created_at": row[6],
+        "source_story_id": _as_str(row[7]),
+        "status": row[8],
+        "confidence": row[9],
+    }
+
+
+def _occupation_row(r) -> Dict:
+    return {
+        "id": str(r[0]),
+        "role": r[1],
+        "start_year": r[2],
+        "end_year": r[3],
+        "location": r[4],
+        "created_at": r[5],
+    }
+
+
+def _place_row(r) -> Dict:
+    return {
+        "id": str(r[0]),
+        "place": r[1],
+        "start_year": r[2],
+        "end_year": r[3],
+        "purpose": r[4],
+        "created_at": r[5],
+    }
+
+
 def _fetch_timeline_for_person(
     cur, person_id: str, confirmed_only: bool = True
 ) -> List[Dict]:
-    clause = "AND status = 'confirmed'" if confirmed_only else ""
-    cur.execute(
-        f"""
-        SELECT id, year, title, description, place, category, created_at,
-               source_story_id, status, confidence
-        FROM timeline_events
-        WHERE person_id = %s {clause}
-        ORDER BY year NULLS LAST, created_at
-        """,
-        (person_id,),
-    )
-    return [
-        {
-            "id": str(row[0]),
-            "year": row[1],
-            "event": row[2],
-            "title": row[2],
-            "description": row[3],
-            "location": row[4],
-            "place": row[4],
-            "category": row[5],
-            "created_at": row[6],
-            "source_story_id": _as_str(row[7]),
-            "status": row[8],
-            "confidence": row[9],
-        }
-        for row in cur.fetchall()
-    ]
+    cur.execute(_person_timeline_sql(confirmed_only), (person_id,))
+    return [_timeline_event_row(row) for row in cur.fetchall()]
 
 
 def _fetch_occupations(cur, person_id: str) -> List[Dict]:
-    cur.execute(
-        """
-        SELECT id, role, start_year, end_year, location, created_at
-        FROM occupations WHERE person_id = %s AND status = 'confirmed'
-        ORDER BY start_year NULLS LAST
-        """,
-        (person_id,),
-    )
-    return [
-        {
-            "id": str(r[0]),
-            "role": r[1],
-            "start_year": r[2],
-            "end_year": r[3],
-            "location": r[4],
-            "created_at": r[5],
-        }
-        for r in cur.fetchall()
-    ]
+    cur.execute(_PERSON_OCCUPATIONS_SQL, (person_id,))
+    return [_occupation_row(r) for r in cur.fetchall()]
 
 
 def _fetch_places(cur, person_id: str) -> List[Dict]:
-    cur.execute(
-        """
-        SELECT id, place, start_year, end_year, purpose, created_at
-        FROM places WHERE person_id = %s AND status = 'confirmed'
-        ORDER BY start_year NULLS LAST
-        """,
-        (person_id,),
-    )
-    return [
-        {
-            "id": str(r[0]),
-            "place": r[1],
-            "start_year": r[2],
-            "end_year": r[3],
-            "purpose": r[4],
-            "created_at": r[5],
-        }
-        for r in cur.fetchall()
-    ]
+    cur.execute(_PERSON_PLACES_SQL, (person_id,))
+    return [_place_row(r) for r in cur.fetchall()]
 
 
 def get_timeline_events(story_or_person_id: str) -> Dict:
@@ -1125,6 +1207,44 @@ def get_timeline_events(story_or_person_id: str) -> Dict:
         return empty
 
 
+_MASTER_TIMELINE_SQL = """
+    SELECT te.id, te.year, te.title, te.description, te.place,
+           te.category, te.person_id, p.display_name,
+           te.source_story_id, te.created_at
+    FROM timeline_events te
+    JOIN persons p ON p.id = te.person_id
+    WHERE te.vault_id = %s AND te.status = 'confirmed' {person_filter}
+    ORDER BY te.year NULLS LAST, te.created_at
+"""
+
+
+def _master_timeline_query(
+    vault_id: str, person_ids: Optional[List[str]]
+) -> Tuple[str, tuple]:
+    if person_ids:
+        return (
+            _MASTER_TIMELINE_SQL.format(person_filter="AND te.person_id = ANY(%s::uuid[])"),
+            (vault_id, list(person_ids)),
+        )
+    return _MASTER_TIMELINE_SQL.format(person_filter=""), (vault_id,)
+
+
+def _master_timeline_row(r) -> Dict:
+    return {
+        "id": str(r[0]),
+        "year": r[1],
+        "event": r[2],
+        "title": r[2],
+        "description": r[3],
+        "location": r[4],
+        "category": r[5],
+        "person_id": str(r[6]),
+        "person_name": r[7],
+        "source_story_id": _as_str(r[8]),
+        "created_at": r[9],
+    }
+
+
 def get_master_timeline(
     vault_id: str = DEFAULT_VAULT_ID,
     person_ids: Optional[List[str]] = None,
@@ -1133,49 +1253,8 @@ def get_master_timeline(
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                if person_ids:
-                    cur.execute(
-                        """
-                        SELECT te.id, te.year, te.title, te.description, te.place,
-                               te.category, te.person_id, p.display_name,
-                               te.source_story_id, te.created_at
-                        FROM timeline_events te
-                        JOIN persons p ON p.id = te.person_id
-                        WHERE te.vault_id = %s AND te.status = 'confirmed'
-                          AND te.person_id = ANY(%s::uuid[])
-                        ORDER BY te.year NULLS LAST, te.created_at
-                        """,
-                        (vault_id, person_ids),
-                    )
-                else:
-                    cur.execute(
-                        """
-                        SELECT te.id, te.year, te.title, te.description, te.place,
-                               te.category, te.person_id, p.display_name,
-                               te.source_story_id, te.created_at
-                        FROM timeline_events te
-                        JOIN persons p ON p.id = te.person_id
-                        WHERE te.vault_id = %s AND te.status = 'confirmed'
-                        ORDER BY te.year NULLS LAST, te.created_at
-                        """,
-                        (vault_id,),
-                    )
-                return [
-                    {
-                        "id": str(r[0]),
-                        "year": r[1],
-                        "event": r[2],
-                        "title": r[2],
-                        "description": r[3],
-                        "location": r[4],
-                        "category": r[5],
-                        "person_id": str(r[6]),
-                        "person_name": r[7],
-                        "source_story_id": _as_str(r[8]),
-                        "created_at": r[9],
-                    }
-                    for r in cur.fetchall()
-                ]
+                cur.execute(*_master_timeline_query(vault_id, person_ids))
+                return [_master_timeline_row(r) for r in cur.fetchall()]
     except Exception as e:
         print(f"Error retrieving master timeline: {e}")
         return []
@@ -1184,6 +1263,150 @@ def get_master_timeline(
 # ---------------------------------------------------------------------------
 # Family tree: persons + relationships
 # ---------------------------------------------------------------------------
+_FAMILY_VAULT_SQL = """
+    SELECT kinship_system, cultural_context, name
+    FROM family_vaults WHERE id = %s
+"""
+
+_FAMILY_PERSONS_SQL = """
+    SELECT id, display_name, birth_year, death_year, notes,
+           birth_place, sex
+    FROM persons WHERE vault_id = %s ORDER BY display_name
+"""
+
+_FAMILY_RELATIONSHIPS_SQL = """
+    SELECT id, from_person_id, to_person_id, type, certainty,
+           source_story_id, notes, cultural_label
+    FROM relationships WHERE vault_id = %s
+"""
+
+
+def _empty_family_graph() -> Dict[str, Any]:
+    return {
+        "vault": None,
+        "viewpoint_person_id": None,
+        "persons": [],
+        "relationships": [],
+        "members": [],
+    }
+
+
+def _family_person_row(r) -> Dict[str, Any]:
+    return {
+        "id": str(r[0]),
+        "name": r[1],
+        "birth_year": r[2],
+        "death_year": r[3],
+        "notes": r[4],
+        "birth_place": r[5],
+        "sex": r[6],
+        "relationship": None,
+        "story_id": None,
+        "kinship_label": None,
+    }
+
+
+def _family_relationship_row(r) -> Dict[str, Any]:
+    return {
+        "id": str(r[0]),
+        "from_person_id": str(r[1]),
+        "to_person_id": str(r[2]),
+        "type": r[3],
+        "certainty": r[4],
+        "source_story_id": _as_str(r[5]),
+        "notes": r[6],
+        "cultural_label": r[7],
+    }
+
+
+def _assemble_family_graph(
+    vault_id: str,
+    vault_row: Optional[tuple],
+    persons: List[Dict[str, Any]],
+    relationships: List[Dict[str, Any]],
+    viewpoint_person_id: Optional[str],
+) -> Dict[str, Any]:
+    """Kinship labels + display edges over rows already read (no DB access)."""
+    kinship_system = (vault_row[0] if vault_row else None) or "punjabi"
+    cultural_context = (vault_row[1] if vault_row else None) or "punjabi"
+    vault_name = vault_row[2] if vault_row else "Family Vault"
+
+    # Cultural kinship labels from sparse pedigree (parent/spouse/sibling)
+    ego = viewpoint_person_id or (persons[0]["id"] if persons else None)
+    if ego:
+        try:
+            from kinship import label_all_relatives
+
+            edges = _structural_edges_for_kinship(relationships)
+            sex_norm: Dict[str, str] = {}
+            birth_years: Dict[str, Optional[int]] = {}
+            for p in persons:
+                birth_years[p["id"]] = p.get("birth_year")
+                raw_sex = (p.get("sex") or "").lower().strip()
+                if raw_sex in ("m", "male", "man"):
+                    sex_norm[p["id"]] = "male"
+                elif raw_sex in ("f", "female", "woman"):
+                    sex_norm[p["id"]] = "female"
+                else:
+                    # Punjabi / Sikh name heuristics when sex not stored
+                    name = (p.get("name") or "").lower()
+                    if any(
+                        t in name.split()
+                        for t in ("kaur", "kaur,", "begum", "devi")
+                    ) or name.endswith(" kaur"):
+                        sex_norm[p["id"]] = "female"
+                    elif any(
+                        t in name.split()
+                        for t in ("singh", "singh,", "kumar")
+                    ) or name.endswith(" singh"):
+                        sex_norm[p["id"]] = "male"
+
+            labels = label_all_relatives(
+                kinship_system,
+                ego,
+                [p["id"] for p in persons],
+                edges,
+                sex_norm,
+                birth_years,
+            )
+            for p in persons:
+                p["kinship_label"] = labels.get(p["id"])
+                if p["id"] != ego:
+                    p["relationship"] = p["kinship_label"]
+        except Exception as ke:
+            print("Kinship labeling skipped:", ke)
+
+    # Only return pedigree edges (parent / spouse / sibling). Canvas draws
+    # parent+spouse; edit UI can still change sibling links.
+    display_relationships = []
+    for r in relationships:
+        t = (r.get("type") or "").lower()
+        if t == "child":
+            display_relationships.append(
+                {
+                    **r,
+                    "from_person_id": r["to_person_id"],
+                    "to_person_id": r["from_person_id"],
+                    "type": "parent",
+                }
+            )
+        elif t in TREE_STRUCTURAL_TYPES:
+            display_relationships.append(r)
+
+    return {
+        "vault": {
+            "id": vault_id,
+            "name": vault_name,
+            "kinship_system": kinship_system,
+            "cultural_context": cultural_context,
+        },
+        "viewpoint_person_id": ego,
+        "persons": persons,
+        "relationships": display_relationships,
+        "members": persons,
+    }
+
+
 def get_family_graph(
     vault_id: str = DEFAULT_VAULT_ID,
     viewpoint_person_id: Optional[str] = None,
@@ -1191,146 +1414,18 @@ def get_family_graph(
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT kinship_system, cultural_context, name
-                    FROM family_vaults WHERE id = %s
-                    """,
-                    (vault_id,),
-                )
+                cur.execute(_FAMILY_VAULT_SQL, (vault_id,))
                 vault_row = cur.fetchone()
-                kinship_system = (vault_row[0] if vault_row else None) or "punjabi"
-                cultural_context = (vault_row[1] if vault_row else None) or "punjabi"
-                vault_name = vault_row[2] if vault_row else "Family Vault"
-
-                cur.execute(
-                    """
-                    SELECT id, display_name, birth_year, death_year, notes,
-                           birth_place, sex
-                    FROM persons WHERE vault_id = %s ORDER BY display_name
-                    """,
-                    (vault_id,),
-                )
-                persons = [
-                    {
-                        "id": str(r[0]),
-                        "name": r[1],
-                        "birth_year": r[2],
-                        "death_year": r[3],
-                        "notes": r[4],
-                        "birth_place": r[5],
-                        "sex": r[6],
-                        "relationship": None,
-                        "story_id": None,
-                        "kinship_label": None,
-                    }
-                    for r in cur.fetchall()
-                ]
-                cur.execute(
-                    """
-                    SELECT id, from_person_id, to_person_id, type, certainty,
-                           source_story_id, notes, cultural_label
-                    FROM relationships WHERE vault_id = %s
-                    """,
-                    (vault_id,),
-                )
-                relationships = [
-                    {
-                        "id": str(r[0]),
-                        "from_person_id": str(r[1]),
-                        "to_person_id": str(r[2]),
-                        "type": r[3],
-                        "certainty": r[4],
-                        "source_story_id": _as_str(r[5]),
-                        "notes": r[6],
-                        "cultural_label": r[7],
-                    }
-                    for r in cur.fetchall()
-                ]
-
-        # Cultural kinship labels from sparse pedigree (parent/spouse/sibling)
-        ego = viewpoint_person_id or (persons[0]["id"] if persons else None)
-        if ego:
-            try:
-                from kinship import label_all_relatives
-
-                edges = _structural_edges_for_kinship(relationships)
-                sex_norm: Dict[str, str] = {}
-                birth_years: Dict[str, Optional[int]] = {}
-                for p in persons:
-                    birth_years[p["id"]] = p.get("birth_year")
-                    raw_sex = (p.get("sex") or "").lower().strip()
-                    if raw_sex in ("m", "male", "man"):
-                        sex_norm[p["id"]] = "male"
-                    elif raw_sex in ("f", "female", "woman"):
-                        sex_norm[p["id"]] = "female"
-                    else:
-                        # Punjabi / Sikh name heuristics when sex not stored
-                        name = (p.get("name") or "").lower()
-                        if any(
-                            t in name.split()
-                            for t in ("kaur", "kaur,", "begum", "devi")
-                        ) or name.endswith(" kaur"):
-                            sex_norm[p["id"]] = "female"
-                        elif any(
-                            t in name.split()
-                            for t in ("singh", "singh,", "kumar")
-                        ) or name.endswith(" singh"):
-                            sex_norm[p["id"]] = "male"
-
-                labels = label_all_relatives(
-                    kinship_system,
-                    ego,
-                    [p["id"] for p in persons],
-                    edges,
-                    sex_norm,
-                    birth_years,
-                )
-                for p in persons:
-                    p["kinship_label"] = labels.get(p["id"])
-                    if p["id"] != ego:
-                        p["relationship"] = p["kinship_label"]
-            except Exception as ke:
-                print("Kinship labeling skipped:", ke)
-
-        # Only return pedigree edges (parent / spouse / sibling). Canvas draws
-        # parent+spouse; edit UI can still change sibling links.
-        display_relationships = []
-        for r in relationships:
-            t = (r.get("type") or "").lower()
-            if t == "child":
-                display_relationships.append(
-                    {
-                        **r,
-                        "from_person_id": r["to_person_id"],
-                        "to_person_id": r["from_person_id"],
-                        "type": "parent",
-                    }
-                )
-            elif t in TREE_STRUCTURAL_TYPES:
-                display_relationships.append(r)
-
-        return {
-            "vault": {
-                "id": vault_id,
-                "name": vault_name,
-                "kinship_system": kinship_system,
-                "cultural_context": cultural_context,
-            },
-            "viewpoint_person_id": ego,
-            "persons": persons,
-            "relationships": display_relationships,
-            "members": persons,
-        }
+                cur.execute(_FAMILY_PERSONS_SQL, (vault_id,))
+                persons = [_family_person_row(r) for r in cur.fetchall()]
+                cur.execute(_FAMILY_RELATIONSHIPS_SQL, (vault_id,))
+                relationships = [_family_relationship_row(r) for r in cur.fetchall()]
+        return _assemble_family_graph(
+            vault_id, vault_row, persons, relationships, viewpoint_person_id
+        )
     except Exception as e:
         print("Error get_family_graph:", e)
-        return {
-            "vault": None,
-            "viewpoint_person_id": None,
-            "persons": [],
-            "relationships": [],
-            "members": [],
-        }
+        return _empty_family_graph()
 
 
 def get_all_family_members(vault_id: str = DEFAULT_VAULT_ID) -> List[Dict]:
@@ -1731,16 +1826,17 @@ def reject_suggestion(suggestion_id: str) -> bool:
 
 
 # ---------------------------------------------------------------------------
-# Media / jobs helpers (for upcoming upload pipeline)
+# Media / jobs helpers (upload pipeline + job queue)
 # ---------------------------------------------------------------------------
 def create_story_shell(
     vault_id: str = DEFAULT_VAULT_ID,
     title: Optional[str] = None,
     subject_person_id: Optional[str] = None,
     contributor_id: Optional[str] = None,
+    conn: Optional[Any] = None,
 ) -> Optional[str]:
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(conn) as conn:
             with conn.cursor() as cur:
                 ensure_default_vault(cur)
                 cur.execute(
@@ -1765,9 +1861,10 @@ def add_media_asset(
     byte_size: Optional[int] = None,
     duration_sec: Optional[float] = None,
     bucket: Optional[str] = None,
+    conn: Optional[Any] = None,
 ) -> Optional[str]:
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(conn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -1784,69 +1881,588 @@ def add_media_asset(
         return None
 
 
-def create_processing_job(story_id: str) -> Optional[str]:
+def update_media_asset_audio(
+    story_id: str,
+    storage_path: str,
+    duration_sec: Optional[float],
+    checksum: Optional[str] = None,
+) -> bool:
+    """Fill in decoded duration (and content hash) once the pipeline has read the file."""
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    INSERT INTO processing_jobs (story_id, stage, progress, started_at)
-                    VALUES (%s, 'queued', 0, NOW())
-                    RETURNING id
+                    UPDATE media_assets
+                    SET duration_sec = %s,
+                        checksum = COALESCE(%s, checksum)
+                    WHERE story_id = %s AND storage_path = %s
                     """,
-                    (story_id,),
+                    (duration_sec, checksum, story_id, storage_path),
                 )
-                return str(cur.fetchone()[0])
+                return cur.rowcount > 0
     except Exception as e:
-        print("Error create_processing_job:", e)
-        return None
+        print("Error update_media_asset_audio:", e)
+        return False
 
 
-def update_processing_job(
-    job_id: str,
-    stage: Optional[str] = None,
-    progress: Optional[float] = None,
-    error: Optional[str] = None,
-) -> bool:
+def create_processing_job(
+    story_id: str,
+    kind: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    conn: Optional[Any] = None,
+) -> Optional[str]:
+    """
+    Create a job row. With a payload the job is enqueued for the worker pool
+    (see job_queue.py); without one it is only a status record. Higher
+    priority jobs are claimed first. With `conn` the job only becomes visible
+    to workers once the caller commits.
+    """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(conn) as conn:
             with conn.cursor() as cur:
-                updates = []
-                vals: List[Any] = []
-                if stage is not None:
-                    updates.append("stage = %s::job_stage")
-                    vals.append(stage)
-                    if stage in ("completed", "failed"):
-                        updates.append("finished_at = NOW()")
-                if progress is not None:
-                    updates.append("progress = %s")
-                    vals.append(progress)
-                if error is not None:
-                    updates.append("error = %s")
-                    vals.append(error)
-                if not updates:
-                    return False
-                vals.append(job_id)
                 cur.execute(
-                    f"UPDATE processing_jobs SET {', '.join(updates)} WHERE id = %s",
-                    vals,
+                    """
+                    INSERT INTO processing_jobs (
+                        story_id, stage, progress, started_at, kind, payload, priority
+                    ) VALUES (%s, 'queued', 0, NOW(), %s, %s::jsonb, %s)
+                    RETURNING id
+                    """,
+                    (story_id, kind or "audio", _json(payload), priority),
                 )
-                return cur.rowcount > 0
+                return str(cur.fetchone()[0])
     except Exception as e:
-        print("Error update_processing_job:", e)
-        return False
+        print("Error create_processing_job:", e)
+        return None
 
 
-def mark_story_failed(story_id: str, error_message: str) -> bool:
-    """Set story status to failed and store the error message."""
+def claim_processing_job(worker_id: str, lease_sec: int) -> Optional[Dict]:
+    """
+    Lease the highest-priority, then oldest, claimable job to `worker_id`.
+
+    Claimable = has a payload, not terminal, and no live lease (new jobs and
+    jobs whose worker died). SKIP LOCKED lets many workers poll concurrently.
+    queue_wait_sec is the time since the job was last touched (enqueued,
+    requeued, or its dead worker's final lease renewal).
+    """
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    UPDATE stories
-                    SET status = 'failed'::story_status,
-                        error_message = %s,
+                    WITH next AS (
+                        SELECT id, updated_at FROM processing_jobs
+                        WHERE payload IS NOT NULL
+                          AND stage NOT IN ('completed', 'failed')
+                          AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                          AND attempts < max_attempts
+                        ORDER BY priority DESC, created_at
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT 1
+                    )
+                    UPDATE processing_jobs j
+                    SET leased_by = %s,
+                        lease_expires_at = NOW() + make_interval(secs => %s),
+                        attempts = j.attempts + 1,
+                        claimed_at = NOW(),
+                        started_at = NOW()
+                    FROM next
+                    WHERE j.id = next.id
+                    RETURNING j.id, j.story_id, j.kind, j.payload, j.attempts,
+                              EXTRACT(EPOCH FROM NOW() - next.updated_at)
+                    """,
+                    (worker_id, lease_sec),
+                )
+                row = cur.fetchone()
+                if not row:
+                    return None
+                return {
+                    "job_id": str(row[0]),
+                    "story_id": str(row[1]),
+                    "kind": row[2],
+                    "payload": _loads(row[3]) or {},
+                    "attempts": row[4],
+                    "queue_wait_sec": max(0.0, float(row[5] or 0)),
+                }
+    except Exception as e:
+        print("Error claim_processing_job:", e)
+        return None
+
+
+def renew_job_lease(job_id: str, worker_id: str, lease_sec: int) -> bool:
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE processing_jobs
+                    SET lease_expires_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s AND leased_by = %s
+                    """,
+                    (lease_sec, job_id, worker_id),
+                )
+                return cur.rowcount > 0
+    except Exception as e:
+        print("Error renew_job_lease:", e)
+        return False
+
+
+def release_job_lease(job_id: str, worker_id: str) -> bool:
+    """Drop the lease; a non-terminal job becomes claimable again immediately."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE processing_jobs
+                    SET leased_by = NULL, lease_expires_at = NULL
+                    WHERE id = %s AND leased_by = %s
+                    """,
+                    (job_id, worker_id),
+                )
+                return cur.rowcount > 0
+    except Exception as e:
+        print("Error release_job_lease:", e)
+        return False
+
+
+def fail_abandoned_jobs() -> int:
+    """Fail jobs whose lease expired after their last allowed attempt."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    WITH dead AS (
+                        UPDATE processing_jobs
+                        SET stage = 'failed'::job_stage,
+                            progress = 1,
+                            error = 'Processing was interrupted too many times',
+                            finished_at = NOW(),
+                            leased_by = NULL,
+                            lease_expires_at = NULL
+                        WHERE payload IS NOT NULL
+                          AND stage NOT IN ('completed', 'failed')
+                          AND lease_expires_at < NOW()
+                          AND attempts >= max_attempts
+                        RETURNING story_id
+                    )
+                    UPDATE stories
+                    SET status = 'failed'::story_status,
+                        error_message = 'Processing was interrupted too many times',
+                        updated_at = NOW()
+                    WHERE id IN (SELECT story_id FROM dead)
+                    """
+                )
+                return cur.rowcount
+    except Exception as e:
+        print("Error fail_abandoned_jobs:", e)
+        return 0
+
+
+def get_queue_depth() -> Dict[str, Any]:
+    """Queued = claimable by claim_processing_job; running = live lease."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT
+                        COUNT(*) FILTER (
+                            WHERE (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                              AND attempts < max_attempts
+                        ),
+                        COUNT(*) FILTER (WHERE lease_expires_at >= NOW()),
+                        MIN(created_at) FILTER (
+                            WHERE (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                              AND attempts < max_attempts
+                        )
+                    FROM processing_jobs
+                    WHERE payload IS NOT NULL
+                      AND stage NOT IN ('completed', 'failed')
+                    """
+                )
+                row = cur.fetchone()
+                return {
+                    "queued": int(row[0] or 0),
+                    "running": int(row[1] or 0),
+                    "oldest_queued_at": row[2],
+                }
+    except Exception as e:
+        print("Error get_queue_depth:", e)
+        return {"queued": None, "running": None, "oldest_queued_at": None}
+
+
+def take_rate_tokens(
+    name: str,
+    amount: float,
+    capacity: float,
+    refill_per_sec: float,
+) -> Optional[float]:
+    """
+    Refill bucket `name` for the time elapsed, then take `amount` from it.
+
+    Returns the balance after the take (negative = caller must wait
+    -balance / refill_per_sec seconds), or None if the database is unreachable.
+    A negative `amount` returns tokens (refunds).
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO llm_rate_buckets (name, tokens)
+                    VALUES (%s, %s)
+                    ON CONFLICT (name) DO NOTHING
+                    """,
+                    (name, capacity),
+                )
+                cur.execute(
+                    """
+                    UPDATE llm_rate_buckets
+                    SET tokens = LEAST(
+                            %s,
+                            tokens + GREATEST(
+                                0, EXTRACT(EPOCH FROM clock_timestamp() - updated_at)
+                            ) * %s
+                        ) - %s,
+                        updated_at = clock_timestamp()
+                    WHERE name = %s
+                    RETURNING tokens
+                    """,
+                    (capacity, refill_per_sec, amount, name),
+                )
+                row = cur.fetchone()
+                return float(row[0]) if row else None
+    except Exception as e:
+        print("Error take_rate_tokens:", e)
+        return None
+
+
+def update_processing_job(
+    job_id: str,
+    stage: Optional[str] = None,
+    progress: Optional[float] = None,
+    error: Optional[str] = None,
+    eta_sec: Optional[float] = None,
+    notifications: Optional[List[Tuple[str, str]]] = None,
+) -> bool:
+    """
+    Write a job's stage/progress/ETA/error. `notifications` ((channel,
+    payload) pairs) are sent with pg_notify in the same transaction.
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                updates = []
+                vals: List[Any] = []
+                if stage is not None:
+                    updates.append("stage = %s::job_stage")
+                    vals.append(stage)
+                    if stage in ("completed", "failed"):
+                        updates.append("finished_at = NOW()")
+                        updates.append("eta_at = NULL")
+                if progress is not None:
+                    updates.append("progress = %s")
+                    vals.append(progress)
+                if eta_sec is not None:
+                    updates.append("eta_at = NOW() + make_interval(secs => %s)")
+                    vals.append(eta_sec)
+                if error is not None:
+                    updates.append("error = %s")
+                    vals.append(error)
+                if not updates:
+                    return False
+                vals.append(job_id)
+                cur.execute(
+                    f"UPDATE processing_jobs SET {', '.join(updates)} WHERE id = %s",
+                    vals,
+                )
+                updated = cur.rowcount > 0
+                _send_notifications(cur, notifications)
+                return updated
+    except Exception as e:
+        print("Error update_processing_job:", e)
+        return False
+
+
+def update_processing_jobs_batch(
+    rows: List[Tuple[str, Optional[str], Optional[float], Optional[float]]],
+    notifications: Optional[List[Tuple[str, str]]] = None,
+) -> int:
+    """
+    Apply many (job_id, stage, progress, eta_sec) progress updates in one
+    statement. NULL fields are left as they are; jobs already completed or
+    failed are never touched, so a late batch cannot undo a terminal write.
+    `notifications` are sent with pg_notify in the same transaction.
+    """
+    if not rows:
+        return 0
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE processing_jobs AS j
+                    SET stage = COALESCE(v.stage::job_stage, j.stage),
+                        progress = COALESCE(v.progress, j.progress),
+                        eta_at = CASE
+                            WHEN v.eta_sec IS NULL THEN j.eta_at
+                            ELSE NOW() + make_interval(secs => v.eta_sec)
+                        END
+                    FROM (VALUES %s) AS v(id, stage, progress, eta_sec)
+                    WHERE j.id = v.id
+                      AND j.stage NOT IN ('completed', 'failed')
+                    """,
+                    rows,
+                    template="(%s::uuid, %s::text, %s::real, %s::float8)",
+                    page_size=max(100, len(rows)),
+                )
+                written = cur.rowcount
+                _send_notifications(cur, notifications)
+                return written
+    except Exception as e:
+        print("Error update_processing_jobs_batch:", e)
+        return -1
+
+
+def _send_notifications(cur, notifications: Optional[List[Tuple[str, str]]]) -> None:
+    """pg_notify each (channel, payload); delivered when the caller's transaction commits."""
+    if notifications:
+        cur.execute(
+            "SELECT pg_notify(c, p) FROM unnest(%s::text[], %s::text[]) AS n(c, p)",
+            ([c for c, _ in notifications], [p for _, p in notifications]),
+        )
+
+
+def get_stage_timing_history(
+    engine: Optional[str] = None,
+    model: Optional[str] = None,
+    limit: int = 200,
+) -> Dict[str, Optional[float]]:
+    """
+    Median stage timings over recent completed jobs, for ETAs: ASR real-time
+    factor for engine:model and LLM seconds per 1000 transcript characters.
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT
+                        percentile_cont(0.5) WITHIN GROUP (
+                            ORDER BY (model_info->'asr'->>'rtf')::float
+                        ) FILTER (
+                            WHERE model_info->'asr'->>'engine' = %s
+                              AND model_info->'asr'->>'model' = %s
+                              AND model_info->'asr' ? 'rtf'
+                        ),
+                        percentile_cont(0.5) WITHIN GROUP (
+                            ORDER BY (model_info->'llm'->>'sec')::float * 1000
+                                / NULLIF((model_info->'llm'->>'chars')::float, 0)
+                        ) FILTER (WHERE model_info->'llm' ? 'chars')
+                    FROM (
+                        SELECT model_info
+                        FROM processing_jobs
+                        WHERE stage = 'completed' AND model_info IS NOT NULL
+                        ORDER BY finished_at DESC NULLS LAST
+                        LIMIT %s
+                    ) recent
+                    """,
+                    (engine, model, limit),
+                )
+                row = cur.fetchone()
+                return {
+                    "asr_rtf": float(row[0]) if row and row[0] is not None else None,
+                    "llm_sec_per_kchar": float(row[1]) if row and row[1] is not None else None,
+                }
+    except Exception as e:
+        print("Error get_stage_timing_history:", e)
+        return {"asr_rtf": None, "llm_sec_per_kchar": None}
+
+
+def get_story_vault_plan(story_id: str) -> Optional[str]:
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT v.plan FROM stories s
+                    JOIN family_vaults v ON v.id = s.vault_id
+                    WHERE s.id = %s
+                    """,
+                    (story_id,),
+                )
+                row = cur.fetchone()
+                return row[0] if row else None
+    except Exception as e:
+        print("Error get_story_vault_plan:", e)
+        return None
+
+
+def merge_job_model_info(job_id: str, info: Dict[str, Any]) -> bool:
+    """Merge keys into processing_jobs.model_info (ASR/LLM run details)."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE processing_jobs
+                    SET model_info = COALESCE(model_info, '{}'::jsonb) || %s::jsonb
+                    WHERE id = %s
+                    """,
+                    (_json(info), job_id),
+                )
+                return cur.rowcount > 0
+    except Exception as e:
+        print("Error merge_job_model_info:", e)
+        return False
+
+
+def save_job_checkpoint(job_id: str, name: str, value: Any) -> bool:
+    """Store one stage output on the job (merged into processing_jobs.checkpoints)."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE processing_jobs
+                    SET checkpoints = COALESCE(checkpoints, '{}'::jsonb)
+                        || jsonb_build_object(%s::text, %s::jsonb)
+                    WHERE id = %s
+                    """,
+                    (name, _json(value), job_id),
+                )
+                return cur.rowcount > 0
+    except Exception as e:
+        print("Error save_job_checkpoint:", e)
+        return False
+
+
+def get_job_checkpoints(job_id: str) -> Dict[str, Any]:
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT checkpoints FROM processing_jobs WHERE id = %s",
+                    (job_id,),
+                )
+                row = cur.fetchone()
+                return (_loads(row[0]) or {}) if row else {}
+    except Exception as e:
+        print("Error get_job_checkpoints:", e)
+        return {}
+
+
+def reset_processing_job(job_id: str) -> bool:
+    """Put a status-only job (no payload) back to queued before re-running it; checkpoints are kept."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE processing_jobs
+                    SET stage = 'queued'::job_stage,
+                        progress = 0,
+                        error = NULL,
+                        finished_at = NULL,
+                        eta_at = NULL,
+                        started_at = NOW()
+                    WHERE id = %s
+                    """,
+                    (job_id,),
+                )
+                return cur.rowcount > 0
+    except Exception as e:
+        print("Error reset_processing_job:", e)
+        return False
+
+
+def requeue_story_job(story_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Put a failed story's latest job back on the queue, keeping its checkpoints.
+
+    Returns None when the story has no queued-style job, or
+    {"job_id", "kind", "requeued": bool, "checkpoints": [names]}; requeued is
+    False when the job is not in a failed state or a worker still holds a live
+    lease on it. The job row is locked, so concurrent retries requeue it once.
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT j.id, j.stage, s.status, j.checkpoints, j.kind
+                    FROM stories s
+                    JOIN LATERAL (
+                        SELECT * FROM processing_jobs
+                        WHERE story_id = s.id AND payload IS NOT NULL
+                        ORDER BY created_at DESC LIMIT 1
+                    ) j ON true
+                    WHERE s.id = %s
+                    FOR UPDATE OF j
+                    """,
+                    (story_id,),
+                )
+                row = cur.fetchone()
+                if not row:
+                    return None
+                job_id = str(row[0])
+                result = {
+                    "job_id": job_id,
+                    "kind": row[4],
+                    "requeued": False,
+                    "checkpoints": sorted((_loads(row[3]) or {}).keys()),
+                }
+                if row[1] != "failed" and row[2] != "failed":
+                    return result
+                cur.execute(
+                    """
+                    UPDATE processing_jobs
+                    SET stage = 'queued'::job_stage,
+                        progress = 0,
+                        error = NULL,
+                        finished_at = NULL,
+                        attempts = 0,
+                        leased_by = NULL,
+                        lease_expires_at = NULL
+                    WHERE id = %s
+                      -- A worker still holding a live lease keeps the job
+                      AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                    """,
+                    (job_id,),
+                )
+                result["requeued"] = cur.rowcount > 0
+                if not result["requeued"]:
+                    return result
+                cur.execute(
+                    """
+                    UPDATE stories
+                    SET status = 'processing'::story_status,
+                        error_message = NULL,
+                        updated_at = NOW()
+                    WHERE id = %s
+                    """,
+                    (story_id,),
+                )
+                return result
+    except Exception as e:
+        print("Error requeue_story_job:", e)
+        return None
+
+
+def mark_story_failed(story_id: str, error_message: str) -> bool:
+    """Set story status to failed and store the error message."""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE stories
+                    SET status = 'failed'::story_status,
+                        error_message = %s,
                         updated_at = NOW()
                     WHERE id = %s
                     """,
@@ -1882,7 +2498,8 @@ def get_processing_status(story_id: str) -> Optional[Dict]:
                 cur.execute(
                     """
                     SELECT s.id, s.status, s.error_message, s.title, s.subject_person_id,
-                           j.id, j.stage, j.progress, j.error, j.updated_at
+                           j.id, j.stage, j.progress, j.error, j.updated_at,
+                           GREATEST(0, EXTRACT(EPOCH FROM j.eta_at - NOW()))
                     FROM stories s
                     LEFT JOIN LATERAL (
                         SELECT * FROM processing_jobs
@@ -1907,12 +2524,63 @@ def get_processing_status(story_id: str) -> Optional[Dict]:
                     "progress": float(row[7] or 0),
                     "job_error": row[8],
                     "updated_at": row[9],
+                    "eta_sec": round(float(row[10])) if row[10] is not None else None,
                 }
     except Exception as e:
         print("Error get_processing_status:", e)
         return None
 
 
+def _bulk_insert_facts(
+    cur, table: str, columns: Tuple[str, ...], rows: List[tuple]
+) -> List[str]:
+    """
+    One multi-row INSERT into a fact table (status column last). Ids are
+    generated here, so each input row maps to its id without relying on the
+    order of RETURNING rows.
+    """
+    ids = [str(uuid.uuid4()) for _ in rows]
+    if rows:
+        execute_values(
+            cur,
+            f"INSERT INTO {table} (id, {', '.join(columns)}) VALUES %s",
+            [(fact_id, *row) for fact_id, row in zip(ids, rows)],
+            template="(" + "%s, " * len(columns) + "%s::fact_status)",
+            page_size=_BULK_PAGE_SIZE,
+        )
+    return ids
+
+
+def _bulk_insert_relationships(
+    cur,
+    vault_id: str,
+    edges: List[Tuple[str, str, str]],
+    source_story_id: Optional[str],
+    certainty: float = 0.8,
+) -> Dict[Tuple[str, str, str], str]:
+    """_insert_relationship for many edges at once; returns {(from, to, type): id}."""
+    unique = list(dict.fromkeys(e for e in edges if e[0] != e[1]))
+    if not unique:
+        return {}
+    rows = execute_values(
+        cur,
+        """
+        INSERT INTO relationships (
+            vault_id, from_person_id, to_person_id, type,
+            source_story_id, certainty
+        ) VALUES %s
+        ON CONFLICT (from_person_id, to_person_id, type) DO UPDATE
+            SET certainty = GREATEST(relationships.certainty, EXCLUDED.certainty)
+        RETURNING from_person_id, to_person_id, type, id
+        """,
+        [(vault_id, frm, to, rel_type, source_story_id, certainty) for frm, to, rel_type in unique],
+        template="(%s, %s, %s, %s::relationship_type, %s, %s)",
+        page_size=_BULK_PAGE_SIZE,
+        fetch=True,
+    )
+    return {(str(r[0]), str(r[1]), r[2]): str(r[3]) for r in rows}
+
+
 def _apply_extracted_to_graph(
     cur,
     vault_id: str,
@@ -1921,48 +2589,46 @@ def _apply_extracted_to_graph(
     extracted_data: Dict,
     auto_confirm: bool,
 ) -> None:
+    """
+    Write a story's extracted facts into the vault graph. Each entity family
+    (events, relationships, places, occupations, themes) and all their
+    ai_suggestions go in as multi-row INSERTs, and family members are
+    resolved to persons in one batch, so the number of statements does not
+    grow with the size of the extraction.
+    """
     fact_status = "confirmed" if auto_confirm else "suggested"
     suggestion_status = "accepted" if auto_confirm else "pending"
-
-    for event in (extracted_data or {}).get("timeline_events") or []:
-        title = event.get("event") or event.get("title") or "Event"
-        cur.execute(
-            """
-            INSERT INTO timeline_events (
-                vault_id, person_id, source_story_id, year, title,
-                description, place, category, status
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s::fact_status)
-            RETURNING id
-            """,
+    extracted_data = extracted_data or {}
+    # (kind, payload, entity id), inserted together at the end
+    suggestions: List[Tuple[str, Dict, Optional[str]]] = []
+
+    events = extracted_data.get("timeline_events") or []
+    event_ids = _bulk_insert_facts(
+        cur,
+        "timeline_events",
+        ("vault_id", "person_id", "source_story_id", "year", "title",
+         "description", "place", "category", "status"),
+        [
             (
                 vault_id,
                 subject_id,
                 story_id,
                 event.get("year"),
-                title,
+                event.get("event") or event.get("title") or "Event",
                 event.get("description"),
                 event.get("location") or event.get("place"),
                 event.get("category"),
                 fact_status,
-            ),
-        )
-        event_id = str(cur.fetchone()[0])
-        cur.execute(
-            """
-            INSERT INTO ai_suggestions (
-                vault_id, story_id, kind, payload, status, resolved_entity_id
-            ) VALUES (%s, %s, 'timeline_event', %s::jsonb, %s::suggestion_status, %s)
-            """,
-            (
-                vault_id,
-                story_id,
-                _json(event),
-                suggestion_status,
-                event_id if auto_confirm else None,
-            ),
-        )
+            )
+            for event in events
+        ],
+    )
+    suggestions += [("timeline_event", e, i) for e, i in zip(events, event_ids)]
 
-    for member in (extracted_data or {}).get("family_members") or []:
+    members = extracted_data.get("family_members") or []
+    member_people: List[Dict[str, Any]] = []
+    member_rels: List[str] = []
+    for member in members:
         m_name = (member.get("name") or "").strip() or "Unknown relative"
         raw_rel = member.get("relationship") or "relative"
         # Never auto-link uncertain rows
@@ -1976,47 +2642,41 @@ def _apply_extracted_to_graph(
         if raw_rel == "relative" and member.get("relationship"):
             note_bits.append(f"Mentioned as: {member.get('relationship')}")
         notes = " · ".join(b for b in note_bits if b).strip(" ·")
-        other_id = get_or_create_person_by_name(
-            cur,
-            vault_id,
-            m_name,
-            birth_year=member.get("birth_year"),
-            death_year=member.get("death_year"),
-            notes=notes or None,
+        member_people.append(
+            {
+                "display_name": m_name,
+                "birth_year": member.get("birth_year"),
+                "death_year": member.get("death_year"),
+                "notes": notes or None,
+            }
         )
+        member_rels.append(raw_rel)
+
+    member_edges: List[Tuple[Dict, str, Optional[Tuple[str, str, str]]]] = []
+    for member, other_id, raw_rel in zip(
+        members, resolve_persons_by_name(cur, vault_id, member_people), member_rels
+    ):
         tree_edge = None
         if raw_rel != "relative":
             tree_edge = _tree_edge_for_label(subject_id, other_id, raw_rel)
-        rel_id = None
-        if tree_edge:
-            frm, to, rel_type = tree_edge
-            rel_id = _insert_relationship(
-                cur, vault_id, frm, to, rel_type, story_id, certainty=0.9
-            )
-        cur.execute(
-            """
-            INSERT INTO ai_suggestions (
-                vault_id, story_id, kind, payload, status, resolved_entity_id
-            ) VALUES (%s, %s, 'relationship', %s::jsonb, %s::suggestion_status, %s)
-            """,
-            (
-                vault_id,
-                story_id,
-                _json({**member, "person_id": other_id, "relationship_id": rel_id}),
-                suggestion_status,
-                rel_id if auto_confirm else None,
-            ),
+        member_edges.append((member, other_id, tree_edge))
+
+    rel_ids = _bulk_insert_relationships(
+        cur, vault_id, [edge for _, _, edge in member_edges if edge], story_id, certainty=0.9
+    )
+    for member, other_id, tree_edge in member_edges:
+        rel_id = rel_ids.get(tree_edge) if tree_edge else None
+        suggestions.append(
+            ("relationship", {**member, "person_id": other_id, "relationship_id": rel_id}, rel_id)
         )
 
-    for location in (extracted_data or {}).get("locations") or []:
-        cur.execute(
-            """
-            INSERT INTO places (
-                vault_id, person_id, source_story_id, place,
-                start_year, end_year, purpose, status
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s::fact_status)
-            RETURNING id
-            """,
+    locations = extracted_data.get("locations") or []
+    place_ids = _bulk_insert_facts(
+        cur,
+        "places",
+        ("vault_id", "person_id", "source_story_id", "place",
+         "start_year", "end_year", "purpose", "status"),
+        [
             (
                 vault_id,
                 subject_id,
@@ -2026,33 +2686,19 @@ def _apply_extracted_to_graph(
                 location.get("end_year"),
                 location.get("purpose"),
                 fact_status,
-            ),
-        )
-        place_id = str(cur.fetchone()[0])
-        cur.execute(
-            """
-            INSERT INTO ai_suggestions (
-                vault_id, story_id, kind, payload, status, resolved_entity_id
-            ) VALUES (%s, %s, 'place', %s::jsonb, %s::suggestion_status, %s)
-            """,
-            (
-                vault_id,
-                story_id,
-                _json(location),
-                suggestion_status,
-                place_id if auto_confirm else None,
-            ),
-        )
-
-    for occupation in (extracted_data or {}).get("occupations") or []:
-        cur.execute(
-            """
-            INSERT INTO occupations (
-                vault_id, person_id, source_story_id, role,
-                start_year, end_year, location, status
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s::fact_status)
-            RETURNING id
-            """,
+            )
+            for location in locations
+        ],
+    )
+    suggestions += [("place", loc, i) for loc, i in zip(locations, place_ids)]
+
+    occupations = extracted_data.get("occupations") or []
+    occ_ids = _bulk_insert_facts(
+        cur,
+        "occupations",
+        ("vault_id", "person_id", "source_story_id", "role",
+         "start_year", "end_year", "location", "status"),
+        [
             (
                 vault_id,
                 subject_id,
@@ -2062,38 +2708,56 @@ def _apply_extracted_to_graph(
                 occupation.get("end_year"),
                 occupation.get("location"),
                 fact_status,
-            ),
-        )
-        occ_id = str(cur.fetchone()[0])
-        cur.execute(
+            )
+            for occupation in occupations
+        ],
+    )
+    suggestions += [("occupation", occ, i) for occ, i in zip(occupations, occ_ids)]
+
+    if suggestions:
+        execute_values(
+            cur,
             """
             INSERT INTO ai_suggestions (
                 vault_id, story_id, kind, payload, status, resolved_entity_id
-            ) VALUES (%s, %s, 'occupation', %s::jsonb, %s::suggestion_status, %s)
+            ) VALUES %s
             """,
-            (
-                vault_id,
-                story_id,
-                _json(occupation),
-                suggestion_status,
-                occ_id if auto_confirm else None,
-            ),
+            [
+                (
+                    vault_id,
+                    story_id,
+                    kind,
+                    _json(payload),
+                    suggestion_status,
+                    entity_id if auto_confirm else None,
+                )
+                for kind, payload, entity_id in suggestions
+            ],
+            template="(%s, %s, %s::suggestion_kind, %s::jsonb, %s::suggestion_status, %s)",
+            page_size=_BULK_PAGE_SIZE,
         )
 
-    for theme_name in (extracted_data or {}).get("themes") or []:
-        if not theme_name:
-            continue
-        cur.execute(
-            "INSERT INTO themes (name) VALUES (%s) ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id",
-            (theme_name,),
+    theme_names = list(dict.fromkeys(t for t in extracted_data.get("themes") or [] if t))
+    if theme_names:
+        theme_rows = execute_values(
+            cur,
+            """
+            INSERT INTO themes (name) VALUES %s
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+            """,
+            [(name,) for name in theme_names],
+            page_size=_BULK_PAGE_SIZE,
+            fetch=True,
         )
-        theme_id = cur.fetchone()[0]
-        cur.execute(
+        execute_values(
+            cur,
             """
             INSERT INTO story_themes (story_id, theme_id)
-            VALUES (%s, %s) ON CONFLICT DO NOTHING
+            VALUES %s ON CONFLICT DO NOTHING
             """,
-            (story_id, theme_id),
+            [(story_id, r[0]) for r in theme_rows],
+            page_size=_BULK_PAGE_SIZE,
         )
 
 
@@ -2105,16 +2769,32 @@ def finalize_story_processing(
     extracted_data: Dict,
     person_name_hint: Optional[str] = None,
     auto_confirm: bool = True,
+    job_id: Optional[str] = None,
 ) -> bool:
     """
     Persist pipeline outputs onto an existing story shell and write
     timeline events + family relationships into the vault graph.
+
+    With a job_id this runs at most once per job: the job row is locked and a
+    "finalized" checkpoint is written in the same transaction, so a re-run job
+    (resumed bulk import, retry after a late crash) does not insert its facts
+    and suggestions a second time.
     """
     vault_id: Optional[str] = None
     ok = False
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
+                if job_id:
+                    cur.execute(
+                        "SELECT checkpoints ? 'finalized' FROM processing_jobs WHERE id = %s FOR UPDATE",
+                        (job_id,),
+                    )
+                    row = cur.fetchone()
+                    if row and row[0]:
+                        print(f"[finalize] job={job_id} already finalized; skipping graph writes")
+                        return True
+
                 cur.execute(
                     "SELECT vault_id, subject_person_id FROM stories WHERE id = %s",
                     (story_id,),
@@ -2221,6 +2901,16 @@ def finalize_story_processing(
                 _apply_extracted_to_graph(
                     cur, vault_id, story_id, subject_id, extracted_data or {}, auto_confirm
                 )
+                if job_id:
+                    cur.execute(
+                        """
+                        UPDATE processing_jobs
+                        SET checkpoints = COALESCE(checkpoints, '{}'::jsonb)
+                            || jsonb_build_object('finalized', true)
+                        WHERE id = %s
+                        """,
+                        (job_id,),
+                    )
                 ok = True
     except Exception as e:
         print("Error finalize_story_processing:", e)
@@ -2403,164 +3093,149 @@ def list_artifacts(
         return []
 
 
+_ARCHIVE_SEARCH_KEYS = ("stories", "persons", "events", "artifacts", "shared_memories")
+
+
+def _archive_search_queries(q: str, vault_id: str, limit: int) -> List[Tuple[str, str, tuple, Any]]:
+    """(result key, SQL, params, row mapper) per section of search_archive."""
+    like = f"%{q}%"
+    return [
+        (
+            "stories",
+            """
+            SELECT id, title, summary, status,
+                   ts_rank(search_vector, plainto_tsquery('english', %s)) AS rank
+            FROM stories
+            WHERE vault_id = %s
+              AND (
+                search_vector @@ plainto_tsquery('english', %s)
+                OR title ILIKE %s OR summary ILIKE %s OR biography ILIKE %s
+              )
+            ORDER BY rank DESC NULLS LAST, updated_at DESC
+            LIMIT %s
+            """,
+            (q, vault_id, q, like, like, like, limit),
+            lambda r: {
+                "id": str(r[0]),
+                "title": r[1],
+                "summary": r[2],
+                "status": r[3],
+                "rank": float(r[4] or 0),
+                "kind": "story",
+            },
+        ),
+        (
+            "persons",
+            """
+            SELECT id, display_name, birth_year, birth_place, notes
+            FROM persons
+            WHERE vault_id = %s
+              AND (
+                search_vector @@ plainto_tsquery('english', %s)
+                OR display_name ILIKE %s OR notes ILIKE %s OR birth_place ILIKE %s
+              )
+            ORDER BY display_name
+            LIMIT %s
+            """,
+            (vault_id, q, like, like, like, limit),
+            lambda r: {
+                "id": str(r[0]),
+                "name": r[1],
+                "birth_year": r[2],
+                "birth_place": r[3],
+                "notes": r[4],
+                "kind": "person",
+            },
+        ),
+        (
+            "events",
+            """
+            SELECT te.id, te.year, te.title, te.description, te.place,
+                   te.person_id, p.display_name, te.shared_memory_id
+            FROM timeline_events te
+            JOIN persons p ON p.id = te.person_id
+            WHERE te.vault_id = %s AND te.status = 'confirmed'
+              AND (
+                te.title ILIKE %s OR te.description ILIKE %s
+                OR te.place ILIKE %s OR CAST(te.year AS TEXT) = %s
+              )
+            ORDER BY te.year NULLS LAST
+            LIMIT %s
+            """,
+            (vault_id, like, like, like, q, limit),
+            lambda r: {
+                "id": str(r[0]),
+                "year": r[1],
+                "title": r[2],
+                "description": r[3],
+                "place": r[4],
+                "person_id": str(r[5]),
+                "person_name": r[6],
+                "shared_memory_id": _as_str(r[7]),
+                "kind": "event",
+            },
+        ),
+        (
+            "artifacts",
+            """
+            SELECT id, artifact_type, title, caption, taken_year, taken_place
+            FROM artifacts
+            WHERE vault_id = %s
+              AND (title ILIKE %s OR caption ILIKE %s OR taken_place ILIKE %s)
+            ORDER BY created_at DESC
+            LIMIT %s
+            """,
+            (vault_id, like, like, like, limit),
+            lambda r: {
+                "id": str(r[0]),
+                "artifact_type": r[1],
+                "title": r[2],
+                "caption": r[3],
+                "taken_year": r[4],
+                "taken_place": r[5],
+                "kind": "artifact",
+            },
+        ),
+        (
+            "shared_memories",
+            """
+            SELECT id, title, year, place, description
+            FROM shared_memories
+            WHERE vault_id = %s
+              AND (title ILIKE %s OR description ILIKE %s OR place ILIKE %s)
+            ORDER BY year NULLS LAST
+            LIMIT %s
+            """,
+            (vault_id, like, like, like, limit),
+            lambda r: {
+                "id": str(r[0]),
+                "title": r[1],
+                "year": r[2],
+                "place": r[3],
+                "description": r[4],
+                "kind": "shared_memory",
+            },
+        ),
+    ]
+
+
 def search_archive(query: str, vault_id: str = DEFAULT_VAULT_ID, limit: int = 40) -> Dict[str, List]:
     """Full-text + ILIKE fallback across stories, people, events, artifacts."""
     q = (query or "").strip()
     if not q:
-        return {"stories": [], "persons": [], "events": [], "artifacts": [], "shared_memories": []}
+        return {key: [] for key in _ARCHIVE_SEARCH_KEYS}
 
     try:
+        results: Dict[str, Any] = {"query": q}
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT id, title, summary, status,
-                           ts_rank(search_vector, plainto_tsquery('english', %s)) AS rank
-                    FROM stories
-                    WHERE vault_id = %s
-                      AND (
-                        search_vector @@ plainto_tsquery('english', %s)
-                        OR title ILIKE %s OR summary ILIKE %s OR biography ILIKE %s
-                      )
-                    ORDER BY rank DESC NULLS LAST, updated_at DESC
-                    LIMIT %s
-                    """,
-                    (q, vault_id, q, f"%{q}%", f"%{q}%", f"%{q}%", limit),
-                )
-                stories = [
-                    {
-                        "id": str(r[0]),
-                        "title": r[1],
-                        "summary": r[2],
-                        "status": r[3],
-                        "rank": float(r[4] or 0),
-                        "kind": "story",
-                    }
-                    for r in cur.fetchall()
-                ]
-
-                cur.execute(
-                    """
-                    SELECT id, display_name, birth_year, birth_place, notes
-                    FROM persons
-                    WHERE vault_id = %s
-                      AND (
-                        search_vector @@ plainto_tsquery('english', %s)
-                        OR display_name ILIKE %s OR notes ILIKE %s OR birth_place ILIKE %s
-                      )
-                    ORDER BY display_name
-                    LIMIT %s
-                    """,
-                    (vault_id, q, f"%{q}%", f"%{q}%", f"%{q}%", limit),
-                )
-                persons = [
-                    {
-                        "id": str(r[0]),
-                        "name": r[1],
-                        "birth_year": r[2],
-                        "birth_place": r[3],
-                        "notes": r[4],
-                        "kind": "person",
-                    }
-                    for r in cur.fetchall()
-                ]
-
-                cur.execute(
-                    """
-                    SELECT te.id, te.year, te.title, te.description, te.place,
-                           te.person_id, p.display_name, te.shared_memory_id
-                    FROM timeline_events te
-                    JOIN persons p ON p.id = te.person_id
-                    WHERE te.vault_id = %s AND te.status = 'confirmed'
-                      AND (
-                        te.title ILIKE %s OR te.description ILIKE %s
-                        OR te.place ILIKE %s OR CAST(te.year AS TEXT) = %s
-                      )
-                    ORDER BY te.year NULLS LAST
-                    LIMIT %s
-                    """,
-                    (vault_id, f"%{q}%", f"%{q}%", f"%{q}%", q, limit),
-                )
-                events = [
-                    {
-                        "id": str(r[0]),
-                        "year": r[1],
-                        "title": r[2],
-                        "description": r[3],
-                        "place": r[4],
-                        "person_id": str(r[5]),
-                        "person_name": r[6],
-                        "shared_memory_id": _as_str(r[7]),
-                        "kind": "event",
-                    }
-                    for r in cur.fetchall()
-                ]
-
-                cur.execute(
-                    """
-                    SELECT id, artifact_type, title, caption, taken_year, taken_place
-                    FROM artifacts
-                    WHERE vault_id = %s
-                      AND (title ILIKE %s OR caption ILIKE %s OR taken_place ILIKE %s)
-                    ORDER BY created_at DESC
-                    LIMIT %s
-                    """,
-                    (vault_id, f"%{q}%", f"%{q}%", f"%{q}%", limit),
-                )
-                artifacts = [
-                    {
-                        "id": str(r[0]),
-                        "artifact_type": r[1],
-                        "title": r[2],
-                        "caption": r[3],
-                        "taken_year": r[4],
-                        "taken_place": r[5],
-                        "kind": "artifact",
-                    }
-                    for r in cur.fetchall()
-                ]
-
-                cur.execute(
-                    """
-                    SELECT id, title, year, place, description
-                    FROM shared_memories
-                    WHERE vault_id = %s
-                      AND (title ILIKE %s OR description ILIKE %s OR place ILIKE %s)
-                    ORDER BY year NULLS LAST
-                    LIMIT %s
-                    """,
-                    (vault_id, f"%{q}%", f"%{q}%", f"%{q}%", limit),
-                )
-                shared = [
-                    {
-                        "id": str(r[0]),
-                        "title": r[1],
-                        "year": r[2],
-                        "place": r[3],
-                        "description": r[4],
-                        "kind": "shared_memory",
-                    }
-                    for r in cur.fetchall()
-                ]
-
-        return {
-            "query": q,
-            "stories": stories,
-            "persons": persons,
-            "events": events,
-            "artifacts": artifacts,
-            "shared_memories": shared,
-        }
+                for key, sql, params, to_dict in _archive_search_queries(q, vault_id, limit):
+                    cur.execute(sql, params)
+                    results[key] = [to_dict(r) for r in cur.fetchall()]
+        return results
     except Exception as e:
         print("Error search_archive:", e)
-        return {
-            "query": q,
-            "stories": [],
-            "persons": [],
-            "events": [],
-            "artifacts": [],
-            "shared_memories": [],
-        }
+        return {"query": q, **{key: [] for key in _ARCHIVE_SEARCH_KEYS}}
 
 
 def link_shared_memories_for_vault(vault_id: str = DEFAULT_VAULT_ID) -> int:
@@ -0,0 +1,57 @@
+-- =============================================================================
+-- VirsaAI v2.3 — Processing pipeline (durable job queue)
+-- Additive only (safe on existing v2 data)
+-- =============================================================================
+
+-- processing_jobs doubles as the work queue: a job is claimable while it is
+-- not terminal and nobody holds an unexpired lease on it.
+ALTER TABLE processing_jobs
+    ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'audio',
+    ADD COLUMN IF NOT EXISTS payload JSONB,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 3,
+    ADD COLUMN IF NOT EXISTS leased_by TEXT,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
+
+COMMENT ON COLUMN processing_jobs.kind IS 'audio | transcript';
+COMMENT ON COLUMN processing_jobs.payload IS
+    'Worker input: audio_path or transcript, person_name_hint, auto_confirm';
+COMMENT ON COLUMN processing_jobs.leased_by IS
+    'Worker id (host:pid:n) currently processing the job';
+
+CREATE INDEX IF NOT EXISTS idx_jobs_claimable
+    ON processing_jobs(created_at)
+    WHERE payload IS NOT NULL AND stage NOT IN ('completed', 'failed');
+
+-- Stage outputs (transcript, biography, extract, family) so a retry resumes
+-- from the first incomplete stage instead of re-running Whisper.
+ALTER TABLE processing_jobs
+    ADD COLUMN IF NOT EXISTS checkpoints JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Token buckets shared by every worker process for LLM quotas (requests and
+-- tokens per minute). `tokens` may go negative: that is queued debt the
+-- callers are already sleeping off.
+CREATE TABLE IF NOT EXISTS llm_rate_buckets (
+    name TEXT PRIMARY KEY,            -- e.g. 'gemini-2.5-flash:rpm'
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+-- Estimated completion time, refreshed with progress (cleared at completed/failed).
+ALTER TABLE processing_jobs
+    ADD COLUMN IF NOT EXISTS eta_at TIMESTAMPTZ;
+
+-- Claim order: higher priority first (plan tier, see routing.py), then oldest.
+ALTER TABLE processing_jobs
+    ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_claimable_priority
+    ON processing_jobs(priority DESC, created_at)
+    WHERE payload IS NOT NULL AND stage NOT IN ('completed', 'failed');
+
+-- Case-insensitive person lookup during family ingest (resolve_persons_by_name,
+-- get_or_create_person_by_name match on lower(display_name)); the
+-- idx_persons_vault_name index on the raw column cannot serve it.
+CREATE INDEX IF NOT EXISTS idx_persons_vault_lower_name
+    ON persons(vault_id, lower(display_name));
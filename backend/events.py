@@ -0,0 +1,216 @@
+"""
+Processing status events for push updates (GET /story/{id}/events).
+
+The pipeline publishes a status event whenever a job's stage or progress
+is written; SSE handlers subscribe per story and forward them, so an open
+processing page costs no status queries after its first read.
+
+Pipeline workers normally run inside the API process (job_queue), where
+delivery is a plain in-process fan-out. With standalone workers
+(`python job_queue.py`) set VIRSA_EVENTS_BACKEND=postgres: job_state then
+also NOTIFYs on the `virsa_job_events` channel inside the transaction that
+writes the job row (a batched flush, or a terminal write-through), so events
+cost no extra connections or commits, and every API process LISTENs and
+republishes to its own subscribers. Cross-process events for progress thus
+arrive at the write-behind flush interval.
+
+Config (env):
+  VIRSA_EVENTS_BACKEND   local | postgres (default local)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import select
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+CHANNEL = "virsa_job_events"
+# pg_notify payloads are capped at 8000 bytes; status events are far smaller
+_MAX_NOTIFY_BYTES = 7900
+
+TERMINAL_STATUSES = frozenset({"ready", "failed"})
+
+
+class EventBroker:
+    """Thread-safe publish, asyncio-side subscribe, keyed by story id."""
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = (backend or os.getenv("VIRSA_EVENTS_BACKEND") or "local").lower()
+        self.origin = uuid.uuid4().hex  # skip our own NOTIFYs when they come back
+        self._subs: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.published = 0
+        self.delivered = 0
+
+    # ---- subscribe (async side) ------------------------------------------
+    def subscribe(self, story_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subs.setdefault(story_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, story_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = [s for s in self._subs.get(story_id, []) if s[1] is not queue]
+            if subs:
+                self._subs[story_id] = subs
+            else:
+                self._subs.pop(story_id, None)
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._subs.values())
+
+    # ---- publish (any thread) --------------------------------------------
+    def _deliver(self, story_id: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs.get(story_id, []))
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+                self.delivered += 1
+            except RuntimeError:
+                # Loop closed under us; the handler's finally will unsubscribe
+                pass
+
+    def publish(self, story_id: str, event: Dict[str, Any]) -> None:
+        self.published += 1
+        self._deliver(story_id, event)
+
+    def notification(self, story_id: str, event: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """(channel, payload) for the job write to pg_notify, or None when not cross-process."""
+        if self.backend != "postgres":
+            return None
+        payload = json.dumps(
+            {"origin": self.origin, "story_id": story_id, "event": event}, default=str
+        )
+        if len(payload) > _MAX_NOTIFY_BYTES:
+            return None
+        return CHANNEL, payload
+
+    # ---- cross-process listener ------------------------------------------
+    def start(self) -> None:
+        if self.backend != "postgres" or self._listener is not None:
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(
+            target=self._listen_loop, name="events-listen", daemon=True
+        )
+        self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def _listen_loop(self) -> None:
+        import psycopg2
+
+        from db.db_connection import DB_CONFIG
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                # Dedicated autocommit connection: LISTEN must not sit in the pool
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                print(f"[events] listening on {CHANNEL}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._on_notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"[events] listener error: {e}")
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _on_notify(self, payload: str) -> None:
+        try:
+            msg = json.loads(payload)
+        except ValueError:
+            return
+        if msg.get("origin") == self.origin:
+            return
+        self._deliver(msg.get("story_id") or "", msg.get("event") or {})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "subscribers": self.subscribers(),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+def _offer(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    # A slow client only ever needs the latest status: drop the oldest
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(event)
+
+
+def status_event(
+    story_id: str,
+    job_id: str,
+    stage: Optional[str],
+    progress: Optional[float],
+    eta_sec: Optional[float] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Same shape as GET /story/{id}/status, for the fields the pipeline knows."""
+    if stage == "completed":
+        status = "ready"
+    elif stage == "failed":
+        status = "failed"
+    else:
+        status = "processing"
+    event: Dict[str, Any] = {
+        "story_id": story_id,
+        "job_id": job_id,
+        "status": status,
+        "progress": progress,
+        "eta_sec": eta_sec,
+    }
+    if stage is not None:
+        event["stage"] = stage
+    if error is not None:
+        event["job_error"] = error
+        event["error_message"] = error
+    return event
+
+
+_broker: Optional[EventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_event_broker() -> EventBroker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = EventBroker()
+    return _broker
+
+
+def publish_status(story_id: Optional[str], job_id: str, **fields: Any) -> None:
+    if story_id:
+        get_event_broker().publish(story_id, status_event(story_id, job_id, **fields))
@@ -0,0 +1,170 @@
+"""
+Windowed (map-reduce) structured extraction for long transcripts.
+
+A multi-hour recording is split into overlapping windows on sentence
+boundaries; each window is extracted on its own, and the partial results
+are merged here into the single extract schema the graph writer expects
+(summary, person_info, timeline_events, locations, occupations, themes,
+family_members). Overlap means an event near a boundary is usually seen
+twice, so merging is mostly deduplication.
+"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def split_transcript(
+    text: str,
+    window_chars: int,
+    overlap_chars: int,
+) -> List[str]:
+    """Windows of about `window_chars`, each repeating the tail of the previous one."""
+    text = (text or "").strip()
+    if len(text) <= window_chars:
+        return [text] if text else []
+    sentences = [s for s in _SENTENCE_END.split(text) if s]
+
+    windows: List[str] = []
+    current: List[str] = []
+    size = 0
+    for sentence in sentences:
+        # Unpunctuated speech can produce one huge "sentence"; hard-wrap it
+        pieces = [sentence[i:i + window_chars] for i in range(0, len(sentence), window_chars)]
+        for piece in pieces:
+            if current and size + len(piece) > window_chars:
+                windows.append(" ".join(current))
+                # Carry trailing sentences forward as the overlap
+                carry: List[str] = []
+                carried = 0
+                for prev in reversed(current):
+                    if carried + len(prev) > overlap_chars:
+                        break
+                    carry.insert(0, prev)
+                    carried += len(prev) + 1
+                current, size = carry, carried
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        windows.append(" ".join(current))
+    return windows
+
+
+def _norm(value: Any) -> str:
+    return " ".join(_WORD.findall(str(value or "").lower()))
+
+
+def _year(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _similar(a: str, b: str, threshold: float = 0.6) -> bool:
+    wa, wb = set(a.split()), set(b.split())
+    if not wa or not wb:
+        return a == b
+    return len(wa & wb) / len(wa | wb) >= threshold
+
+
+def _merge_events(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    merged: List[Dict[str, Any]] = []
+    for part in parts:
+        for event in part.get("timeline_events") or []:
+            if not isinstance(event, dict):
+                continue
+            title = _norm(event.get("event") or event.get("title"))
+            year = _year(event.get("year"))
+            dup = next(
+                (
+                    m for m in merged
+                    if _year(m.get("year")) == year
+                    and _similar(_norm(m.get("event") or m.get("title")), title)
+                ),
+                None,
+            )
+            if dup is None:
+                merged.append(dict(event))
+                continue
+            # Keep the richer description; fill gaps from the duplicate
+            if len(event.get("description") or "") > len(dup.get("description") or ""):
+                dup["description"] = event.get("description")
+            for field in ("location", "category"):
+                if not dup.get(field) and event.get(field):
+                    dup[field] = event[field]
+    # Undated events keep their narrative order after the dated ones
+    return sorted(merged, key=lambda e: (_year(e.get("year")) is None, _year(e.get("year")) or 0))
+
+
+def _merge_spans(
+    parts: List[Dict[str, Any]],
+    section: str,
+    key_fields: Tuple[str, ...],
+    extra_fields: Tuple[str, ...],
+) -> List[Dict[str, Any]]:
+    """Merge locations/occupations keyed by normalized fields, widening year spans."""
+    merged: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for part in parts:
+        for item in part.get(section) or []:
+            if not isinstance(item, dict):
+                continue
+            key = tuple(_norm(item.get(f)) for f in key_fields)
+            if not key[0]:
+                continue
+            cur = merged.get(key)
+            if cur is None:
+                merged[key] = dict(item)
+                continue
+            starts = [y for y in (_year(cur.get("start_year")), _year(item.get("start_year"))) if y]
+            ends = [y for y in (_year(cur.get("end_year")), _year(item.get("end_year"))) if y]
+            cur["start_year"] = min(starts) if starts else None
+            cur["end_year"] = max(ends) if ends else None
+            for field in extra_fields:
+                if not cur.get(field) and item.get(field):
+                    cur[field] = item[field]
+    return list(merged.values())
+
+
+def merge_extractions(parts: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Combine per-window extracts into one. `summary` is the first window's
+    until the caller replaces it with a reduced summary.
+    """
+    parts = [p for p in parts if isinstance(p, dict)]
+    if not parts:
+        return None
+
+    person: Dict[str, Any] = {}
+    for part in parts:
+        for field, value in (part.get("person_info") or {}).items():
+            if person.get(field) is None and value is not None:
+                person[field] = value
+
+    theme_counts: Counter = Counter()
+    theme_labels: Dict[str, str] = {}
+    for part in parts:
+        for theme in part.get("themes") or []:
+            key = _norm(theme)
+            if key:
+                theme_counts[key] += 1
+                theme_labels.setdefault(key, str(theme).strip())
+
+    return {
+        "summary": next((p.get("summary") for p in parts if p.get("summary")), None),
+        "person_info": {
+            "birth_year": person.get("birth_year"),
+            "birth_place": person.get("birth_place"),
+            "death_year": person.get("death_year"),
+            "name": person.get("name"),
+        },
+        "timeline_events": _merge_events(parts),
+        "family_members": [],
+        "locations": _merge_spans(parts, "locations", ("place",), ("purpose",)),
+        "occupations": _merge_spans(parts, "occupations", ("role", "location"), ()),
+        "themes": [theme_labels[k] for k, _ in theme_counts.most_common(12)],
+    }
@@ -317,18 +317,16 @@ def sanitize_family_members(
     return cleaned
 
 
-def family_extract_prompt(transcript: str, storyteller_name: Optional[str]) -> str:
-    who = storyteller_name or "the storyteller (first person: I/me)"
-    return f"""
-You extract family members for a pedigree chart (parents, spouses, children, siblings only).
-
-Storyteller: {who}
-All relationships are FROM THE STORYTELLER'S POINT OF VIEW (I / me).
+# Shared by family_extract_prompt and the combined single-call prompt
+# (pipeline._combined_prompt), so both passes get identical instructions.
+FAMILY_TASK = (
+    "You extract family members for a pedigree chart "
+    "(parents, spouses, children, siblings only)."
+)
+FAMILY_POV = "All relationships are FROM THE STORYTELLER'S POINT OF VIEW (I / me)."
 
-Return ONLY valid JSON:
-{{
-  "family_members": [
-    {{
+FAMILY_MEMBER_SCHEMA = """
+    {
       "name": "Full name if given, else first name",
       "relationship_to_storyteller": "father|mother|husband|wife|spouse|son|daughter|brother|sister|relative",
       "cultural_term": "optional Punjabi/cultural term e.g. masi, chacha, or null",
@@ -336,10 +334,10 @@ Return ONLY valid JSON:
       "confidence": "high|low",
       "birth_year": null,
       "death_year": null
-    }}
-  ]
-}}
+    }
+""".strip("\n")
 
+FAMILY_RULES = """
 HARD RULES (violations are errors):
 1. relationship_to_storyteller must be EXACTLY one of:
    father, mother, husband, wife, spouse, son, daughter, brother, sister, relative
@@ -362,6 +360,28 @@ EXAMPLES:
 - Transcript: "I married Rajinder in 1978" → Rajinder, relationship=husband, evidence="I married Rajinder", confidence=high
 - Transcript: "Raj's younger brother Manjit wired money" → Manjit, relationship=relative, cultural_term=brother-in-law, confidence=high
 - Transcript: "my older brother Harpreet" → Harpreet, relationship=brother, confidence=high
+""".strip()
+
+
+def storyteller_label(storyteller_name: Optional[str]) -> str:
+    return storyteller_name or "the storyteller (first person: I/me)"
+
+
+def family_extract_prompt(transcript: str, storyteller_name: Optional[str]) -> str:
+    return f"""
+{FAMILY_TASK}
+
+Storyteller: {storyteller_label(storyteller_name)}
+{FAMILY_POV}
+
+Return ONLY valid JSON:
+{{
+  "family_members": [
+{FAMILY_MEMBER_SCHEMA}
+  ]
+}}
+
+{FAMILY_RULES}
 
 Transcript:
 {transcript}
@@ -0,0 +1,220 @@
+"""
+Durable processing queue backed by the processing_jobs table.
+
+The API only inserts a job row with a payload; a fixed pool of worker
+threads claims jobs with a lease (FOR UPDATE SKIP LOCKED), renews the lease
+while the pipeline runs and releases it when done. Jobs left behind by a
+crashed or restarted process are reclaimed once their lease expires; those
+already out of attempts are failed by idle workers (at most once per lease
+period per process).
+
+Config (env):
+  VIRSA_PIPELINE_WORKERS   worker threads in this process (default 2, 0 = API only)
+  VIRSA_JOB_LEASE_SEC      lease length; renewed every third of it (default 90)
+  VIRSA_JOB_POLL_SEC       idle poll interval (default 5)
+
+Run a standalone worker (no API):
+  python job_queue.py
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from db.db_operations import (
+    claim_processing_job,
+    fail_abandoned_jobs,
+    get_queue_depth,
+    release_job_lease,
+    renew_job_lease,
+    set_story_status,
+)
+from job_state import get_job_state
+from metrics import job_scope
+from pipeline import process_transcript_story, process_uploaded_story
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def run_job(job: Dict[str, Any]) -> None:
+    """Dispatch a claimed job to the matching pipeline entry point."""
+    story_id = job["story_id"]
+    job_id = job["job_id"]
+    payload = job.get("payload") or {}
+    with job_scope(job_id, job.get("kind"), job.get("queue_wait_sec")):
+        set_story_status(story_id, "processing")
+        if job.get("kind") == "transcript":
+            process_transcript_story(
+                story_id=story_id,
+                job_id=job_id,
+                transcript=payload.get("transcript") or "",
+                person_name_hint=payload.get("person_name_hint"),
+                auto_confirm=payload.get("auto_confirm", True),
+                use_cache=payload.get("use_cache"),
+            )
+        else:
+            process_uploaded_story(
+                story_id=story_id,
+                job_id=job_id,
+                audio_path=payload.get("audio_path") or "",
+                person_name_hint=payload.get("person_name_hint"),
+                auto_confirm=payload.get("auto_confirm", True),
+                use_cache=payload.get("use_cache"),
+            )
+
+
+class JobQueue:
+    """Fixed-size worker pool pulling from processing_jobs."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        lease_sec: Optional[int] = None,
+        poll_sec: Optional[float] = None,
+    ):
+        self.workers = (
+            workers if workers is not None else _env_int("VIRSA_PIPELINE_WORKERS", 2)
+        )
+        self.lease_sec = lease_sec or _env_int("VIRSA_JOB_LEASE_SEC", 90)
+        self.poll_sec = poll_sec or float(_env_int("VIRSA_JOB_POLL_SEC", 5))
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active: Dict[str, str] = {}  # worker_id -> job_id
+        self._lock = threading.Lock()
+        self._reaped_at = 0.0
+        self.processed = 0
+
+    def start(self) -> None:
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        self._reap_abandoned()
+        for n in range(self.workers):
+            worker_id = f"{self._prefix}:{n}"
+            t = threading.Thread(
+                target=self._worker_loop,
+                args=(worker_id,),
+                name=f"pipeline-worker-{n}",
+                daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+        print(f"[queue] started {self.workers} worker(s) lease={self.lease_sec}s")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop claiming and wait up to `timeout` for in-flight jobs.
+
+        A worker releases its lease only once its job has returned. Jobs still
+        running at the deadline keep theirs: releasing it would let another
+        process claim a story this thread is still writing. Their lease simply
+        expires when this process exits and the job is then reclaimed.
+        """
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        with self._lock:
+            running = sorted(self._active.values())
+        if running:
+            print(f"[queue] left {len(running)} running job(s) to lease expiry: {running}")
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wake idle workers after enqueueing (saves waiting for the next poll)."""
+        self._wake.set()
+
+    def _reap_abandoned(self) -> None:
+        """Fail jobs out of attempts whose lease expired; throttled across workers."""
+        now = time.monotonic()
+        with self._lock:
+            if self._reaped_at and now - self._reaped_at < self.lease_sec:
+                return
+            self._reaped_at = now
+        failed = fail_abandoned_jobs()
+        if failed:
+            print(f"[queue] failed {failed} abandoned job(s)")
+
+    def _heartbeat(self, job_id: str, worker_id: str, done: threading.Event) -> None:
+        interval = max(1.0, self.lease_sec / 3)
+        while not done.wait(interval):
+            if not renew_job_lease(job_id, worker_id, self.lease_sec):
+                print(f"[queue] lost lease on job={job_id} ({worker_id})")
+                return
+
+    def _worker_loop(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            job = claim_processing_job(worker_id, self.lease_sec)
+            if not job:
+                self._reap_abandoned()
+                self._wake.wait(self.poll_sec)
+                self._wake.clear()
+                continue
+
+            job_id = job["job_id"]
+            print(
+                f"[queue] {worker_id} claimed job={job_id} story={job['story_id']} "
+                f"attempt={job['attempts']}"
+            )
+            with self._lock:
+                self._active[worker_id] = job_id
+            done = threading.Event()
+            beat = threading.Thread(
+                target=self._heartbeat, args=(job_id, worker_id, done), daemon=True
+            )
+            beat.start()
+            try:
+                run_job(job)
+            except Exception as e:
+                # Pipeline entry points fail the job themselves; this is a last resort
+                print(f"[queue] job={job_id} crashed: {e}")
+            finally:
+                done.set()
+                with self._lock:
+                    self._active.pop(worker_id, None)
+                    self.processed += 1
+                release_job_lease(job_id, worker_id)
+
+    def stats(self) -> Dict[str, Any]:
+        depth = get_queue_depth()
+        with self._lock:
+            busy = len(self._active)
+        return {
+            **depth,
+            "workers": self.workers,
+            "busy_workers": busy,
+            "processed": self.processed,
+        }
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
+
+
+if __name__ == "__main__":
+    q = get_job_queue()
+    if q.workers <= 0:
+        q.workers = 1
+    q.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        q.stop()
+        get_job_state().stop()
@@ -0,0 +1,272 @@
+"""
+Write-behind store for live processing-job state.
+
+Progress updates from the pipeline land here instead of opening a pooled
+connection each: the latest stage/progress/ETA per job is kept in memory,
+status reads for jobs running in this process are answered from it, and a
+background thread flushes dirty jobs to processing_jobs in one batched
+UPDATE per interval. Terminal states (completed/failed) are written through
+synchronously, so a finished or failed job is durable before the pipeline
+moves on. Jobs run by standalone workers (`python job_queue.py`) are unknown
+to the API process, whose reads then fall through to the database and may lag
+by up to one flush interval.
+
+With VIRSA_EVENTS_BACKEND=postgres the status events for the jobs written are
+NOTIFYed inside the same transaction (events.py), so cross-process push
+updates add no connections or commits of their own.
+
+Config (env):
+  VIRSA_JOB_STATE_FLUSH_SEC   batch flush interval (default 2, 0 = write through)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.db_operations import (
+    get_processing_status,
+    update_processing_job,
+    update_processing_jobs_batch,
+)
+from events import get_event_broker, status_event
+
+TERMINAL_STAGES = frozenset({"completed", "failed"})
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class _JobState:
+    __slots__ = ("job_id", "story_id", "stage", "progress", "eta_sec", "updated_at", "dirty",
+                 "snapshot")
+
+    def __init__(self, job_id: str, story_id: Optional[str]):
+        self.job_id = job_id
+        self.story_id = story_id
+        self.stage: Optional[str] = None
+        self.progress: Optional[float] = None
+        self.eta_sec: Optional[float] = None
+        self.updated_at = time.time()
+        self.dirty = False
+        # Story fields from one DB read (title, subject, ...) reused for live reads
+        self.snapshot: Optional[Dict[str, Any]] = None
+
+
+def _eta_left(state: _JobState, now: float) -> Optional[float]:
+    """The job's last ETA, counted down by the time since it was reported."""
+    if state.eta_sec is None:
+        return None
+    return max(0.0, state.eta_sec - (now - state.updated_at))
+
+
+def _notifications(events: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, str]]:
+    broker = get_event_broker()
+    return [n for n in (broker.notification(sid, event) for sid, event in events) if n]
+
+
+class JobStateStore:
+    def __init__(self, flush_sec: Optional[float] = None):
+        self.flush_sec = (
+            flush_sec if flush_sec is not None else _env_float("VIRSA_JOB_STATE_FLUSH_SEC", 2)
+        )
+        self._jobs: Dict[str, _JobState] = {}
+        self._by_story: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Serializes batch flushes with terminal write-through
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {
+            "updates": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "terminal_writes": 0,
+            "reads_served": 0,
+        }
+
+    # ---- writes ----------------------------------------------------------
+    def update(
+        self,
+        job_id: str,
+        stage: Optional[str] = None,
+        progress: Optional[float] = None,
+        error: Optional[str] = None,
+        eta_sec: Optional[float] = None,
+        story_id: Optional[str] = None,
+    ) -> bool:
+        """Record a job update; returns False only if a terminal write failed."""
+        if stage in TERMINAL_STAGES or error is not None or self.flush_sec <= 0:
+            return self._write_through(job_id, stage, progress, error, eta_sec, story_id)
+
+        with self._lock:
+            self.counters["updates"] += 1
+            state = self._jobs.get(job_id)
+            if state is None:
+                state = self._jobs[job_id] = _JobState(job_id, story_id)
+            if story_id and state.story_id != story_id:
+                state.story_id = story_id
+            if state.story_id:
+                self._by_story[state.story_id] = job_id
+            if state.dirty:
+                self.counters["coalesced"] += 1
+            if stage is not None:
+                state.stage = stage
+            if progress is not None:
+                state.progress = progress
+            if eta_sec is not None:
+                state.eta_sec = eta_sec
+            state.updated_at = time.time()
+            state.dirty = True
+        self._ensure_started()
+        return True
+
+    def _write_through(
+        self,
+        job_id: str,
+        stage: Optional[str],
+        progress: Optional[float],
+        error: Optional[str],
+        eta_sec: Optional[float],
+        story_id: Optional[str] = None,
+    ) -> bool:
+        with self._flush_lock:
+            with self._lock:
+                state = self._jobs.pop(job_id, None)
+                if state is not None and state.story_id:
+                    self._by_story.pop(state.story_id, None)
+                self.counters["terminal_writes"] += 1
+            # Carry forward anything still buffered for this job
+            if state is not None and state.dirty:
+                stage = stage or state.stage
+                progress = progress if progress is not None else state.progress
+            story_id = story_id or (state.story_id if state is not None else None)
+            return update_processing_job(
+                job_id,
+                stage=stage,
+                progress=progress,
+                error=error,
+                eta_sec=eta_sec,
+                notifications=_notifications(
+                    [(story_id, status_event(story_id, job_id, stage, progress, eta_sec, error))]
+                    if story_id
+                    else []
+                ),
+            )
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                dirty = [s for s in self._jobs.values() if s.dirty]
+                rows = [(s.job_id, s.stage, s.progress, s.eta_sec) for s in dirty]
+                now = time.time()
+                events = []
+                for s in dirty:
+                    if s.story_id:
+                        eta = _eta_left(s, now)
+                        events.append((s.story_id, status_event(
+                            s.story_id, s.job_id, s.stage, s.progress,
+                            None if eta is None else round(eta, 1),
+                        )))
+                for s in dirty:
+                    s.dirty = False
+            if not rows:
+                return 0
+            written = update_processing_jobs_batch(rows, notifications=_notifications(events))
+            if written < 0:
+                # Keep the rows for the next attempt unless newer updates replaced them
+                with self._lock:
+                    for s in dirty:
+                        s.dirty = True
+                return 0
+            with self._lock:
+                self.counters["flushes"] += 1
+                self.counters["rows_flushed"] += len(rows)
+            return len(rows)
+
+    # ---- reads -----------------------------------------------------------
+    def get_status(self, story_id: str) -> Optional[Dict[str, Any]]:
+        """GET /story/{id}/status, served from memory while the job runs here."""
+        with self._lock:
+            job_id = self._by_story.get(story_id)
+            state = self._jobs.get(job_id) if job_id else None
+            snapshot = state.snapshot if state else None
+        if state is None:
+            return get_processing_status(story_id)
+        if snapshot is None:
+            snapshot = get_processing_status(story_id)
+            if snapshot is None:
+                return None
+            with self._lock:
+                state.snapshot = snapshot
+        with self._lock:
+            self.counters["reads_served"] += 1
+            live = dict(snapshot)
+            live.update(
+                {
+                    "status": "processing",
+                    "job_id": state.job_id,
+                    "stage": state.stage or live.get("stage"),
+                    "progress": float(state.progress if state.progress is not None
+                                      else live.get("progress") or 0),
+                    "eta_sec": round(_eta_left(state, time.time()))
+                    if state.eta_sec is not None
+                    else live.get("eta_sec"),
+                }
+            )
+        return live
+
+    # ---- lifecycle -------------------------------------------------------
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._flush_loop, name="job-state-flush", daemon=True
+            )
+            self._thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_sec):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[job-state] flush failed: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "live_jobs": len(self._jobs),
+                "dirty": sum(1 for s in self._jobs.values() if s.dirty),
+                "flush_sec": self.flush_sec,
+            }
+
+
+_store: Optional[JobStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_state() -> JobStateStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStateStore()
+    return _store
@@ -0,0 +1,203 @@
+"""
+Content-addressed cache for LLM responses.
+
+Keys hash the model name, the prompt template version and the rendered
+prompt (which embeds the transcript), so a retry, a re-extract or a
+re-pasted transcript reuses the earlier response while any prompt change
+misses. Entries live in a small in-memory LRU in front of JSON files on disk.
+
+Config (env):
+  VIRSA_LLM_CACHE            0 disables lookups and writes (default 1)
+  VIRSA_LLM_CACHE_DIR        default backend/cache/llm
+  VIRSA_LLM_CACHE_TTL_SEC    default 30 days (0 = never expire)
+  VIRSA_LLM_CACHE_MEM_ITEMS  in-memory LRU size (default 256)
+  VIRSA_LLM_CACHE_DISK_MB    disk cap; oldest files pruned past it (default 256)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+_DEFAULT_DIR = Path(__file__).resolve().parent / "cache" / "llm"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def cache_key(model: str, template_version: str, prompt: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, template_version, prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class LLMCache:
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        ttl_sec: Optional[int] = None,
+        max_memory_items: Optional[int] = None,
+        max_disk_mb: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.directory = Path(directory or os.getenv("VIRSA_LLM_CACHE_DIR") or _DEFAULT_DIR)
+        self.ttl_sec = ttl_sec if ttl_sec is not None else _env_int(
+            "VIRSA_LLM_CACHE_TTL_SEC", 30 * 24 * 3600
+        )
+        self.max_memory_items = max_memory_items or _env_int("VIRSA_LLM_CACHE_MEM_ITEMS", 256)
+        self.max_disk_bytes = (
+            max_disk_mb if max_disk_mb is not None else _env_int("VIRSA_LLM_CACHE_DISK_MB", 256)
+        ) * 1024 * 1024
+        self.enabled = (
+            enabled
+            if enabled is not None
+            else os.getenv("VIRSA_LLM_CACHE", "1").strip().lower() not in ("0", "false", "no")
+        )
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "expired": 0,
+            "evicted": 0,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _fresh(self, created_at: float) -> bool:
+        return self.ttl_sec <= 0 or time.time() - created_at <= self.ttl_sec
+
+    def _remember(self, key: str, created_at: float, text: str) -> None:
+        self._memory[key] = (created_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.counters["evicted"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                if self._fresh(hit[0]):
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return hit[1]
+                del self._memory[key]
+                self.counters["expired"] += 1
+
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        created_at = float(entry.get("created_at") or 0)
+        with self._lock:
+            if not self._fresh(created_at):
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, created_at, entry.get("text") or "")
+        return entry.get("text") or ""
+
+    def put(self, key: str, text: str, **meta: Any) -> None:
+        if not self.enabled or not text:
+            return
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, text)
+            self.counters["writes"] += 1
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= 32
+            if prune:
+                self._writes_since_prune = 0
+
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps({"created_at": created_at, "text": text, **meta}))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[llm-cache] write failed: {e}")
+            return
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """Delete expired files, then oldest files until under the disk cap."""
+        try:
+            files = [(p.stat(), p) for p in self.directory.glob("*/*.json")]
+        except OSError:
+            return 0
+        removed = 0
+        total = sum(st.st_size for st, _ in files)
+        now = time.time()
+        for st, p in sorted(files, key=lambda f: f[0].st_mtime):
+            expired = self.ttl_sec > 0 and now - st.st_mtime > self.ttl_sec
+            if not expired and total <= self.max_disk_bytes:
+                continue
+            try:
+                p.unlink()
+                total -= st.st_size
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            with self._lock:
+                self.counters["evicted"] += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        for p in self.directory.glob("*/*.json"):
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                **self.counters,
+                "enabled": self.enabled,
+                "memory_items": len(self._memory),
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+            }
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
@@ -0,0 +1,238 @@
+"""
+Shared Gemini clients for the pipeline.
+
+One `genai.Client` per API key lives for the whole process, so its httpx
+connection pool keeps TLS connections alive across stages and stories
+instead of handshaking on every call. The client is safe to share between
+worker threads; `agenerate` uses the same client's async pool for callers
+that fan out with asyncio.
+
+Every call records its latency. The first call on a client (which also
+opens the connection) is tracked apart from warm calls, so cold minus warm
+is roughly the network/setup overhead and warm latency is mostly model time.
+
+Config (env):
+  VIRSA_LLM_MAX_CONNECTIONS   per-client connection pool size (default 10)
+  VIRSA_LLM_KEEPALIVE_SEC     idle keep-alive expiry (default 120)
+  VIRSA_LLM_TIMEOUT_SEC       per-request timeout (default 120)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from google import genai
+from google.genai import types
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _percentile(values: list, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return round(ordered[idx], 1)
+
+
+class LatencyStats:
+    """Rolling latency window (ms) for cold and warm calls, plus error counts."""
+
+    def __init__(self, window: int = 500):
+        self._cold: Deque[float] = deque(maxlen=window)
+        self._warm: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, ms: float, cold: bool, ok: bool = True, usage: Any = None) -> None:
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+                return
+            (self._cold if cold else self._warm).append(ms)
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+                self.output_tokens += getattr(usage, "candidates_token_count", 0) or 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cold, warm = list(self._cold), list(self._warm)
+            out = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+            }
+        cold_p50, warm_p50 = _percentile(cold, 0.5), _percentile(warm, 0.5)
+        out.update(
+            {
+                "cold_calls": len(cold),
+                "cold_p50_ms": cold_p50,
+                "warm_p50_ms": warm_p50,
+                "warm_p95_ms": _percentile(warm, 0.95),
+                # What a fresh client + connection costs on top of a warm call
+                "setup_overhead_ms": (
+                    round(cold_p50 - warm_p50, 1)
+                    if cold_p50 is not None and warm_p50 is not None
+                    else None
+                ),
+            }
+        )
+        return out
+
+
+class _PooledClient:
+    __slots__ = ("client", "created_ms", "warm", "warm_async")
+
+    def __init__(self, client: Any, created_ms: float):
+        self.client = client
+        self.created_ms = created_ms
+        self.warm = False
+        self.warm_async = False
+
+
+class GeminiClientPool:
+    """Process-wide, thread-safe Gemini clients keyed by API key."""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        keepalive_sec: Optional[float] = None,
+        timeout_sec: Optional[float] = None,
+    ):
+        self.max_connections = max_connections or int(
+            _env_float("VIRSA_LLM_MAX_CONNECTIONS", 10)
+        )
+        self.keepalive_sec = (
+            keepalive_sec if keepalive_sec is not None else _env_float("VIRSA_LLM_KEEPALIVE_SEC", 120)
+        )
+        self.timeout_sec = timeout_sec or _env_float("VIRSA_LLM_TIMEOUT_SEC", 120)
+        self._clients: Dict[str, _PooledClient] = {}
+        self._lock = threading.Lock()
+        self.latency: Dict[str, LatencyStats] = {}
+
+    def _http_options(self) -> Any:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=self.keepalive_sec,
+        )
+        return types.HttpOptions(
+            timeout=int(self.timeout_sec * 1000),
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+
+    def _get(self, api_key: str) -> _PooledClient:
+        with self._lock:
+            pooled = self._clients.get(api_key)
+            if pooled is None:
+                started = time.perf_counter()
+                try:
+                    client = genai.Client(api_key=api_key, http_options=self._http_options())
+                except (TypeError, ValueError) as e:
+                    # Older google-genai without client_args: default pooling still applies
+                    print(f"[llm] custom http options unavailable ({e}); using defaults")
+                    client = genai.Client(api_key=api_key)
+                pooled = _PooledClient(client, (time.perf_counter() - started) * 1000)
+                self._clients[api_key] = pooled
+                print(f"[llm] created Gemini client ({pooled.created_ms:.0f} ms)")
+            return pooled
+
+    def _stats_for(self, model: str) -> LatencyStats:
+        with self._lock:
+            return self.latency.setdefault(model, LatencyStats())
+
+    def client(self, api_key: str) -> Any:
+        return self._get(api_key).client
+
+    def generate(self, api_key: str, model: str, prompt: str, config: Any = None) -> Any:
+        pooled = self._get(api_key)
+        cold = not pooled.warm
+        started = time.perf_counter()
+        try:
+            response = pooled.client.models.generate_content(
+                model=model, contents=prompt, config=config
+            )
+        except Exception:
+            self._stats_for(model).record((time.perf_counter() - started) * 1000, cold, ok=False)
+            raise
+        pooled.warm = True
+        self._stats_for(model).record(
+            (time.perf_counter() - started) * 1000,
+            cold,
+            usage=getattr(response, "usage_metadata", None),
+        )
+        return response
+
+    async def agenerate(self, api_key: str, model: str, prompt: str, config: Any = None) -> Any:
+        """Async variant on the client's aio pool (for asyncio fan-out)."""
+        pooled = self._get(api_key)
+        cold = not pooled.warm_async
+        started = time.perf_counter()
+        try:
+            response = await pooled.client.aio.models.generate_content(
+                model=model, contents=prompt, config=config
+            )
+        except Exception:
+            self._stats_for(model).record((time.perf_counter() - started) * 1000, cold, ok=False)
+            raise
+        pooled.warm_async = True
+        self._stats_for(model).record(
+            (time.perf_counter() - started) * 1000,
+            cold,
+            usage=getattr(response, "usage_metadata", None),
+        )
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for pooled in clients:
+            close = getattr(pooled.client, "close", None)  # newer google-genai only
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"[llm] client close failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = len(self._clients)
+            setup = [round(c.created_ms, 1) for c in self._clients.values()]
+            models = list(self.latency.items())
+        return {
+            "clients": clients,
+            "client_setup_ms": setup,
+            "max_connections": self.max_connections,
+            "keepalive_sec": self.keepalive_sec,
+            "models": {name: s.snapshot() for name, s in models},
+        }
+
+
+_pool: Optional[GeminiClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> GeminiClientPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = GeminiClientPool()
+    return _pool
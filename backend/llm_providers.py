@@ -0,0 +1,305 @@
+"""
+Pluggable LLM providers behind one interface.
+
+  gemini  Google Gemini through the shared client pool (llm_clients) — production
+  stub    offline and deterministic: replays recorded replies or synthesizes
+          schema-valid ones from the transcript, with configurable latency and
+          injected errors. For load tests and benchmarks of the queue, DB writes
+          and shared-memory linking without GEMINI_KEY or network access.
+
+Config (env):
+  VIRSA_LLM_PROVIDER             gemini | stub (default gemini)
+  VIRSA_LLM_STUB_DIR             recorded replies: <dir>/<kind>.json or .txt (optional)
+  VIRSA_LLM_STUB_LATENCY_MS      mean simulated latency per call (default 800)
+  VIRSA_LLM_STUB_JITTER_MS       +/- uniform jitter (default 400)
+  VIRSA_LLM_STUB_MS_PER_1K_CHARS extra latency per 1000 prompt chars (default 50)
+  VIRSA_LLM_STUB_ERROR_RATE      fraction of calls that fail (default 0)
+  VIRSA_LLM_STUB_ERROR_CODE      HTTP-style code for injected errors (default 503)
+  VIRSA_LLM_STUB_SEED            RNG seed for latency and error injection (default 0)
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PROVIDER = "gemini"
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        if self.prompt_tokens is None and self.output_tokens is None:
+            return None
+        return (self.prompt_tokens or 0) + (self.output_tokens or 0)
+
+
+class LLMProvider(ABC):
+    """Interface: turn one rendered prompt into one text reply."""
+
+    name = ""
+    requires_key = True
+
+    def __init__(self):
+        self._usage_lock = threading.Lock()
+        self.usage = {"calls": 0, "errors": 0, "prompt_tokens": 0, "output_tokens": 0}
+
+    def complete(
+        self,
+        kind: str,
+        prompt: str,
+        api_key: Optional[str],
+        model: str,
+        config: Optional[dict] = None,
+    ) -> LLMResponse:
+        """generate() plus usage counters (what the pipeline calls)."""
+        try:
+            response = self.generate(kind, prompt, api_key, model, config)
+        except Exception:
+            with self._usage_lock:
+                self.usage["calls"] += 1
+                self.usage["errors"] += 1
+            raise
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += response.prompt_tokens or 0
+            self.usage["output_tokens"] += response.output_tokens or 0
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._usage_lock:
+            return {"provider": self.name, **self.usage}
+
+    def model_id(self, model: str) -> str:
+        """Name used in cache keys and rate-limit buckets."""
+        return model
+
+    @abstractmethod
+    def generate(
+        self,
+        kind: str,
+        prompt: str,
+        api_key: Optional[str],
+        model: str,
+        config: Optional[dict] = None,
+    ) -> LLMResponse:
+        """One provider call; complete() wraps it with usage accounting."""
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def generate(self, kind, prompt, api_key, model, config=None) -> LLMResponse:
+        from llm_clients import get_client_pool
+
+        response = get_client_pool().generate(api_key, model, prompt, config)
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=response.text or "",
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+
+class StubAPIError(RuntimeError):
+    """Injected provider error; `code` makes rate_limit treat 429/5xx as retryable."""
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} stub provider injected error")
+        self.code = code
+
+
+# ---- stub synthesis --------------------------------------------------------
+_TRANSCRIPT_MARKER = re.compile(r"transcript:\s*\n", re.I)
+_SENTENCE = re.compile(r"[^.!?]+[.!?]?")
+_YEAR = re.compile(r"\b(19\d{2}|20[0-2]\d)\b")
+_PLACE = re.compile(r"\b(?:in|to|from|at)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)")
+_JOB = re.compile(r"\b(?:worked as|job as|became)\s+(?:an?\s+)?([a-z]+(?:\s+[a-z]+)?)", re.I)
+_KIN = re.compile(
+    r"\bmy\s+(?:older\s+|younger\s+)?"
+    r"(father|mother|husband|wife|son|daughter|brother|sister|aunt|uncle|cousin)"
+    r"(?:,)?\s+([A-Z][a-z]+)"
+)
+_CATEGORIES = (
+    ("born", "birth"),
+    ("married", "marriage"),
+    ("moved", "immigration"),
+    ("school", "education"),
+    ("work", "career"),
+)
+_NOT_PLACES = {"The", "My", "Our", "We", "I", "He", "She", "They"}
+
+
+def _transcript_of(prompt: str) -> str:
+    matches = list(_TRANSCRIPT_MARKER.finditer(prompt))
+    return prompt[matches[-1].end():].strip() if matches else prompt
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE.findall(text) if s.strip()]
+
+
+def _synth_extract(transcript: str) -> Dict[str, Any]:
+    sentences = _sentences(transcript)
+    events, places, jobs = [], {}, {}
+    birth_year = None
+    for s in sentences:
+        year_m = _YEAR.search(s)
+        year = int(year_m.group(1)) if year_m else None
+        place_m = _PLACE.search(s)
+        place = place_m.group(1) if place_m and place_m.group(1) not in _NOT_PLACES else None
+        if place:
+            places.setdefault(place, {"place": place, "start_year": year, "end_year": None,
+                                      "purpose": None})
+        job_m = _JOB.search(s)
+        if job_m:
+            role = job_m.group(1).lower()
+            jobs.setdefault(role, {"role": role, "start_year": year, "end_year": None,
+                                   "location": place})
+        if year is None:
+            continue
+        category = next((c for word, c in _CATEGORIES if word in s.lower()), "milestone")
+        if category == "birth" and birth_year is None:
+            birth_year = year
+        events.append({
+            "year": year,
+            "event": " ".join(s.split()[:8]).rstrip(",.;"),
+            "description": s,
+            "location": place,
+            "category": category,
+        })
+    return {
+        "summary": " ".join(sentences[:2])[:400] or None,
+        "person_info": {"birth_year": birth_year, "birth_place": None, "death_year": None,
+                        "name": None},
+        "timeline_events": events[:25],
+        "family_members": [],
+        "locations": list(places.values())[:15],
+        "occupations": list(jobs.values())[:10],
+        "themes": ["family"] + (["immigration"] if any(
+            e["category"] == "immigration" for e in events) else []),
+    }
+
+
+def _synth_family(transcript: str) -> List[Dict[str, Any]]:
+    out, seen = [], set()
+    for m in _KIN.finditer(transcript):
+        rel, name = m.group(1).lower(), m.group(2)
+        if name in seen:
+            continue
+        seen.add(name)
+        direct = rel not in ("aunt", "uncle", "cousin")
+        out.append({
+            "name": name,
+            "relationship_to_storyteller": rel if direct else "relative",
+            "cultural_term": None if direct else rel,
+            "evidence": m.group(0),
+            "confidence": "high",
+            "birth_year": None,
+            "death_year": None,
+        })
+    return out
+
+
+def _synth_biography(transcript: str) -> str:
+    sentences = _sentences(transcript)
+    if not sentences:
+        return "## Life Story\n\nNo details were recorded."
+    third = max(1, len(sentences) // 3)
+    sections = [
+        ("Early Life", sentences[:third]),
+        ("Building a Life", sentences[third:2 * third]),
+        ("Family & Legacy", sentences[2 * third:]),
+    ]
+    return "\n\n".join(
+        f"## {title}\n\n{' '.join(body)}" for title, body in sections if body
+    )
+
+
+def synthesize(kind: str, prompt: str) -> str:
+    transcript = _transcript_of(prompt)
+    if kind == "biography":
+        return _synth_biography(transcript)
+    if kind in ("extract", "extract_window"):
+        return json.dumps(_synth_extract(transcript))
+    if kind == "family":
+        return json.dumps({"family_members": _synth_family(transcript)})
+    if kind == "combined":
+        return json.dumps({
+            "biography": _synth_biography(transcript),
+            "extract": _synth_extract(transcript),
+            "family_members": _synth_family(transcript),
+        })
+    # Free-text passes (e.g. summary reduce): first lines of the input
+    return " ".join(_sentences(transcript)[:3]) or "Summary unavailable."
+
+
+class StubProvider(LLMProvider):
+    name = "stub"
+    requires_key = False
+
+    def __init__(self):
+        super().__init__()
+        self._rng = random.Random(int(os.getenv("VIRSA_LLM_STUB_SEED", "0") or 0))
+        self._lock = threading.Lock()
+        self._recorded: Dict[str, Optional[str]] = {}
+
+    def model_id(self, model: str) -> str:
+        # Never share cache entries or quota buckets with the real model
+        return f"stub/{model}"
+
+    def _recording(self, kind: str) -> Optional[str]:
+        directory = os.getenv("VIRSA_LLM_STUB_DIR")
+        if not directory:
+            return None
+        with self._lock:
+            if kind not in self._recorded:
+                text = None
+                for ext in (".json", ".txt"):
+                    path = Path(directory) / f"{kind}{ext}"
+                    if path.exists():
+                        text = path.read_text()
+                        break
+                self._recorded[kind] = text
+            return self._recorded[kind]
+
+    def generate(self, kind, prompt, api_key, model, config=None) -> LLMResponse:
+        mean = float(os.getenv("VIRSA_LLM_STUB_LATENCY_MS", "800") or 0)
+        jitter = float(os.getenv("VIRSA_LLM_STUB_JITTER_MS", "400") or 0)
+        per_k = float(os.getenv("VIRSA_LLM_STUB_MS_PER_1K_CHARS", "50") or 0)
+        error_rate = float(os.getenv("VIRSA_LLM_STUB_ERROR_RATE", "0") or 0)
+        with self._lock:
+            delay_ms = mean + self._rng.uniform(-jitter, jitter) + per_k * len(prompt) / 1000
+            fail = self._rng.random() < error_rate
+        time.sleep(max(0.0, delay_ms) / 1000)
+        if fail:
+            raise StubAPIError(int(os.getenv("VIRSA_LLM_STUB_ERROR_CODE", "503") or 503))
+
+        text = self._recording(kind) or synthesize(kind, prompt)
+        return LLMResponse(text=text, prompt_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+
+
+PROVIDERS: Dict[str, LLMProvider] = {
+    GeminiProvider.name: GeminiProvider(),
+    StubProvider.name: StubProvider(),
+}
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    key = (name or os.getenv("VIRSA_LLM_PROVIDER") or DEFAULT_PROVIDER).strip().lower()
+    provider = PROVIDERS.get(key)
+    if provider is None:
+        raise ValueError(f"Unknown LLM provider '{key}' (have: {', '.join(PROVIDERS)})")
+    return provider
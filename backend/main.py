@@ -1,12 +1,17 @@
+import asyncio
+import json
 import os
 import threading
+import time
 import uuid
 from pathlib import Path
 from typing import List, Optional
 
 from dotenv import load_dotenv
 from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, UploadFile, Body, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from auth import (
     PLAN_LIMITS,
@@ -30,6 +35,8 @@ from billing import (
     stripe_configured,
     sync_checkout_session,
 )
+from db import async_db
+from db.db_connection import pool_stats, unit_of_work
 from db.db_operations import (
     DEFAULT_VAULT_ID,
     add_media_asset,
@@ -44,11 +51,7 @@ from db.db_operations import (
     delete_story,
     get_all_people,
     get_all_stories,
-    get_family_graph,
-    get_master_timeline,
-    get_processing_status,
     get_story,
-    get_story_full,
     get_timeline_events,
     get_vault,
     link_shared_memories_for_vault,
@@ -56,14 +59,22 @@ from db.db_operations import (
     list_shared_memories,
     list_suggestions,
     reject_suggestion,
-    search_archive,
-    set_story_status,
+    requeue_story_job,
     unlink_shared_memory,
     update_family_member,
     update_relationship,
     update_vault_culture,
 )
-from pipeline import process_transcript_story, process_uploaded_story
+from events import TERMINAL_STATUSES, get_event_broker
+from job_state import get_job_state
+from job_queue import get_job_queue
+from llm_cache import get_llm_cache
+from llm_clients import get_client_pool
+from llm_providers import get_provider
+from metrics import DB_POOL, HTTP_SECONDS, QUEUE_DEPTH, render as render_metrics
+from rate_limit import rate_limit_stats
+from routing import priority_for
+from model_registry import get_model_registry, warm_models_from_env
 
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 load_dotenv(Path(__file__).resolve().parent / ".env")
@@ -82,6 +93,51 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def _time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route template, not the raw path, so story ids do not explode the label set
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route,
+        status=response.status_code,
+    )
+    return response
+
+
+@app.on_event("startup")
+def _warm_whisper_models():
+    # Load configured Whisper sizes in the background so the API is up immediately
+    threading.Thread(target=warm_models_from_env, daemon=True).start()
+
+
+@app.on_event("startup")
+def _start_job_queue():
+    get_job_queue().start()
+    get_event_broker().start()
+
+
+@app.on_event("startup")
+async def _open_async_db():
+    await async_db.open_async_pool()
+
+
+@app.on_event("shutdown")
+async def _close_async_db():
+    await async_db.close_async_pool()
+
+
+@app.on_event("shutdown")
+def _stop_job_queue():
+    get_job_queue().stop()
+    get_job_state().stop()
+    get_event_broker().stop()
+    get_client_pool().close()
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "schema": "v2.2", "product": "living-family-history"}
@@ -121,6 +177,49 @@ def auth_login(payload: dict):
         raise HTTPException(status_code=401, detail=str(e))
 
 
+@app.get("/queue")
+def queue_status():
+    return {
+        **get_job_queue().stats(),
+        "events": get_event_broker().stats(),
+        "job_state": get_job_state().stats(),
+        "db_pool": pool_stats(),
+        "db_async_pool": async_db.async_pool_stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics_export():
+    """Prometheus text exposition of pipeline, DB, LLM and HTTP timings."""
+    depth = get_job_queue().stats()
+    QUEUE_DEPTH.set(depth.get("queued"), state="queued")
+    QUEUE_DEPTH.set(depth.get("running"), state="running")
+    pool = pool_stats()
+    for state in ("in_use", "idle", "waiting", "max"):
+        DB_POOL.set(pool[state], state=state)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/models")
+def models_status():
+    return get_model_registry().stats()
+
+
+@app.get("/llm/cache")
+def llm_cache_status():
+    return get_llm_cache().stats()
+
+
+@app.get("/llm/clients")
+def llm_client_status():
+    """Gemini client pool, per-model call latency (cold vs warm) and quota pacing."""
+    return {
+        **get_client_pool().stats(),
+        **rate_limit_stats(),
+        "provider": get_provider().stats(),
+    }
+
+
 @app.get("/auth/me")
 def auth_me(user: dict = Depends(_require_user)):
     vaults = get_user_vaults(user["sub"])
@@ -128,12 +227,12 @@ def auth_me(user: dict = Depends(_require_user)):
 
 
 @app.get("/dashboard")
-def dashboard(
+async def dashboard(
     vault_id: str = Query(DEFAULT_VAULT_ID),
     user: Optional[dict] = Depends(_optional_user),
 ):
     try:
-        return vault_dashboard_stats(vault_id)
+        return await async_db.vault_dashboard_stats(vault_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -340,8 +439,8 @@ def vault_update(payload: dict):
 
 
 @app.get("/archive/search")
-def archive_search(q: str = Query(...), vault_id: str = Query(DEFAULT_VAULT_ID)):
-    return search_archive(q, vault_id)
+async def archive_search(q: str = Query(...), vault_id: str = Query(DEFAULT_VAULT_ID)):
+    return await async_db.search_archive(q, vault_id)
 
 
 @app.get("/shared-memories")
@@ -414,11 +513,11 @@ def list_people(vault_id: str = Query(DEFAULT_VAULT_ID)):
 
 
 @app.get("/master-timeline")
-def master_timeline(
+async def master_timeline(
     vault_id: str = Query(DEFAULT_VAULT_ID),
     person_id: Optional[List[str]] = Query(None),
 ):
-    return get_master_timeline(vault_id, person_id)
+    return await async_db.get_master_timeline(vault_id, person_id)
 
 
 @app.get("/timeline/{entity_id}")
@@ -441,8 +540,8 @@ def story(story_id: str):
 
 
 @app.get("/story/{story_id}/full")
-def story_full(story_id: str):
-    result = get_story_full(story_id)
+async def story_full(story_id: str):
+    result = await async_db.get_story_full(story_id)
     if not result:
         raise HTTPException(status_code=404, detail="Story not found")
     return result
@@ -462,46 +561,86 @@ def story_delete(story_id: str):
 
 @app.get("/story/{story_id}/status")
 def story_status(story_id: str):
-    result = get_processing_status(story_id)
+    result = get_job_state().get_status(story_id)
     if not result:
         raise HTTPException(status_code=404, detail="Story not found")
     return result
 
 
-def _start_audio_job(
-    story_id: str,
-    job_id: str,
-    audio_path: str,
-    person_name: Optional[str],
-    auto_confirm: bool,
-):
-    set_story_status(story_id, "processing")
-    process_uploaded_story(
-        story_id=story_id,
-        job_id=job_id,
-        audio_path=audio_path,
-        person_name_hint=person_name,
-        auto_confirm=auto_confirm,
-    )
+@app.get("/story/{story_id}/events")
+async def story_events(story_id: str, request: Request):
+    """
+    Server-sent status stream for the processing page.
 
+    Sends the current status once, then every stage/progress change the
+    pipeline publishes, and closes when the story is ready or failed.
+    Clients fall back to polling /status if the stream is unavailable.
+    """
+    broker = get_event_broker()
+    # Subscribe before reading the snapshot so no change slips in between
+    queue = broker.subscribe(story_id)
+    try:
+        initial = await run_in_threadpool(get_job_state().get_status, story_id)
+    except Exception:
+        broker.unsubscribe(story_id, queue)
+        raise
+    if not initial:
+        broker.unsubscribe(story_id, queue)
+        raise HTTPException(status_code=404, detail="Story not found")
 
-def _start_transcript_job(
-    story_id: str,
-    job_id: str,
-    transcript: str,
-    person_name: Optional[str],
-    auto_confirm: bool,
-):
-    set_story_status(story_id, "processing")
-    process_transcript_story(
-        story_id=story_id,
-        job_id=job_id,
-        transcript=transcript,
-        person_name_hint=person_name,
-        auto_confirm=auto_confirm,
+    def _frame(data: dict) -> str:
+        return f"event: status\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def _stream():
+        try:
+            yield "retry: 3000\n" + _frame(initial)
+            if initial.get("status") in TERMINAL_STATUSES:
+                return
+            while True:
+                if await request.is_disconnected():
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _frame(event)
+                if event.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            broker.unsubscribe(story_id, queue)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+_STAGE_ORDER = ("transcript", "biography", "extract", "family")
+
+
+@app.post("/story/{story_id}/retry")
+def story_retry(story_id: str):
+    """Re-queue a failed story; the worker resumes from the first stage without a checkpoint."""
+    result = requeue_story_job(story_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="No retryable job for this story")
+    if not result["requeued"]:
+        raise HTTPException(status_code=409, detail="Story is not in a failed state or its job is still leased")
+    get_job_queue().notify()
+    done = set(result["checkpoints"])
+    if result["kind"] == "transcript":
+        done.add("transcript")
+    resume_from = next((s for s in _STAGE_ORDER if s not in done), "saving")
+    return {
+        "story_id": story_id,
+        "job_id": result["job_id"],
+        "status": "processing",
+        "resume_from": resume_from,
+    }
+
+
 @app.post("/stories/upload")
 async def upload_story(
     file: UploadFile = File(...),
@@ -509,12 +648,13 @@ async def upload_story(
     title: Optional[str] = Form(None),
     vault_id: str = Form(DEFAULT_VAULT_ID),
     auto_confirm: bool = Form(True),
+    conn=Depends(unit_of_work),
 ):
-    """Upload oral history audio → async Whisper + Gemini pipeline."""
-    if not os.getenv("GEMINI_KEY"):
+    """Upload oral history audio → queued Whisper + Gemini pipeline."""
+    if not os.getenv("GEMINI_KEY") and get_provider().requires_key:
         raise HTTPException(status_code=500, detail="GEMINI_KEY is not configured")
 
-    quota = check_story_quota(vault_id)
+    quota = check_story_quota(vault_id, conn)
     if not quota.get("allowed"):
         raise HTTPException(
             status_code=402,
@@ -524,6 +664,7 @@ async def upload_story(
     story_id = create_story_shell(
         vault_id=vault_id,
         title=title or person_name or (file.filename or "New recording"),
+        conn=conn,
     )
     if not story_id:
         raise HTTPException(status_code=500, detail="Failed to create story")
@@ -538,17 +679,24 @@ async def upload_story(
         storage_path=str(dest),
         mime_type=file.content_type,
         byte_size=len(content),
+        conn=conn,
+    )
+    job_id = create_processing_job(
+        story_id,
+        kind="audio",
+        priority=priority_for(quota.get("plan")),
+        payload={
+            "audio_path": str(dest),
+            "person_name_hint": person_name,
+            "auto_confirm": auto_confirm,
+        },
+        conn=conn,
     )
-    job_id = create_processing_job(story_id)
     if not job_id:
         raise HTTPException(status_code=500, detail="Failed to create processing job")
-
-    thread = threading.Thread(
-        target=_start_audio_job,
-        args=(story_id, job_id, str(dest), person_name, auto_confirm),
-        daemon=True,
-    )
-    thread.start()
+    # Commit the request's single transaction before waking workers to claim it
+    conn.commit()
+    get_job_queue().notify()
 
     return {
         "story_id": story_id,
@@ -565,14 +713,15 @@ async def story_from_transcript(
     title: Optional[str] = Form(None),
     vault_id: str = Form(DEFAULT_VAULT_ID),
     auto_confirm: bool = Form(True),
+    conn=Depends(unit_of_work),
 ):
     """Skip Whisper — useful for demos / paste-in oral transcripts."""
-    if not os.getenv("GEMINI_KEY"):
+    if not os.getenv("GEMINI_KEY") and get_provider().requires_key:
         raise HTTPException(status_code=500, detail="GEMINI_KEY is not configured")
     if not transcript.strip():
         raise HTTPException(status_code=400, detail="Transcript is empty")
 
-    quota = check_story_quota(vault_id)
+    quota = check_story_quota(vault_id, conn)
     if not quota.get("allowed"):
         raise HTTPException(
             status_code=402,
@@ -582,20 +731,26 @@ async def story_from_transcript(
     story_id = create_story_shell(
         vault_id=vault_id,
         title=title or person_name or "Pasted oral history",
+        conn=conn,
     )
     if not story_id:
         raise HTTPException(status_code=500, detail="Failed to create story")
 
-    job_id = create_processing_job(story_id)
+    job_id = create_processing_job(
+        story_id,
+        kind="transcript",
+        priority=priority_for(quota.get("plan")),
+        payload={
+            "transcript": transcript.strip(),
+            "person_name_hint": person_name,
+            "auto_confirm": auto_confirm,
+        },
+        conn=conn,
+    )
     if not job_id:
         raise HTTPException(status_code=500, detail="Failed to create processing job")
-
-    thread = threading.Thread(
-        target=_start_transcript_job,
-        args=(story_id, job_id, transcript.strip(), person_name, auto_confirm),
-        daemon=True,
-    )
-    thread.start()
+    conn.commit()
+    get_job_queue().notify()
 
     return {
         "story_id": story_id,
@@ -607,11 +762,11 @@ async def story_from_transcript(
 
 # ---- Family tree ----
 @app.get("/family")
-def get_family(
+async def get_family(
     vault_id: str = Query(DEFAULT_VAULT_ID),
     viewpoint: Optional[str] = Query(None, description="Person id for kinship viewpoint"),
 ):
-    return get_family_graph(vault_id, viewpoint_person_id=viewpoint)
+    return await async_db.get_family_graph(vault_id, viewpoint_person_id=viewpoint)
 
 
 @app.post("/family/member")
@@ -0,0 +1,323 @@
+"""
+Prometheus-style metrics for the API and pipeline (GET /metrics).
+
+Histograms and counters live in this process and are rendered in the text
+exposition format, so any Prometheus-compatible scraper can collect them
+without an extra dependency:
+
+  virsa_stage_seconds{stage}                 pipeline stages (decode, transcribe, biography, ...)
+  virsa_db_seconds{op}                       every get_db_connection block, by db_operations function
+  virsa_llm_call_seconds{kind,model}         provider calls, per attempt
+  virsa_llm_wait_seconds{kind}               time spent waiting on LLM slots and rate limits
+  virsa_llm_calls_total{kind,model,outcome}  ok | error | cache_hit
+  virsa_llm_tokens_total{kind,model,direction}
+  virsa_queue_wait_seconds{kind}             job enqueued (or requeued) → claimed
+  virsa_job_seconds{kind,outcome}            claimed → completed/failed
+  virsa_http_request_seconds{method,route,status}
+  virsa_routing_decisions_total{stage,model,rule}
+  virsa_db_checkout_seconds                  wait for a pooled connection
+  virsa_db_pool_connections{state}           in_use | idle | waiting | max
+  virsa_db_pool_events_total{event}          checkouts | timeouts | created | recycled | broken
+
+While a job runs, the same observations are summed into a per-job trace
+(job_scope / current_trace) that the pipeline stores in
+processing_jobs.model_info["trace"] for later analysis. The trace travels in
+a context variable; pool threads pick it up through carry_context.
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_fmt(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def set(self, value: Optional[float], **labels: Any) -> None:
+        if value is None:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_fmt(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[Any, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][idx] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = _labels(self.label_names, key, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {running}")
+            base = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{base} {round(total, 6)}")
+            lines.append(f"{self.name}_count{base} {running}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram("virsa_stage_seconds", "Pipeline stage duration.", ("stage",))
+DB_SECONDS = Histogram(
+    "virsa_db_seconds", "Database block duration (checkout, queries, commit).", ("op",), DB_BUCKETS
+)
+LLM_CALL_SECONDS = Histogram(
+    "virsa_llm_call_seconds", "LLM provider call duration per attempt.", ("kind", "model")
+)
+LLM_WAIT_SECONDS = Histogram(
+    "virsa_llm_wait_seconds", "Time waiting for an LLM slot and rate-limit tokens.", ("kind",)
+)
+LLM_CALLS = Counter("virsa_llm_calls_total", "LLM calls by outcome.", ("kind", "model", "outcome"))
+LLM_TOKENS = Counter("virsa_llm_tokens_total", "LLM tokens.", ("kind", "model", "direction"))
+QUEUE_WAIT_SECONDS = Histogram(
+    "virsa_queue_wait_seconds", "Time a job waited in the queue before a worker claimed it.", ("kind",)
+)
+JOB_SECONDS = Histogram("virsa_job_seconds", "Job run time once claimed.", ("kind", "outcome"))
+HTTP_SECONDS = Histogram(
+    "virsa_http_request_seconds", "API request duration.", ("method", "route", "status"), DB_BUCKETS + (10, 30)
+)
+QUEUE_DEPTH = Gauge("virsa_queue_jobs", "Jobs in the processing queue.", ("state",))
+DB_CHECKOUT_SECONDS = Histogram(
+    "virsa_db_checkout_seconds", "Wait for a pooled database connection.", (), DB_BUCKETS
+)
+DB_POOL = Gauge("virsa_db_pool_connections", "Database pool connections in this process.", ("state",))
+DB_POOL_EVENTS = Counter(
+    "virsa_db_pool_events_total", "Database pool checkouts, timeouts, new, recycled and broken connections.",
+    ("event",),
+)
+ROUTING_DECISIONS = Counter(
+    "virsa_routing_decisions_total", "Model routing decisions.", ("stage", "model", "rule")
+)
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ---- per-job trace ---------------------------------------------------------
+class JobTrace:
+    """Summed stage, DB and LLM timings for one job run."""
+
+    def __init__(self, job_id: str, kind: Optional[str] = None):
+        self.job_id = job_id
+        self.kind = kind or "audio"
+        self.outcome: Optional[str] = None
+        self.queue_wait_sec: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+        self.db = {"calls": 0, "sec": 0.0}
+        self.llm = {"calls": 0, "errors": 0, "cache_hits": 0, "sec": 0.0, "wait_sec": 0.0,
+                    "prompt_tokens": 0, "output_tokens": 0}
+
+    def add_stage(self, stage: str, sec: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + sec
+
+    def add_db(self, sec: float) -> None:
+        with self._lock:
+            self.db["calls"] += 1
+            self.db["sec"] += sec
+
+    def add_llm(self, **fields: float) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                self.llm[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_wait_sec": self.queue_wait_sec,
+                "stages": {k: round(v, 3) for k, v in self.stages.items()},
+                "db": {"calls": self.db["calls"], "sec": round(self.db["sec"], 3)},
+                "llm": {k: round(v, 3) if isinstance(v, float) else v for k, v in self.llm.items()},
+            }
+
+
+_current: contextvars.ContextVar[Optional[JobTrace]] = contextvars.ContextVar(
+    "virsa_job_trace", default=None
+)
+
+
+def current_trace() -> Optional[JobTrace]:
+    return _current.get()
+
+
+@contextmanager
+def job_scope(
+    job_id: str, kind: Optional[str] = None, queue_wait_sec: Optional[float] = None
+) -> Iterator[JobTrace]:
+    """Attribute everything observed in this context (and carried pool threads) to one job."""
+    trace = JobTrace(job_id, kind)
+    if queue_wait_sec is not None:
+        trace.queue_wait_sec = round(queue_wait_sec, 3)
+        QUEUE_WAIT_SECONDS.observe(queue_wait_sec, kind=trace.kind)
+    token = _current.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        JOB_SECONDS.observe(
+            time.perf_counter() - started, kind=trace.kind, outcome=trace.outcome or "unknown"
+        )
+
+
+def carry_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Run `fn` on a pool thread with the caller's job trace."""
+    ctx = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        # A fresh copy per call: one Context cannot be entered by two threads at once
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+# ---- observation helpers ---------------------------------------------------
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sec = time.perf_counter() - started
+        STAGE_SECONDS.observe(sec, stage=stage)
+        trace = _current.get()
+        if trace is not None:
+            trace.add_stage(stage, sec)
+
+
+def observe_db(op: str, sec: float) -> None:
+    DB_SECONDS.observe(sec, op=op)
+    trace = _current.get()
+    if trace is not None:
+        trace.add_db(sec)
+
+
+def observe_llm(
+    kind: str,
+    model: str,
+    sec: float,
+    ok: bool,
+    prompt_tokens: Optional[int] = None,
+    output_tokens: Optional[int] = None,
+    wait_sec: float = 0.0,
+) -> None:
+    LLM_CALL_SECONDS.observe(sec, kind=kind, model=model)
+    LLM_WAIT_SECONDS.observe(wait_sec, kind=kind)
+    LLM_CALLS.inc(kind=kind, model=model, outcome="ok" if ok else "error")
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, kind=kind, model=model, direction="prompt")
+    if output_tokens:
+        LLM_TOKENS.inc(output_tokens, kind=kind, model=model, direction="output")
+    trace = _current.get()
+    if trace is not None:
+        trace.add_llm(
+            calls=1,
+            errors=0 if ok else 1,
+            sec=sec,
+            wait_sec=wait_sec,
+            prompt_tokens=prompt_tokens or 0,
+            output_tokens=output_tokens or 0,
+        )
+
+
+def observe_llm_cache_hit(kind: str, model: str) -> None:
+    LLM_CALLS.inc(kind=kind, model=model, outcome="cache_hit")
+    trace = _current.get()
+    if trace is not None:
+        trace.add_llm(cache_hits=1)
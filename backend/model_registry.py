@@ -0,0 +1,263 @@
+"""
+Process-wide speech model registry.
+
+Each worker process loads a given model size once and shares it across
+jobs. Models are evicted when they sit idle too long or when loading a
+new size would push the registry over its memory budget.
+
+Config (env):
+  VIRSA_WHISPER_WARM        comma list to load at startup, e.g. "base" or
+                            "faster-whisper:small" (bare sizes use VIRSA_ASR_ENGINE)
+  VIRSA_WHISPER_MEMORY_MB   soft cap on resident model weights (default 3072)
+  VIRSA_WHISPER_IDLE_SEC    evict models unused for this long (default 1800, 0 = never)
+  VIRSA_WHISPER_DEVICE      torch device (default "cpu")
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Rough fp32 weight sizes, used before a model is loaded to decide what to evict.
+_ESTIMATED_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3060,
+    "large": 6170,
+    "turbo": 3240,
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _model_bytes(model: Any) -> int:
+    """Resident size of a torch module's parameters + buffers."""
+    total = 0
+    try:
+        for p in model.parameters():
+            total += p.numel() * p.element_size()
+        for b in model.buffers():
+            total += b.numel() * b.element_size()
+    except Exception:
+        return 0
+    return total
+
+
+def _load_model(key: str, device: str) -> Any:
+    from asr_backends import load_model_for_key
+
+    return load_model_for_key(key, device)
+
+
+def _estimated_bytes(key: str) -> int:
+    """Pre-load size guess from the size part of "<engine>:<size>"."""
+    engine, _, size = key.rpartition(":")
+    mb = _ESTIMATED_MB.get(size, 0)
+    if engine == "faster-whisper":
+        mb //= 4  # int8 weights
+    return mb * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ("model", "size_bytes", "last_used", "in_use", "lock")
+
+    def __init__(self, model: Any, size_bytes: int):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        # Whisper installs kv-cache hooks on the module during decode, so two
+        # transcriptions must not run on the same model object at once.
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Thread-safe cache of loaded models keyed by name."""
+
+    def __init__(
+        self,
+        loader: Callable[[str, str], Any] = _load_model,
+        memory_budget_mb: Optional[int] = None,
+        idle_sec: Optional[int] = None,
+        device: Optional[str] = None,
+    ):
+        self._loader = loader
+        self.memory_budget = (
+            memory_budget_mb
+            if memory_budget_mb is not None
+            else _env_int("VIRSA_WHISPER_MEMORY_MB", 3072)
+        ) * 1024 * 1024
+        self.idle_sec = (
+            idle_sec if idle_sec is not None else _env_int("VIRSA_WHISPER_IDLE_SEC", 1800)
+        )
+        self.device = device or os.getenv("VIRSA_WHISPER_DEVICE", "cpu")
+        self._entries: Dict[str, _Entry] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    # ---- internals -------------------------------------------------------
+    def _resident_bytes(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def _evict_locked(self, needed_bytes: int = 0) -> None:
+        """Drop idle models past TTL, then LRU idle models until `needed_bytes` fits."""
+        now = time.monotonic()
+        if self.idle_sec > 0:
+            for name, e in list(self._entries.items()):
+                if e.in_use == 0 and now - e.last_used > self.idle_sec:
+                    print(f"[models] evicting idle model '{name}'")
+                    del self._entries[name]
+                    self.evictions += 1
+
+        idle = sorted(
+            (e.last_used, name)
+            for name, e in self._entries.items()
+            if e.in_use == 0
+        )
+        for _, name in idle:
+            if self._resident_bytes() + needed_bytes <= self.memory_budget:
+                break
+            print(f"[models] evicting model '{name}' (memory budget)")
+            del self._entries[name]
+            self.evictions += 1
+
+    def _get_or_load(self, name: str) -> _Entry:
+        while True:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self.hits += 1
+                    entry.in_use += 1
+                    entry.last_used = time.monotonic()
+                    return entry
+                pending = self._loading.get(name)
+                if pending is None:
+                    # We are the loader for this name
+                    pending = threading.Event()
+                    self._loading[name] = pending
+                    self._evict_locked(_estimated_bytes(name))
+                    break
+            # Another thread is loading the same model; wait and retry
+            pending.wait()
+
+        try:
+            print(f"[models] loading '{name}' on {self.device}...")
+            started = time.monotonic()
+            model = self._loader(name, self.device)
+            # CTranslate2 models expose no torch parameters; fall back to the estimate
+            size = _model_bytes(model) or _estimated_bytes(name)
+            print(
+                f"[models] loaded '{name}' "
+                f"({size / 1e6:.0f} MB in {time.monotonic() - started:.1f}s)"
+            )
+            with self._lock:
+                entry = _Entry(model, size)
+                entry.in_use = 1
+                self._entries[name] = entry
+                self.loads += 1
+                return entry
+        finally:
+            with self._lock:
+                self._loading.pop(name, None)
+            pending.set()
+
+    def _release(self, entry: _Entry) -> None:
+        with self._lock:
+            entry.in_use = max(0, entry.in_use - 1)
+            entry.last_used = time.monotonic()
+            if entry.in_use == 0:
+                self._evict_locked()
+
+    # ---- public API ------------------------------------------------------
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """
+        Borrow a loaded model for one decode.
+
+        Holds the model's run lock for the duration so concurrent jobs that
+        want the same size queue up instead of corrupting each other's
+        kv-cache hooks.
+        """
+        entry = self._get_or_load(name)
+        try:
+            with entry.lock:
+                yield entry.model
+        finally:
+            self._release(entry)
+
+    def warm(self, names: List[str]) -> None:
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            try:
+                with self.use(name):
+                    pass
+            except Exception as e:
+                print(f"[models] warm-up failed for '{name}': {e}")
+
+    def evict(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                names = [n for n, e in self._entries.items() if e.in_use == 0]
+            else:
+                names = [name] if name in self._entries else []
+            for n in names:
+                del self._entries[n]
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": {
+                    name: {
+                        "mb": round(e.size_bytes / 1e6, 1),
+                        "in_use": e.in_use,
+                        "idle_sec": round(time.monotonic() - e.last_used, 1),
+                    }
+                    for name, e in self._entries.items()
+                },
+                "resident_mb": round(self._resident_bytes() / 1e6, 1),
+                "budget_mb": round(self.memory_budget / 1e6, 1),
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+            }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Per-process registry (created lazily, so forked workers get their own)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def warm_models_from_env() -> None:
+    from asr_backends import get_backend, model_key
+
+    engine = get_backend().name
+    keys = [
+        s.strip() if ":" in s else model_key(engine, s.strip())
+        for s in os.getenv("VIRSA_WHISPER_WARM", "").split(",")
+        if s.strip()
+    ]
+    if keys:
+        get_model_registry().warm(keys)
@@ -6,28 +6,89 @@ and drives processing-job stage updates for uploaded or paste-in stories.
 """
 from __future__ import annotations
 
+import contextvars
 import json
 import os
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
 
-import whisper
 from dotenv import load_dotenv
-from google import genai
 
 from db.db_operations import (
     finalize_story_processing,
+    get_job_checkpoints,
+    get_story_vault_plan,
     mark_story_failed,
-    update_processing_job,
+    merge_job_model_info,
+    save_job_checkpoint,
+    update_media_asset_audio,
 )
+from extract_windows import merge_extractions, split_transcript
 from family_extract import (
+    FAMILY_MEMBER_SCHEMA,
+    FAMILY_POV,
+    FAMILY_RULES,
+    FAMILY_TASK,
     family_extract_prompt,
     parse_json_response,
     sanitize_family_members,
+    storyteller_label,
 )
+from llm_cache import cache_key, get_llm_cache
+from metrics import carry_context, current_trace, observe_llm, observe_llm_cache_hit, span
+from llm_providers import get_provider
+from events import publish_status
+from job_state import get_job_state
+from progress import release_reporter, reporter_for
+from rate_limit import call_with_retries, estimate_tokens, get_rate_limiter
+from routing import DEFAULT_LLM_MODEL, route_asr, route_llm
+from asr_backends import get_backend
+from audio_cache import open_pcm, prepare_pcm
+from transcription import ProgressFn, transcribe_file, transcribe_long
 
 _BACKEND_DIR = Path(__file__).resolve().parent
 _PROJECT_ROOT = _BACKEND_DIR.parent
 
+# Run biography / extract / family Gemini passes concurrently (VIRSA_LLM_PARALLEL=0 to disable)
+LLM_PARALLEL = os.getenv("VIRSA_LLM_PARALLEL", "1").strip().lower() not in ("0", "false", "no")
+
+# Model for LLM calls outside a routed job (bench_llm, scripts); jobs use routing.route_llm
+GEMINI_MODEL = DEFAULT_LLM_MODEL
+_llm_model: contextvars.ContextVar[str] = contextvars.ContextVar("virsa_llm_model", default=GEMINI_MODEL)
+# Bump a version whenever its prompt template or post-processing changes, so
+# cached responses from the old template are no longer reused.
+PROMPT_VERSIONS = {
+    "biography": "biography-v1",
+    "extract": "extract-v1",
+    "family": "family-v1",
+    "extract_window": "extract-window-v1",
+    "extract_summary": "extract-summary-v1",
+    "combined": "combined-v2",
+}
+
+# "three-pass" (biography, extract, family as separate calls) or "combined"
+# (one structured call returning all three; falls back to three-pass on a bad reply)
+LLM_MODE = os.getenv("VIRSA_LLM_MODE", "three-pass").strip().lower()
+
+# Transcripts longer than this are extracted in overlapping windows (0 = never)
+EXTRACT_WINDOW_CHARS = int(os.getenv("VIRSA_EXTRACT_WINDOW_CHARS", "40000") or 0)
+EXTRACT_OVERLAP_CHARS = int(os.getenv("VIRSA_EXTRACT_OVERLAP_CHARS", "2000") or 0)
+EXTRACT_WINDOW_WORKERS = int(os.getenv("VIRSA_EXTRACT_WINDOW_WORKERS", "4") or 1)
+
+# Optional cap on in-flight LLM calls shared across processes (set by bulk_import)
+_llm_slots = None
+
+
+def set_llm_slots(semaphore) -> None:
+    """Gate every provider call on `semaphore` (e.g. a multiprocessing.BoundedSemaphore)."""
+    global _llm_slots
+    _llm_slots = semaphore
+
 
 def _load_gemini_key() -> str | None:
     """Load GEMINI_KEY from project root .env, then backend .env (backend wins)."""
@@ -36,19 +97,140 @@ def _load_gemini_key() -> str | None:
     return os.getenv("GEMINI_KEY")
 
 
-def transcribe_audio(audio_file, model_size: str = "base"):
+def _require_llm_key() -> str | None:
+    """GEMINI_KEY, or None when the configured provider runs without one (stub)."""
+    api_key = _load_gemini_key()
+    if not api_key and get_provider().requires_key:
+        raise RuntimeError("GEMINI_KEY is not set")
+    return api_key
+
+
+def transcribe_audio(
+    audio_file,
+    model_size: str = "base",
+    progress: Optional[ProgressFn] = None,
+):
     print(f"Transcribing audio with Whisper '{model_size}'...")
-    model = whisper.load_model(model_size, device="cpu")
-    result = model.transcribe(audio_file, task="translate")
-    print("Transcription complete.")
+    result = transcribe_file(audio_file, model_size, task="translate", progress=progress)
+    print(f"Transcription complete ({result['chunks']} chunk(s)).")
     return result["text"]
 
 
-def parse_text_gemini(transcript, api_key):
-    print("\nOrganizing text with AI...\n")
-    client = genai.Client(api_key=api_key)
+def _generate(
+    kind: str,
+    prompt: str,
+    api_key: str,
+    use_cache: Optional[bool] = None,
+    validate: Optional[Callable[[str], bool]] = None,
+    config: Optional[dict] = None,
+) -> str:
+    """
+    Call the configured LLM provider (Gemini by default) through the response
+    cache, paced by the cross-worker rate limiter and retried on transient errors.
 
-    prompt = f"""
+    Only responses that pass `validate` are stored, so a malformed reply is
+    retried rather than replayed. use_cache=False bypasses the cache.
+    """
+    provider = get_provider()
+    model = _llm_model.get()
+    model_id = provider.model_id(model)
+    cache = get_llm_cache()
+    key = cache_key(model_id, PROMPT_VERSIONS[kind], prompt)
+    if use_cache is not False:
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"[llm-cache] hit {kind} {key[:12]}")
+            observe_llm_cache_hit(kind, model_id)
+            return cached
+
+    limiter = get_rate_limiter(model_id)
+
+    def _attempt(deadline: float):
+        # Each attempt is a new request against the shared RPM/TPM quota
+        estimate = estimate_tokens(prompt)
+        waiting = time.perf_counter()
+        with _llm_slots or nullcontext():
+            limiter.acquire(estimate, deadline)
+            started = time.perf_counter()
+            try:
+                response = provider.complete(kind, prompt, api_key, model, config)
+            except Exception:
+                observe_llm(kind, model_id, time.perf_counter() - started, ok=False,
+                            wait_sec=started - waiting)
+                raise
+        observe_llm(
+            kind,
+            model_id,
+            time.perf_counter() - started,
+            ok=True,
+            prompt_tokens=response.prompt_tokens,
+            output_tokens=response.output_tokens,
+            wait_sec=started - waiting,
+        )
+        limiter.settle(estimate, response.total_tokens)
+        return response
+
+    response = call_with_retries(_attempt, label=kind)
+    text = response.text
+    if use_cache is not False and (validate is None or validate(text)):
+        cache.put(key, text, model=model_id, kind=kind)
+    return text
+
+
+def _transcribe_for_job(job_id: str, story_id: str, audio_path: str) -> str:
+    """
+    Transcribe with chunk progress and record ASR details on the job.
+
+    The model size is routed from the vault plan and recording length
+    (routing.route_asr); the engine follows VIRSA_ASR_ENGINE.
+    Decode time is stored as a real-time factor so later jobs get an ETA.
+    """
+    reporter = reporter_for(job_id)
+    # Decoded once per file content; retries and re-runs map the cached PCM
+    with span("decode"):
+        asset = prepare_pcm(audio_path)
+    update_media_asset_audio(
+        story_id, audio_path, round(asset.duration_sec, 2), asset.checksum
+    )
+    route = route_asr(get_story_vault_plan(story_id), asset.duration_sec)
+    merge_job_model_info(job_id, {"asr_route": route.as_dict()})
+    model_size = route.model
+    print(f"Transcribing audio with '{model_size}'...")
+    reporter.start_transcription(asset.duration_sec, get_backend().name, model_size)
+    started = time.monotonic()
+    with span("transcribe"):
+        result = transcribe_long(
+            open_pcm(asset.path),
+            model_size,
+            task="translate",
+            progress=reporter.audio_decoded,
+            pcm_path=asset.path,
+        )
+    decode_sec = time.monotonic() - started
+    merge_job_model_info(
+        job_id,
+        {
+            "asr": {
+                "engine": result["engine"],
+                "model": model_size,
+                "audio_sec": round(result["duration_sec"], 2),
+                "chunks": result["chunks"],
+                "vad": result["vad"],
+                "decode_sec": round(decode_sec, 2),
+                "rtf": (
+                    round(decode_sec / result["duration_sec"], 4)
+                    if result["duration_sec"]
+                    else None
+                ),
+            }
+        },
+    )
+    return result["text"]
+
+
+# Biography and extract instructions are shared with _combined_prompt, so the
+# single-call mode is asked for exactly what the three passes are asked for.
+_BIOGRAPHY_INSTRUCTIONS = """
         You are VirsaAI — a thoughtful archivist that organizes real spoken life stories
         into clear, readable sections that reflect the person’s journey.
 
@@ -78,18 +260,25 @@ def parse_text_gemini(transcript, api_key):
         - Merge overlapping or repeated ideas into one coherent section.
 
         3. Maintain chronological flow — from earliest memories to later reflections.
+"""
 
 
+def _biography_prompt(transcript: str) -> str:
+    return f"""{_BIOGRAPHY_INSTRUCTIONS}
+
         ### Transcript:
         {transcript}
         """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
-    )
 
-    organized_story = response.text.strip()
+def parse_text_gemini(transcript, api_key, use_cache: Optional[bool] = None):
+    print("\nOrganizing text with AI...\n")
+
+    prompt = _biography_prompt(transcript)
+
+    organized_story = _generate(
+        "biography", prompt, api_key, use_cache, validate=lambda t: bool(t.strip())
+    ).strip()
 
     print("\nHISTORICAL STORY:\n")
     print(organized_story)
@@ -97,11 +286,7 @@ def parse_text_gemini(transcript, api_key):
     return organized_story
 
 
-def extract_key_data(transcript, api_key):
-    print("\nExtracting JSON...\n")
-    client = genai.Client(api_key=api_key)
-
-    prompt = f"""
+_EXTRACT_INSTRUCTIONS = """
         You are an information extraction system for life story archiving.
 
         Your job is to convert a raw life story transcript into a structured JSON object optimized for:
@@ -121,12 +306,12 @@ def extract_key_data(transcript, api_key):
         1. "summary": A 2–3 sentence summary of the life story.
 
         2. "person_info": Basic information about the main person (the storyteller):
-           {{
+           {
              "birth_year": Integer or null,
              "birth_place": String or null,
              "death_year": Integer or null (if mentioned),
              "name": String or null (if mentioned in third person)
-           }}
+           }
 
         3. "timeline_events": Chronological list of ONLY the most significant and note-worthy events that would be seen in a timeline.
            
@@ -144,33 +329,33 @@ def extract_key_data(transcript, api_key):
            - Vague memories without clear dates or importance
            
            Each event includes:
-           {{
+           {
              "year": Integer or null,
              "event": String (concise title/summary of event),
              "description": String (longer description with more context),
              "location": String or null (where it happened),
              "category": String (e.g., "birth", "immigration", "marriage", "education", "career", "family", "milestone")
-           }}
+           }
 
         4. "family_members": []  (always empty — family tree is extracted separately)
 
         5. "locations": Places where the person lived or spent significant time.
            Each location includes:
-           {{
+           {
              "place": String (city, region, or country),
              "start_year": Integer or null,
              "end_year": Integer or null,
              "purpose": String or null (e.g., "birthplace", "childhood home", "immigration destination", "work")
-           }}
+           }
 
         6. "occupations": Career or work history (if mentioned).
            Each occupation includes:
-           {{
+           {
              "role": String (job title or occupation),
              "start_year": Integer or null,
              "end_year": Integer or null,
              "location": String or null (where they worked)
-           }}
+           }
 
         7. "themes": Key themes or topics (for searchability).
            Array of strings (e.g., ["immigration", "family", "education", "resilience", "faith", "community"])
@@ -180,41 +365,156 @@ def extract_key_data(transcript, api_key):
         - Use null for missing/unknown values
         - Use empty arrays [] if a section has no data
         - Include all fields described above in the JSON structure
+"""
+
 
-        Here is the raw life story transcript:
+def _extract_prompt(transcript: str, note: str = "") -> str:
+    return f"""{_EXTRACT_INSTRUCTIONS}
+        {note}Here is the raw life story transcript:
         {transcript}
     """
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
+
+
+def extract_key_data(
+    transcript,
+    api_key,
+    use_cache: Optional[bool] = None,
+    on_window: Optional[Callable[[int, int], None]] = None,
+):
+    """`on_window(done, total)` reports windowed-extraction progress."""
+    if EXTRACT_WINDOW_CHARS > 0 and len(transcript) > EXTRACT_WINDOW_CHARS:
+        return _extract_key_data_windowed(transcript, api_key, use_cache, on_window)
+
+    print("\nExtracting JSON...\n")
+
+    prompt = _extract_prompt(transcript)
+    text = _generate(
+        "extract",
+        prompt,
+        api_key,
+        use_cache,
+        validate=lambda t: valid_extract(parse_json_response(t)),
     )
 
     print("\nJSON:\n")
-    print(response.text)
+    print(text)
 
-    extracted_data = parse_json_response(response.text)
+    extracted_data = parse_json_response(text)
     if not extracted_data:
-        print(f"\nError parsing JSON. Raw response: {response.text}")
+        print(f"\nError parsing JSON. Raw response: {text}")
         return None
     return extracted_data
 
 
+def _extract_window(
+    window: str, index: int, total: int, api_key: str, use_cache: Optional[bool]
+) -> Optional[dict]:
+    note = (
+        f"This is part {index} of {total} of a longer transcript (parts overlap slightly). "
+        "Extract only what this part states; for \"summary\" summarize this part only.\n\n        "
+    )
+    try:
+        text = _generate(
+            "extract_window",
+            _extract_prompt(window, note),
+            api_key,
+            use_cache,
+            validate=lambda t: valid_extract(parse_json_response(t)),
+        )
+    except Exception as e:
+        print(f"[pipeline] extract window {index}/{total} failed: {e}")
+        return None
+    data = parse_json_response(text)
+    if not data:
+        print(f"[pipeline] extract window {index}/{total} returned invalid JSON")
+    return data
+
+
+def _reduce_summary(summaries: list, api_key: str, use_cache: Optional[bool]) -> Optional[str]:
+    prompt = f"""
+        Combine these partial summaries of one person's recorded life story, given
+        in the order they were told, into a single 2–3 sentence summary. Use only
+        facts stated below. Return the summary text only.
+
+        {chr(10).join(f"- {s}" for s in summaries)}
+        """
+    text = _generate(
+        "extract_summary", prompt, api_key, use_cache, validate=lambda t: bool(t.strip())
+    ).strip()
+    return text or None
+
+
+def _extract_key_data_windowed(
+    transcript: str,
+    api_key: str,
+    use_cache: Optional[bool],
+    on_window: Optional[Callable[[int, int], None]] = None,
+):
+    """
+    Map-reduce extraction: overlapping windows are extracted in parallel and
+    merged, so latency follows the longest window rather than the transcript.
+
+    Any window still failing after its retries fails the whole extract, so a
+    partial merge is never checkpointed or finalized. Windows that succeeded
+    are in the LLM cache (unless use_cache=False), so a retry only pays for
+    the failed ones.
+    """
+    windows = split_transcript(transcript, EXTRACT_WINDOW_CHARS, EXTRACT_OVERLAP_CHARS)
+    total = len(windows)
+    print(f"\nExtracting JSON from {total} windows ({len(transcript)} chars)...\n")
+    lock = threading.Lock()
+    finished = [0]
+
+    def _run(index: int, window: str) -> Optional[dict]:
+        part = _extract_window(window, index, total, api_key, use_cache)
+        if on_window:
+            with lock:
+                finished[0] += 1
+                done = finished[0]
+            on_window(done, total + 1)  # +1: summary reduce
+        return part
+
+    with ThreadPoolExecutor(max_workers=max(1, min(total, EXTRACT_WINDOW_WORKERS))) as pool:
+        parts = list(pool.map(carry_context(lambda iw: _run(*iw)), enumerate(windows, 1)))
+    failed = [i for i, p in enumerate(parts, 1) if p is None]
+    if failed:
+        raise RuntimeError(f"Extraction failed for window(s) {failed} of {total}")
+    merged = merge_extractions(parts)
+    if merged is None:
+        return None
+
+    summaries = [p["summary"] for p in parts if p and p.get("summary")]
+    if len(summaries) > 1:
+        try:
+            merged["summary"] = _reduce_summary(summaries, api_key, use_cache) or merged["summary"]
+        except Exception as e:
+            print(f"[pipeline] summary reduce failed, keeping first window's: {e}")
+    print(
+        f"[pipeline] merged {total} windows → {len(merged['timeline_events'])} events, "
+        f"{len(merged['locations'])} places, {len(merged['occupations'])} occupations"
+    )
+    return merged
+
+
 def extract_family_tree(
     transcript: str,
     api_key: str,
     storyteller_name: str | None = None,
+    use_cache: Optional[bool] = None,
 ) -> list:
     """Focused Gemini pass for pedigree-safe family members."""
     print("\nExtracting family tree (strict)…\n")
-    client = genai.Client(api_key=api_key)
     prompt = family_extract_prompt(transcript, storyteller_name)
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
+    text = _generate(
+        "family",
+        prompt,
+        api_key,
+        use_cache,
+        validate=lambda t: parse_json_response(t) is not None,
     )
     print("\nFAMILY JSON:\n")
-    print(response.text)
-    data = parse_json_response(response.text) or {}
+    print(text)
+    data = parse_json_response(text) or {}
     members = data.get("family_members") or []
     sanitized = sanitize_family_members(members, transcript, storyteller_name)
     print("\nFAMILY SANITIZED:\n")
@@ -222,61 +522,402 @@ def extract_family_tree(
     return sanitized
 
 
+def valid_extract(data: Any) -> bool:
+    """Shape check for the structured extract consumed by _apply_extracted_to_graph."""
+    if not isinstance(data, dict):
+        return False
+    if not isinstance(data.get("person_info") or {}, dict):
+        return False
+    for section in ("timeline_events", "locations", "occupations"):
+        items = data.get(section) or []
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            return False
+    return isinstance(data.get("themes") or [], list)
+
+
+def _valid_combined(data: Any) -> bool:
+    return (
+        isinstance(data, dict)
+        and isinstance(data.get("biography"), str)
+        and bool(data["biography"].strip())
+        and valid_extract(data.get("extract"))
+        and isinstance(data.get("family_members") or [], list)
+    )
+
+
+def _combined_prompt(transcript: str, storyteller_name: str | None) -> str:
+    """The three pass prompts' instructions, verbatim, behind one JSON envelope."""
+    return f"""
+From ONE transcript, produce the results of three tasks in a single JSON object.
+Follow each task's instructions below exactly; where a task says to output only
+its result, that result is the value of its key in this object.
+
+Storyteller: {storyteller_label(storyteller_name)}
+
+Return ONLY valid JSON:
+{{
+  "biography": "TASK 1 result as a markdown string",
+  "extract": {{ "TASK 2 result": "the JSON object described in TASK 2" }},
+  "family_members": [
+{FAMILY_MEMBER_SCHEMA}
+  ]
+}}
+
+=== TASK 1: "biography" ===
+{textwrap.dedent(_BIOGRAPHY_INSTRUCTIONS).strip()}
+
+=== TASK 2: "extract" ===
+{textwrap.dedent(_EXTRACT_INSTRUCTIONS).strip()}
+
+=== TASK 3: "family_members" ===
+{FAMILY_TASK}
+{FAMILY_POV}
+
+{FAMILY_RULES}
+
+Transcript:
+{transcript}
+""".strip()
+
+
+def extract_combined(
+    transcript: str,
+    api_key: str,
+    storyteller_name: str | None = None,
+    use_cache: Optional[bool] = None,
+) -> Optional[Tuple[str, dict, list]]:
+    """
+    One structured call for biography + extract + family.
+
+    Returns None when the reply does not match the schema, so the caller can
+    fall back to the three-pass flow.
+    """
+    print("\nBiography + extract + family (combined)...\n")
+    text = _generate(
+        "combined",
+        _combined_prompt(transcript, storyteller_name),
+        api_key,
+        use_cache,
+        validate=lambda t: _valid_combined(parse_json_response(t)),
+        config={"response_mime_type": "application/json"},
+    )
+    data = parse_json_response(text)
+    if not _valid_combined(data):
+        print(f"\nCombined reply failed validation. Raw response: {text[:500]}")
+        return None
+    extracted_data = data["extract"]
+    extracted_data["family_members"] = []
+    storyteller = _storyteller_name(storyteller_name, extracted_data)
+    family = sanitize_family_members(data.get("family_members") or [], transcript, storyteller)
+    print("\nFAMILY SANITIZED:\n")
+    print(json.dumps(family, indent=2))
+    return data["biography"].strip(), extracted_data, family
+
+
+def _trace_info() -> dict:
+    """Per-job stage/DB/LLM timings for model_info (empty outside a job_scope)."""
+    trace = current_trace()
+    return {"trace": trace.snapshot()} if trace is not None else {}
+
+
 def _fail_job(story_id: str, job_id: str, error: str) -> None:
     print(f"[pipeline] FAILED story={story_id} job={job_id}: {error}")
-    update_processing_job(job_id, stage="failed", progress=1.0, error=error)
+    trace = current_trace()
+    if trace is not None:
+        trace.outcome = "failed"
+        merge_job_model_info(job_id, _trace_info())
+    get_job_state().update(job_id, stage="failed", progress=1.0, error=error, story_id=story_id)
     mark_story_failed(story_id, error)
+    publish_status(story_id, job_id, stage="failed", progress=1.0, error=error)
+    release_reporter(job_id)
 
 
-def _run_post_transcript(
+def _biography_stage(
+    job_id: str,
+    checkpoints: dict,
+    transcript: str,
+    api_key: str,
+    use_cache: Optional[bool] = None,
+) -> str:
+    if checkpoints.get("biography"):
+        print(f"[pipeline] biography restored from checkpoint job={job_id}")
+        return checkpoints["biography"]
+    with span("biography"):
+        biography = parse_text_gemini(transcript, api_key, use_cache)
+    save_job_checkpoint(job_id, "biography", biography)
+    return biography
+
+
+def _extract_stage(
+    job_id: str,
+    checkpoints: dict,
+    transcript: str,
+    api_key: str,
+    use_cache: Optional[bool] = None,
+) -> dict | None:
+    if checkpoints.get("extract"):
+        print(f"[pipeline] extract restored from checkpoint job={job_id}")
+        return dict(checkpoints["extract"])
+    reporter = reporter_for(job_id)
+    with span("extract"):
+        extracted_data = extract_key_data(
+            transcript,
+            api_key,
+            use_cache,
+            on_window=lambda done, total: reporter.llm_partial("extract", done, total),
+        )
+    if extracted_data:
+        save_job_checkpoint(job_id, "extract", extracted_data)
+    return extracted_data
+
+
+def _family_stage(
+    job_id: str,
+    checkpoints: dict,
+    transcript: str,
+    api_key: str,
+    storyteller: str | None,
+    use_cache: Optional[bool] = None,
+) -> list:
+    if "family" in checkpoints:
+        print(f"[pipeline] family restored from checkpoint job={job_id}")
+        return list(checkpoints["family"] or [])
+    try:
+        with span("family"):
+            family = extract_family_tree(transcript, api_key, storyteller, use_cache)
+    except Exception as fe:
+        # Not checkpointed, so a retry gets another chance at the family pass
+        print(f"[pipeline] family extract failed, leaving unattached: {fe}")
+        return []
+    save_job_checkpoint(job_id, "family", family)
+    return family
+
+
+# LLM passes of the three-pass flow; each is an equal share of the LLM progress band
+_LLM_PASSES = ("biography", "extract", "family")
+
+
+def _pending_passes(checkpoints: dict) -> list:
+    """LLM passes the *_stage functions will actually run (same restore tests)."""
+    restored = {
+        "biography": bool(checkpoints.get("biography")),
+        "extract": bool(checkpoints.get("extract")),
+        "family": "family" in checkpoints,
+    }
+    return [p for p in _LLM_PASSES if not restored[p]]
+
+
+def _storyteller_name(person_name_hint: str | None, extracted_data: dict) -> str | None:
+    return (
+        person_name_hint
+        or (extracted_data.get("person_info") or {}).get("name")
+        or None
+    )
+
+
+def _llm_passes_sequential(
     story_id: str,
     job_id: str,
     transcript: str,
     api_key: str,
     person_name_hint: str | None,
-    auto_confirm: bool,
-) -> None:
+    checkpoints: dict,
+    use_cache: Optional[bool] = None,
+) -> Tuple[str, dict, list]:
+    reporter = reporter_for(job_id)
     print(f"[pipeline] writing biography for story={story_id}")
-    update_processing_job(job_id, stage="writing", progress=0.45)
-    biography = parse_text_gemini(transcript, api_key)
+    reporter.start_llm(_pending_passes(checkpoints), len(transcript), of=len(_LLM_PASSES))
+    biography = _biography_stage(job_id, checkpoints, transcript, api_key, use_cache)
 
     print(f"[pipeline] extracting structured data for story={story_id}")
-    update_processing_job(job_id, stage="extracting", progress=0.65)
-    extracted_data = extract_key_data(transcript, api_key)
+    reporter.llm_done("biography", stage="extracting")
+    extracted_data = _extract_stage(job_id, checkpoints, transcript, api_key, use_cache)
     if not extracted_data:
         raise RuntimeError("Failed to extract structured data from transcript")
+    reporter.llm_done("extract")
 
     # Dedicated family pass — never trust the general extract for tree edges
-    update_processing_job(job_id, stage="extracting", progress=0.78)
-    storyteller = (
-        person_name_hint
-        or (extracted_data.get("person_info") or {}).get("name")
-        or None
+    storyteller = _storyteller_name(person_name_hint, extracted_data)
+    family = _family_stage(
+        job_id, checkpoints, transcript, api_key, storyteller, use_cache
     )
+    reporter.llm_done("family")
+    return biography, extracted_data, family
+
+
+def _llm_passes_parallel(
+    story_id: str,
+    job_id: str,
+    transcript: str,
+    api_key: str,
+    person_name_hint: str | None,
+    checkpoints: dict,
+    use_cache: Optional[bool] = None,
+) -> Tuple[str, dict, list]:
+    """
+    Biography and structured extract run side by side. The family pass only
+    needs the storyteller name: it starts immediately when the caller gave a
+    hint, otherwise as soon as the extract has produced person_info.name.
+    Passes restored from checkpoints are left out of the progress units and
+    count as already done.
+    """
+    print(f"[pipeline] writing biography + extracting (parallel) for story={story_id}")
+    reporter = reporter_for(job_id)
+    reporter.start_llm(_pending_passes(checkpoints), len(transcript), of=len(_LLM_PASSES))
+
+    lock = threading.Lock()
+    state = {"biography_done": False}
+
+    def _mark_done(future, unit: str) -> None:
+        # Stage stays "writing" until the biography lands
+        if future.cancelled() or future.exception() is not None:
+            return
+        with lock:
+            state["biography_done"] = state["biography_done"] or unit == "biography"
+            stage = "extracting" if state["biography_done"] else "writing"
+        reporter.llm_done(unit, stage=stage)
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="llm") as pool:
+        bio_f = pool.submit(
+            carry_context(_biography_stage), job_id, checkpoints, transcript, api_key, use_cache
+        )
+        bio_f.add_done_callback(lambda f: _mark_done(f, "biography"))
+        ext_f = pool.submit(
+            carry_context(_extract_stage), job_id, checkpoints, transcript, api_key, use_cache
+        )
+        ext_f.add_done_callback(lambda f: _mark_done(f, "extract"))
+        fam_f = None
+        if person_name_hint:
+            fam_f = pool.submit(
+                carry_context(_family_stage),
+                job_id,
+                checkpoints,
+                transcript,
+                api_key,
+                person_name_hint,
+                use_cache,
+            )
+            fam_f.add_done_callback(lambda f: _mark_done(f, "family"))
+
+        extracted_data = ext_f.result()
+        if not extracted_data:
+            # The biography (and hinted family) calls are already in flight and
+            # cannot be interrupted; leaving the pool waits for them, so failure
+            # latency is bounded by the slowest pass. Their checkpoints are kept
+            # and save those calls on retry.
+            raise RuntimeError("Failed to extract structured data from transcript")
+
+        if fam_f is None:
+            storyteller = _storyteller_name(None, extracted_data)
+            fam_f = pool.submit(
+                carry_context(_family_stage),
+                job_id,
+                checkpoints,
+                transcript,
+                api_key,
+                storyteller,
+                use_cache,
+            )
+            fam_f.add_done_callback(lambda f: _mark_done(f, "family"))
+
+        biography = bio_f.result()
+        family = fam_f.result()
+    return biography, extracted_data, family
+
+
+def _llm_passes_combined(
+    story_id: str,
+    job_id: str,
+    transcript: str,
+    api_key: str,
+    person_name_hint: str | None,
+    checkpoints: dict,
+    use_cache: Optional[bool] = None,
+) -> Tuple[str, dict, list]:
+    """Single-call mode; three-pass for windowed transcripts or an invalid reply."""
+    fallback = _llm_passes_parallel if LLM_PARALLEL else _llm_passes_sequential
+    restored = all(k in checkpoints for k in ("biography", "extract", "family"))
+    too_long = EXTRACT_WINDOW_CHARS > 0 and len(transcript) > EXTRACT_WINDOW_CHARS
+    if restored or too_long:
+        return fallback(
+            story_id, job_id, transcript, api_key, person_name_hint, checkpoints, use_cache
+        )
+
+    print(f"[pipeline] writing + extracting (combined) for story={story_id}")
+    reporter = reporter_for(job_id)
+    reporter.start_llm(["combined"], len(transcript))
+    with span("combined"):
+        result = extract_combined(transcript, api_key, person_name_hint, use_cache)
+    if result is None:
+        print(f"[pipeline] combined reply invalid, falling back to three passes story={story_id}")
+        return fallback(
+            story_id, job_id, transcript, api_key, person_name_hint, checkpoints, use_cache
+        )
+    biography, extracted_data, family = result
+    save_job_checkpoint(job_id, "biography", biography)
+    save_job_checkpoint(job_id, "extract", extracted_data)
+    save_job_checkpoint(job_id, "family", family)
+    reporter.llm_done("combined", stage="extracting")
+    return biography, extracted_data, family
+
+
+def _run_post_transcript(
+    story_id: str,
+    job_id: str,
+    transcript: str,
+    api_key: str,
+    person_name_hint: str | None,
+    auto_confirm: bool,
+    use_cache: Optional[bool] = None,
+    checkpoints: Optional[dict] = None,
+) -> None:
+    if LLM_MODE == "combined":
+        run_passes = _llm_passes_combined
+    else:
+        run_passes = _llm_passes_parallel if LLM_PARALLEL else _llm_passes_sequential
+    route = route_llm(get_story_vault_plan(story_id), estimate_tokens(transcript))
+    merge_job_model_info(job_id, {"llm_route": route.as_dict()})
+    # Every _generate call of this job (including pool threads) uses the routed model
+    token = _llm_model.set(route.model)
     try:
-        family = extract_family_tree(transcript, api_key, storyteller)
-    except Exception as fe:
-        print(f"[pipeline] family extract failed, leaving unattached: {fe}")
-        family = []
+        biography, extracted_data, family = run_passes(
+            story_id,
+            job_id,
+            transcript,
+            api_key,
+            person_name_hint,
+            checkpoints or {},
+            use_cache,
+        )
+    finally:
+        _llm_model.reset(token)
     extracted_data["family_members"] = family
 
     summary = extracted_data.get("summary")
 
     print(f"[pipeline] saving results for story={story_id}")
-    update_processing_job(job_id, stage="saving", progress=0.9)
-    ok = finalize_story_processing(
-        story_id=story_id,
-        transcript=transcript,
-        biography=biography,
-        summary=summary,
-        extracted_data=extracted_data,
-        person_name_hint=person_name_hint,
-        auto_confirm=auto_confirm,
-    )
+    reporter = reporter_for(job_id)
+    reporter.stage("saving", 0.9)
+    with span("finalize"):
+        ok = finalize_story_processing(
+            story_id=story_id,
+            transcript=transcript,
+            biography=biography,
+            summary=summary,
+            extracted_data=extracted_data,
+            person_name_hint=person_name_hint,
+            auto_confirm=auto_confirm,
+            job_id=job_id,
+        )
     if not ok:
         raise RuntimeError("finalize_story_processing failed")
 
-    update_processing_job(job_id, stage="completed", progress=1.0)
+    trace = current_trace()
+    if trace is not None:
+        trace.outcome = "completed"
+    merge_job_model_info(job_id, {**reporter.timings(), **_trace_info()})
+    reporter.stage("completed", 1.0)
+    release_reporter(job_id)
     print(f"[pipeline] completed story={story_id} job={job_id}")
 
 
@@ -286,21 +927,30 @@ def process_uploaded_story(
     audio_path: str,
     person_name_hint: str | None = None,
     auto_confirm: bool = True,
+    use_cache: Optional[bool] = None,
 ) -> None:
-    """Full pipeline: Whisper → Gemini biography → extract → finalize."""
+    """
+    Full pipeline: Whisper → Gemini biography → extract → finalize.
+
+    Each stage output is checkpointed on the job; a retried job resumes from
+    the first stage without a checkpoint.
+    """
     print(f"[pipeline] queued story={story_id} job={job_id} audio={audio_path}")
-    update_processing_job(job_id, stage="queued", progress=0.0)
+    reporter_for(job_id, story_id).stage("queued", 0.0)
 
     try:
-        api_key = _load_gemini_key()
-        if not api_key:
-            raise RuntimeError("GEMINI_KEY is not set")
-
-        print(f"[pipeline] transcribing story={story_id}")
-        update_processing_job(job_id, stage="transcribing", progress=0.1)
-        transcript = transcribe_audio(audio_path, model_size="base")
-        if not transcript or not str(transcript).strip():
-            raise RuntimeError("Transcription produced empty text")
+        api_key = _require_llm_key()
+
+        checkpoints = get_job_checkpoints(job_id)
+        transcript = checkpoints.get("transcript")
+        if transcript:
+            print(f"[pipeline] transcript restored from checkpoint story={story_id}")
+        else:
+            print(f"[pipeline] transcribing story={story_id}")
+            transcript = _transcribe_for_job(job_id, story_id, audio_path)
+            if not transcript or not str(transcript).strip():
+                raise RuntimeError("Transcription produced empty text")
+            save_job_checkpoint(job_id, "transcript", transcript)
 
         _run_post_transcript(
             story_id=story_id,
@@ -309,6 +959,8 @@ def process_uploaded_story(
             api_key=api_key,
             person_name_hint=person_name_hint,
             auto_confirm=auto_confirm,
+            use_cache=use_cache,
+            checkpoints=checkpoints,
         )
     except Exception as e:
         _fail_job(story_id, job_id, str(e))
@@ -320,15 +972,14 @@ def process_transcript_story(
     transcript: str,
     person_name_hint: str | None = None,
     auto_confirm: bool = True,
+    use_cache: Optional[bool] = None,
 ) -> None:
     """Skip Whisper — run Gemini biography + extract from an existing transcript."""
     print(f"[pipeline] queued (transcript) story={story_id} job={job_id}")
-    update_processing_job(job_id, stage="queued", progress=0.0)
+    reporter_for(job_id, story_id).stage("queued", 0.0)
 
     try:
-        api_key = _load_gemini_key()
-        if not api_key:
-            raise RuntimeError("GEMINI_KEY is not set")
+        api_key = _require_llm_key()
 
         if not transcript or not str(transcript).strip():
             raise RuntimeError("Transcript is empty")
@@ -341,6 +992,8 @@ def process_transcript_story(
             api_key=api_key,
             person_name_hint=person_name_hint,
             auto_confirm=auto_confirm,
+            use_cache=use_cache,
+            checkpoints=get_job_checkpoints(job_id),
         )
     except Exception as e:
         _fail_job(story_id, job_id, str(e))
@@ -0,0 +1,263 @@
+"""
+Live processing progress and ETA for pipeline jobs.
+
+Progress follows the work actually done instead of fixed stage steps:
+
+  queued        0.00
+  transcribing  0.10 → 0.45   decoded audio seconds / recording length
+  writing,
+  extracting    0.45 → 0.90   finished LLM passes (and windows within a pass)
+  saving        0.90
+  completed     1.00
+
+Writes are throttled (stage changes always go through), so per-chunk
+callbacks do not turn into per-chunk UPDATEs. Every write is also published
+as a status event for SSE subscribers (events.py); the row itself is written
+behind by job_state. The ETA starts from median
+stage timings of recent completed jobs — ASR real-time factor per
+engine:model, LLM seconds per 1000 transcript characters — and switches to
+the job's own observed rate once it has made some progress.
+
+Config (env):
+  VIRSA_PROGRESS_MIN_INTERVAL_SEC  minimum time between progress writes (default 2)
+  VIRSA_PROGRESS_MIN_STEP          ...unless progress moved at least this much (default 0.05)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from db.db_operations import get_stage_timing_history
+from events import publish_status
+from job_state import get_job_state
+
+TRANSCRIBE_BAND = (0.10, 0.45)
+LLM_BAND = (0.45, 0.90)
+# Rough English speech rate, to size the LLM stage before the transcript exists
+CHARS_PER_AUDIO_SEC = 15.0
+_HISTORY_TTL_SEC = 600
+
+_history: Dict[str, Any] = {}
+_history_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _write_job_state(job_id: str, **fields: Any) -> bool:
+    return get_job_state().update(job_id, **fields)
+
+
+def stage_history(engine: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Any]:
+    """Median ASR RTF and LLM sec/1k chars from recent jobs (cached for 10 minutes)."""
+    key = f"{engine}:{model}"
+    now = time.monotonic()
+    with _history_lock:
+        hit = _history.get(key)
+        if hit and now - hit[0] < _HISTORY_TTL_SEC:
+            return hit[1]
+    stats = get_stage_timing_history(engine, model) or {}
+    with _history_lock:
+        _history[key] = (now, stats)
+    return stats
+
+
+class ProgressReporter:
+    """Per-job progress/ETA state; safe to call from parallel LLM threads."""
+
+    def __init__(
+        self,
+        job_id: str,
+        writer: Callable[..., Any] = _write_job_state,
+        min_interval: Optional[float] = None,
+        min_step: Optional[float] = None,
+        story_id: Optional[str] = None,
+    ):
+        self.job_id = job_id
+        self.story_id = story_id
+        self._write = writer
+        self.min_interval = (
+            min_interval if min_interval is not None
+            else _env_float("VIRSA_PROGRESS_MIN_INTERVAL_SEC", 2)
+        )
+        self.min_step = min_step if min_step is not None else _env_float("VIRSA_PROGRESS_MIN_STEP", 0.05)
+        self._lock = threading.Lock()
+        self.stage_name: Optional[str] = None
+        self.progress = 0.0
+        self._written_progress = -1.0
+        self._written_at = 0.0
+        self.writes = 0
+        self.skipped = 0
+        # ETA inputs
+        self._history: Dict[str, Any] = {}
+        self._audio_sec: Optional[float] = None
+        self._asr_started: Optional[float] = None
+        self._chars: Optional[int] = None
+        self._llm_started: Optional[float] = None
+        self._llm_units: Dict[str, float] = {}
+        self._llm_share = 1.0  # share of the LLM work still to run
+
+    # ---- writes ----------------------------------------------------------
+    def _emit(self, stage: Optional[str], eta_sec: Optional[float], force: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if stage is not None and stage != self.stage_name:
+                self.stage_name = stage
+                force = True
+            due = (
+                now - self._written_at >= self.min_interval
+                or self.progress - self._written_progress >= self.min_step
+            )
+            if not force and not due:
+                self.skipped += 1
+                return
+            progress = self.progress
+            self._written_progress = progress
+            self._written_at = now
+            self.writes += 1
+        fields = {
+            "stage": stage,
+            "progress": round(progress, 4),
+            "eta_sec": None if eta_sec is None else round(max(0.0, eta_sec), 1),
+        }
+        self._write(self.job_id, story_id=self.story_id, **fields)
+        publish_status(self.story_id, self.job_id, **fields)
+
+    def stage(self, stage: str, progress: Optional[float] = None) -> None:
+        """Enter a stage (always written)."""
+        with self._lock:
+            if progress is not None:
+                self.progress = max(self.progress, progress)
+        eta = None if stage in ("completed", "failed") else self.eta_sec()
+        self._emit(stage, eta, force=True)
+
+    # ---- transcription ---------------------------------------------------
+    def start_transcription(self, audio_sec: float, engine: str, model: str) -> None:
+        history = stage_history(engine, model)
+        with self._lock:
+            self._history = history
+            self._audio_sec = audio_sec
+            self._asr_started = time.monotonic()
+        self.stage("transcribing", TRANSCRIBE_BAND[0])
+
+    def audio_decoded(self, done_sec: float, total_sec: float) -> None:
+        lo, hi = TRANSCRIBE_BAND
+        frac = min(1.0, done_sec / total_sec) if total_sec else 1.0
+        with self._lock:
+            self.progress = max(self.progress, lo + (hi - lo) * frac)
+        self._emit(None, self.eta_sec(), force=frac >= 1.0)
+
+    # ---- LLM passes ------------------------------------------------------
+    def start_llm(
+        self, units: list, chars: int, stage: str = "writing", of: Optional[int] = None
+    ) -> None:
+        """
+        `units` names the passes still to run, out of `of` in total (default:
+        all of them). Passes restored from checkpoints are left out of `units`
+        and count as done: progress starts that far into the LLM band and the
+        history-based ETA covers only the remaining share.
+        """
+        history = self._history or stage_history()
+        total = max(of or len(units), len(units))
+        share = len(units) / total if total else 0.0
+        lo, hi = LLM_BAND
+        with self._lock:
+            self._history = history
+            self._chars = chars
+            self._llm_started = time.monotonic()
+            self._llm_units = {name: 0.0 for name in units}
+            self._llm_share = share
+        self.stage(stage, lo + (hi - lo) * (1 - share))
+
+    def llm_partial(self, unit: str, done: int, total: int) -> None:
+        """Sub-progress inside one pass (e.g. extraction windows)."""
+        self._set_unit(unit, done / total if total else 1.0, None)
+
+    def llm_done(self, unit: str, stage: Optional[str] = None) -> None:
+        self._set_unit(unit, 1.0, stage)
+
+    def _set_unit(self, unit: str, frac: float, stage: Optional[str]) -> None:
+        lo, hi = LLM_BAND
+        with self._lock:
+            if unit not in self._llm_units:
+                return
+            self._llm_units[unit] = max(self._llm_units[unit], min(1.0, frac))
+            done = sum(self._llm_units.values()) / len(self._llm_units)
+            done = 1 - self._llm_share * (1 - done)
+            self.progress = max(self.progress, lo + (hi - lo) * done)
+        self._emit(stage, self.eta_sec(), force=False)
+
+    # ---- ETA -------------------------------------------------------------
+    def _llm_remaining(self, now: float) -> Optional[float]:
+        # frac: completion of the passes this run actually has to do
+        units = self._llm_units
+        if self._llm_started is not None and not units:
+            return 0.0
+        frac = sum(units.values()) / len(units) if units else 0.0
+        if self._llm_started is not None and frac > 0.05:
+            elapsed = now - self._llm_started
+            return elapsed * (1 - frac) / frac
+        per_kchar = self._history.get("llm_sec_per_kchar")
+        chars = self._chars
+        if chars is None and self._audio_sec:
+            chars = int(self._audio_sec * CHARS_PER_AUDIO_SEC)
+        if not per_kchar or not chars:
+            return None
+        return per_kchar * chars / 1000 * self._llm_share * (1 - frac)
+
+    def eta_sec(self) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            if self._llm_started is not None:
+                return self._llm_remaining(now)
+            if self._asr_started is None or not self._audio_sec:
+                return None
+            lo, hi = TRANSCRIBE_BAND
+            frac = (self.progress - lo) / (hi - lo)
+            elapsed = now - self._asr_started
+            if frac > 0.05:
+                asr_left = elapsed * (1 - frac) / frac
+            elif self._history.get("asr_rtf"):
+                asr_left = max(0.0, self._audio_sec * self._history["asr_rtf"] - elapsed)
+            else:
+                return None
+            llm_left = self._llm_remaining(now)
+            return asr_left + (llm_left or 0.0)
+
+    def timings(self) -> Dict[str, Any]:
+        """Stage timings for model_info, feeding future ETAs."""
+        now = time.monotonic()
+        with self._lock:
+            out: Dict[str, Any] = {}
+            if self._llm_started is not None:
+                out["llm"] = {
+                    "sec": round(now - self._llm_started, 2),
+                    "chars": self._chars,
+                    "passes": len(self._llm_units),
+                }
+            return out
+
+
+_reporters: Dict[str, ProgressReporter] = {}
+_reporters_lock = threading.Lock()
+
+
+def reporter_for(job_id: str, story_id: Optional[str] = None) -> ProgressReporter:
+    with _reporters_lock:
+        reporter = _reporters.get(job_id)
+        if reporter is None:
+            reporter = _reporters[job_id] = ProgressReporter(job_id, story_id=story_id)
+        elif story_id:
+            reporter.story_id = story_id
+        return reporter
+
+
+def release_reporter(job_id: str) -> None:
+    with _reporters_lock:
+        _reporters.pop(job_id, None)
@@ -0,0 +1,220 @@
+"""
+LLM quota pacing and retries shared by every pipeline worker.
+
+Requests-per-minute and tokens-per-minute are token buckets stored in
+Postgres (llm_rate_buckets), so API workers, standalone queue workers and
+bulk imports all draw from the same quota. A take never blocks in the
+database: the bucket may go negative, and the caller sleeps off its share
+of the debt. Under load, calls are spaced out at the quota rate instead of
+all hitting the provider and coming back 429.
+
+Transient provider errors (429, 5xx, timeouts, dropped connections) are
+retried with full-jitter exponential backoff, bounded by a per-call deadline.
+
+Config (env):
+  VIRSA_LLM_RPM               requests per minute per model (default 1000, 0 = unlimited)
+  VIRSA_LLM_TPM               tokens per minute per model (default 1000000, 0 = unlimited)
+  VIRSA_LLM_BURST             bucket size as a fraction of the per-minute limit (default 0.1)
+  VIRSA_LLM_RATE_BACKEND      postgres | local (default postgres; local = this process only)
+  VIRSA_LLM_OUTPUT_TOKENS     output tokens assumed per call before usage is known (default 2048)
+  VIRSA_LLM_MAX_ATTEMPTS      attempts per call (default 5)
+  VIRSA_LLM_DEADLINE_SEC      give up retrying after this long (default 300)
+  VIRSA_LLM_BACKOFF_BASE_SEC  first backoff ceiling (default 1)
+  VIRSA_LLM_BACKOFF_MAX_SEC   largest backoff ceiling (default 60)
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from db.db_operations import take_rate_tokens
+
+T = TypeVar("T")
+
+RETRYABLE_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class RateLimitTimeout(RuntimeError):
+    """The quota wait would run past the call's deadline."""
+
+
+class _LocalBucket:
+    """In-process bucket with the same debt semantics as take_rate_tokens."""
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, amount: float, capacity: float, refill_per_sec: float) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * refill_per_sec)
+            self.tokens -= amount
+            self.updated = now
+            return self.tokens
+
+
+class RateLimiter:
+    """RPM + TPM buckets for one model."""
+
+    def __init__(
+        self,
+        model: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        backend: Optional[str] = None,
+    ):
+        self.model = model
+        self.rpm = rpm if rpm is not None else _env_float("VIRSA_LLM_RPM", 1000)
+        self.tpm = tpm if tpm is not None else _env_float("VIRSA_LLM_TPM", 1_000_000)
+        self.burst = _env_float("VIRSA_LLM_BURST", 0.1)
+        self.backend = (backend or os.getenv("VIRSA_LLM_RATE_BACKEND") or "postgres").lower()
+        self._local: Dict[str, _LocalBucket] = {}
+        self._lock = threading.Lock()
+        self.counters = {"acquired": 0, "waited": 0, "wait_sec": 0.0, "timeouts": 0, "db_fallbacks": 0}
+
+    def _take(self, kind: str, limit: float, amount: float) -> float:
+        """Take `amount` from the bucket; return seconds to wait (0 = go now)."""
+        if limit <= 0 or amount == 0:
+            return 0.0
+        name = f"{self.model}:{kind}"
+        capacity = max(1.0, limit * self.burst)
+        refill = limit / 60.0
+        balance = None
+        if self.backend == "postgres":
+            balance = take_rate_tokens(name, amount, capacity, refill)
+            if balance is None:
+                with self._lock:
+                    self.counters["db_fallbacks"] += 1
+        if balance is None:
+            with self._lock:
+                bucket = self._local.setdefault(name, _LocalBucket(capacity))
+            balance = bucket.take(amount, capacity, refill)
+        return max(0.0, -balance / refill)
+
+    def acquire(self, tokens: float, deadline: Optional[float] = None) -> float:
+        """
+        Reserve one request and `tokens` tokens, sleeping until they are ours.
+
+        `deadline` is a time.monotonic() value; if the wait would overrun it the
+        reservation is returned and RateLimitTimeout is raised.
+        """
+        wait = max(self._take("rpm", self.rpm, 1), self._take("tpm", self.tpm, tokens))
+        if deadline is not None and time.monotonic() + wait > deadline:
+            self._take("rpm", self.rpm, -1)
+            self._take("tpm", self.tpm, -tokens)
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise RateLimitTimeout(
+                f"{self.model}: quota wait {wait:.1f}s exceeds the call deadline"
+            )
+        with self._lock:
+            self.counters["acquired"] += 1
+            if wait > 0:
+                self.counters["waited"] += 1
+                self.counters["wait_sec"] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def settle(self, estimated: float, actual: Optional[float]) -> None:
+        """Correct the TPM bucket once the response reports real usage."""
+        if actual is None:
+            return
+        self._take("tpm", self.tpm, actual - estimated)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "backend": self.backend,
+                **self.counters,
+                "wait_sec": round(self.counters["wait_sec"], 1),
+            }
+
+
+def estimate_tokens(prompt: str, output_tokens: Optional[int] = None) -> int:
+    """Rough pre-call estimate (~4 chars per token) plus the expected reply."""
+    if output_tokens is None:
+        output_tokens = int(_env_float("VIRSA_LLM_OUTPUT_TOKENS", 2048))
+    return len(prompt) // 4 + output_tokens
+
+
+def is_retryable(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+
+        return isinstance(exc, httpx.TransportError)
+    except ImportError:
+        return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retries(
+    fn: Callable[[float], T],
+    label: str = "llm",
+    deadline: Optional[float] = None,
+    max_attempts: Optional[int] = None,
+) -> T:
+    """
+    Run fn(deadline) until it succeeds, a non-retryable error is raised,
+    attempts run out or the next backoff would cross the deadline.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + _env_float("VIRSA_LLM_DEADLINE_SEC", 300)
+    attempts = max_attempts or int(_env_float("VIRSA_LLM_MAX_ATTEMPTS", 5))
+    base = _env_float("VIRSA_LLM_BACKOFF_BASE_SEC", 1)
+    cap = _env_float("VIRSA_LLM_BACKOFF_MAX_SEC", 60)
+    attempt = 0
+    while True:
+        try:
+            return fn(deadline)
+        except Exception as e:
+            attempt += 1
+            if not is_retryable(e) or attempt >= attempts:
+                raise
+            delay = backoff_delay(attempt - 1, base, cap)
+            if time.monotonic() + delay >= deadline:
+                raise
+            print(f"[llm] {label} attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = RateLimiter(model)
+        return limiter
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {"limiters": [l.stats() for l in limiters]}
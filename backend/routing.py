@@ -0,0 +1,113 @@
+"""
+Per-job model routing: which ASR model and LLM model a job runs on, and how
+early a worker picks it up.
+
+  ASR       plan size from VIRSA_ASR_SIZE_BY_PLAN, one size down for long
+            recordings (asr_backends.select_model_size)
+  LLM       plan model from VIRSA_LLM_MODEL_BY_PLAN, else the default model;
+            short transcripts on plans without an override use the cheaper
+            small model, very long ones the large-context model
+  priority  claim order in the job queue — Legacy's "Priority processing"
+
+Every decision is returned with the inputs and the rule that fired; the
+pipeline stores it in processing_jobs.model_info (asr_route, llm_route) as
+soon as it is made and it is counted in virsa_routing_decisions_total, so
+cost can be tuned against latency.
+
+Config (env):
+  VIRSA_LLM_MODEL           default LLM model (default gemini-2.5-flash)
+  VIRSA_LLM_MODEL_BY_PLAN   plan:model list (default "legacy:gemini-2.5-pro")
+  VIRSA_LLM_SMALL_MODEL     model for short transcripts (default gemini-2.5-flash-lite)
+  VIRSA_LLM_SMALL_TOKENS    at or below this many transcript tokens use it (default 2000, 0 = off)
+  VIRSA_LLM_LARGE_MODEL     model for very long transcripts (default gemini-2.5-flash)
+  VIRSA_LLM_LARGE_TOKENS    above this many transcript tokens use it (default 200000, 0 = off)
+  VIRSA_PRIORITY_BY_PLAN    plan:priority list, higher is claimed first (default "legacy:10,family:5")
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from asr_backends import get_backend, select_model_size
+from metrics import ROUTING_DECISIONS
+
+DEFAULT_LLM_MODEL = "gemini-2.5-flash"
+
+
+@dataclass
+class Route:
+    stage: str  # asr | llm
+    model: str
+    rule: str
+    plan: Optional[str] = None
+    duration_sec: Optional[float] = None
+    transcript_tokens: Optional[int] = None
+    engine: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)) or 0)
+    except ValueError:
+        return default
+
+
+def _plan_map(name: str, default: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for part in os.getenv(name, default).split(","):
+        plan, _, value = part.partition(":")
+        if plan.strip() and value.strip():
+            out[plan.strip().lower()] = value.strip()
+    return out
+
+
+def _record(route: Route) -> Route:
+    ROUTING_DECISIONS.inc(stage=route.stage, model=route.model, rule=route.rule)
+    print(f"[routing] {route.stage} → {route.model} ({route.rule}, plan={route.plan})")
+    return route
+
+
+def route_asr(plan: Optional[str], duration_sec: Optional[float]) -> Route:
+    size = select_model_size(plan=plan, duration_sec=duration_sec)
+    stepped_down = size != select_model_size(plan=plan)
+    return _record(Route(
+        stage="asr",
+        model=size,
+        rule="long_audio" if stepped_down else "plan",
+        plan=plan,
+        duration_sec=round(duration_sec, 2) if duration_sec else None,
+        engine=get_backend().name,
+    ))
+
+
+def route_llm(plan: Optional[str], transcript_tokens: int) -> Route:
+    default = os.getenv("VIRSA_LLM_MODEL") or DEFAULT_LLM_MODEL
+    by_plan = _plan_map("VIRSA_LLM_MODEL_BY_PLAN", "legacy:gemini-2.5-pro")
+    large_tokens = _env_int("VIRSA_LLM_LARGE_TOKENS", 200000)
+    small_tokens = _env_int("VIRSA_LLM_SMALL_TOKENS", 2000)
+
+    if large_tokens and transcript_tokens > large_tokens:
+        model = os.getenv("VIRSA_LLM_LARGE_MODEL") or DEFAULT_LLM_MODEL
+        rule = "large_transcript"
+    elif (plan or "").lower() in by_plan:
+        model, rule = by_plan[(plan or "").lower()], "plan"
+    elif small_tokens and transcript_tokens <= small_tokens:
+        model = os.getenv("VIRSA_LLM_SMALL_MODEL") or "gemini-2.5-flash-lite"
+        rule = "small_transcript"
+    else:
+        model, rule = default, "default"
+    return _record(Route(
+        stage="llm", model=model, rule=rule, plan=plan, transcript_tokens=transcript_tokens
+    ))
+
+
+def priority_for(plan: Optional[str]) -> int:
+    raw = _plan_map("VIRSA_PRIORITY_BY_PLAN", "legacy:10,family:5").get((plan or "").lower())
+    try:
+        return int(raw) if raw is not None else 0
+    except ValueError:
+        return 0
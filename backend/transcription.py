@@ -0,0 +1,342 @@
+"""
+Transcription driver for long oral histories.
+
+Recordings longer than VIRSA_ASR_MIN_CHUNKED_SEC are split at quiet points
+near every VIRSA_ASR_CHUNK_SEC, decoded in parallel on a process pool (each
+worker process keeps its own model via model_registry) and stitched back in
+order. The decoder itself comes from asr_backends (VIRSA_ASR_ENGINE).
+Chunks overlap slightly; a segment is kept by the chunk whose "owned"
+span contains its midpoint, so words on a boundary are neither lost nor
+doubled.
+
+Config (env):
+  VIRSA_ASR_PROCS            decode processes (default: half the cores, min 1)
+  VIRSA_ASR_CHUNK_SEC        target chunk length (default 120)
+  VIRSA_ASR_OVERLAP_SEC      audio shared by neighbouring chunks (default 1.0)
+  VIRSA_ASR_MIN_CHUNKED_SEC  shorter audio is decoded in-process (default 240)
+  VIRSA_ASR_VAD              1 = decode only detected speech (see vad.py; default 0)
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from asr_backends import get_backend, model_key
+from audio_cache import open_pcm, prepare_pcm
+from model_registry import get_model_registry
+from vad import detect_speech, pack_speech, speech_report
+
+SAMPLE_RATE = 16000
+
+# progress(decoded_audio_sec, total_audio_sec)
+ProgressFn = Callable[[float, float], None]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() not in ("0", "false", "no", "")
+
+
+def _default_procs() -> int:
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+@dataclass
+class Chunk:
+    index: int
+    start: int        # sample offset of the decoded window (incl. overlap)
+    end: int
+    own_start: float  # seconds; segments whose midpoint falls here belong to this chunk
+    own_end: float
+
+
+def load_audio(path: str) -> np.ndarray:
+    """Decode any ffmpeg-readable file to 16 kHz mono float32."""
+    import whisper
+
+    return whisper.load_audio(path, sr=SAMPLE_RATE)
+
+
+def frame_energy(audio: np.ndarray, frame_ms: int = 30) -> np.ndarray:
+    """RMS energy per non-overlapping frame."""
+    frame = max(1, SAMPLE_RATE * frame_ms // 1000)
+    n = len(audio) // frame
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(audio[: n * frame], dtype=np.float32).reshape(n, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def find_split_points(
+    audio: np.ndarray,
+    target_sec: float,
+    search_sec: float = 10.0,
+    frame_ms: int = 30,
+) -> List[int]:
+    """
+    Sample offsets to cut at: the quietest frame within ±search_sec of each
+    multiple of target_sec (so cuts land in pauses, not mid-word).
+    """
+    total = len(audio)
+    if total <= target_sec * SAMPLE_RATE:
+        return []
+    energy = frame_energy(audio, frame_ms)
+    frame = SAMPLE_RATE * frame_ms // 1000
+    cuts: List[int] = []
+    last = 0
+    t = target_sec
+    while (t + target_sec / 2) * SAMPLE_RATE < total:
+        lo = max(int((t - search_sec) * 1000 / frame_ms), last // frame + 1)
+        hi = min(int((t + search_sec) * 1000 / frame_ms), len(energy))
+        if hi <= lo:
+            cut = int(t * SAMPLE_RATE)
+        else:
+            cut = (lo + int(np.argmin(energy[lo:hi]))) * frame + frame // 2
+        cuts.append(cut)
+        last = cut
+        t = cut / SAMPLE_RATE + target_sec
+    return cuts
+
+
+def plan_chunks(
+    total_samples: int,
+    cuts: List[int],
+    overlap_sec: float,
+) -> List[Chunk]:
+    overlap = int(overlap_sec * SAMPLE_RATE)
+    bounds = [0] + list(cuts) + [total_samples]
+    chunks: List[Chunk] = []
+    for i in range(len(bounds) - 1):
+        a, b = bounds[i], bounds[i + 1]
+        chunks.append(
+            Chunk(
+                index=i,
+                start=max(0, a - overlap),
+                end=min(total_samples, b + overlap),
+                own_start=a / SAMPLE_RATE,
+                own_end=b / SAMPLE_RATE,
+            )
+        )
+    return chunks
+
+
+def _decode(
+    engine: str, model_size: str, audio: np.ndarray, task: str
+) -> List[Dict[str, Any]]:
+    backend = get_backend(engine)
+    with get_model_registry().use(model_key(backend.name, model_size)) as model:
+        return backend.decode(model, audio, task)
+
+
+def _init_worker(threads: int) -> None:
+    # Split the cores between decode processes instead of every process using all of them
+    os.environ["VIRSA_ASR_THREADS"] = str(max(1, threads))  # faster-whisper
+    try:
+        import torch
+
+        torch.set_num_threads(max(1, threads))
+    except Exception:
+        pass
+
+
+def _decode_chunk(
+    engine: str, model_size: str, chunk: Chunk, source: Any, task: str
+) -> Tuple[Chunk, List[Dict[str, Any]]]:
+    """`source` is a cached PCM path (read through a memory map) or the chunk's samples."""
+    if isinstance(source, str):
+        audio = np.array(open_pcm(source)[chunk.start:chunk.end], dtype=np.float32)
+    else:
+        audio = source
+    return chunk, _decode(engine, model_size, audio, task)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Long-lived decode pool; worker processes keep their models between jobs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            procs = int(_env_float("VIRSA_ASR_PROCS", _default_procs()))
+            threads = max(1, (os.cpu_count() or procs) // max(1, procs))
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, procs),
+                # spawn: forking a process that already holds torch threads can deadlock
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def stitch_segments(
+    results: List[Tuple[Chunk, List[Dict[str, Any]]]],
+) -> List[Dict[str, Any]]:
+    """Shift chunk-local timestamps to the recording and drop overlap duplicates."""
+    merged: List[Dict[str, Any]] = []
+    last_index = max((c.index for c, _ in results), default=0)
+    for chunk, segments in sorted(results, key=lambda r: r[0].index):
+        offset = chunk.start / SAMPLE_RATE
+        is_last = chunk.index == last_index
+        for seg in segments:
+            start = seg["start"] + offset
+            end = seg["end"] + offset
+            mid = (start + end) / 2
+            if mid < chunk.own_start:
+                continue
+            if mid >= chunk.own_end and not is_last:
+                continue
+            merged.append({"start": start, "end": end, "text": seg["text"]})
+    return merged
+
+
+def _decode_all(
+    audio: np.ndarray,
+    engine: str,
+    model_size: str,
+    task: str,
+    progress: Optional[ProgressFn],
+    pcm_path: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    total_sec = len(audio) / SAMPLE_RATE
+    chunk_sec = _env_float("VIRSA_ASR_CHUNK_SEC", 120)
+    min_chunked = _env_float("VIRSA_ASR_MIN_CHUNKED_SEC", 240)
+
+    if total_sec < min_chunked:
+        segments = _decode(engine, model_size, np.asarray(audio, dtype=np.float32), task)
+        if progress:
+            progress(total_sec, total_sec)
+        return segments, 1
+
+    cuts = find_split_points(audio, chunk_sec)
+    chunks = plan_chunks(len(audio), cuts, _env_float("VIRSA_ASR_OVERLAP_SEC", 1.0))
+    print(f"[asr] {total_sec:.0f}s audio → {len(chunks)} chunks ({engine}:{model_size})")
+    pool = _get_pool()
+    # With a cached PCM file, workers map the samples themselves instead of
+    # receiving a pickled copy of every chunk
+    futures = [
+        pool.submit(
+            _decode_chunk,
+            engine,
+            model_size,
+            c,
+            pcm_path or np.array(audio[c.start:c.end], dtype=np.float32),
+            task,
+        )
+        for c in chunks
+    ]
+    results = []
+    decoded = 0.0
+    for fut in as_completed(futures):
+        chunk, segs = fut.result()
+        results.append((chunk, segs))
+        decoded += chunk.own_end - chunk.own_start
+        if progress:
+            progress(min(decoded, total_sec), total_sec)
+    return stitch_segments(results), len(chunks)
+
+
+def transcribe_long(
+    audio: np.ndarray,
+    model_size: str = "base",
+    task: str = "translate",
+    progress: Optional[ProgressFn] = None,
+    vad: Optional[bool] = None,
+    engine: Optional[str] = None,
+    pcm_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Transcribe a 16 kHz mono array with the configured (or given) engine.
+
+    Pass `pcm_path` when `audio` is the memory map of that cached PCM file so
+    chunk workers can read it directly.
+
+    Returns {"text", "segments", "duration_sec", "chunks", "vad", "engine",
+    "model"} with segment
+    timestamps relative to the start of `audio` (also when VAD packed the
+    speech together before decoding). "vad" is the speech_report or None.
+    """
+    total_sec = len(audio) / SAMPLE_RATE
+    use_vad = _env_flag("VIRSA_ASR_VAD") if vad is None else vad
+    engine = get_backend(engine).name
+
+    report = None
+    tmap = None
+    decode_audio = audio
+    if use_vad:
+        regions = detect_speech(audio)
+        report = speech_report(len(audio), regions)
+        print(
+            f"[asr] VAD kept {report['speech_sec']:.0f}s of {report['audio_sec']:.0f}s "
+            f"({report['regions']} regions)"
+        )
+        # No speech found usually means a quiet recording, not silence: decode it all
+        if regions and report["removed_sec"] >= 1.0:
+            decode_audio, tmap = pack_speech(audio, regions)
+            pcm_path = None  # packed audio only exists in memory
+
+    segments, chunks_used = _decode_all(
+        decode_audio, engine, model_size, task, progress, pcm_path
+    )
+    if tmap is not None:
+        segments = [
+            {
+                "start": tmap.to_original(s["start"]),
+                "end": tmap.to_original(s["end"]),
+                "text": s["text"],
+            }
+            for s in segments
+        ]
+
+    text = "".join(s["text"] for s in segments).strip()
+    return {
+        "text": text,
+        "segments": segments,
+        "duration_sec": total_sec,
+        "chunks": chunks_used,
+        "vad": report,
+        "engine": engine,
+        "model": model_size,
+    }
+
+
+def transcribe_file(
+    path: str,
+    model_size: str = "base",
+    task: str = "translate",
+    progress: Optional[ProgressFn] = None,
+    vad: Optional[bool] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Transcribe a media file through the decode-once PCM cache."""
+    asset = prepare_pcm(path)
+    result = transcribe_long(
+        open_pcm(asset.path), model_size, task, progress, vad, engine, asset.path
+    )
+    result["checksum"] = asset.checksum
+    return result
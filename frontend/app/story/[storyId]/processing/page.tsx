@@ -24,38 +24,98 @@ type Status = {
   progress?: number;
   error_message?: string;
   job_error?: string;
+  eta_sec?: number | null;
 };
 
+function formatEta(sec: number): string {
+  if (sec < 60) return "less than a minute left";
+  const min = Math.round(sec / 60);
+  return min === 1 ? "about 1 minute left" : `about ${min} minutes left`;
+}
+
 export default function ProcessingPage() {
   const { storyId } = useParams<{ storyId: string }>();
   const router = useRouter();
   const { apiRoot } = useAuth();
   const [status, setStatus] = useState<Status | null>(null);
+  const [retrying, setRetrying] = useState(false);
+  // Bumped on retry so the status stream is reopened for the re-queued job
+  const [attempt, setAttempt] = useState(0);
+
+  const retry = async () => {
+    setRetrying(true);
+    try {
+      const res = await fetch(`${apiRoot}/story/${storyId}/retry`, {
+        method: "POST",
+      });
+      if (res.ok) {
+        // Resumes from the last checkpoint; reopen the status stream
+        setStatus({ status: "processing", stage: "queued", progress: 0 });
+        setAttempt((n) => n + 1);
+      } else {
+        router.push("/record");
+      }
+    } catch {
+      router.push("/record");
+    } finally {
+      setRetrying(false);
+    }
+  };
 
   useEffect(() => {
     if (!storyId) return;
     let cancelled = false;
+    let pollId: number | undefined;
+    let source: EventSource | null = null;
+
+    const apply = (data: Partial<Status>) => {
+      if (cancelled) return;
+      setStatus((prev) => ({ ...(prev || { status: "processing" }), ...data }));
+      if (data.status === "ready") {
+        router.replace(`/story/${storyId}`);
+      }
+    };
+
     const tick = async () => {
       try {
         const res = await fetch(`${apiRoot}/story/${storyId}/status`);
         if (!res.ok) return;
-        const data = (await res.json()) as Status;
-        if (cancelled) return;
-        setStatus(data);
-        if (data.status === "ready") {
-          router.replace(`/story/${storyId}`);
-        }
+        apply((await res.json()) as Status);
       } catch {
         /* keep polling */
       }
     };
-    void tick();
-    const id = window.setInterval(tick, 2000);
+
+    const startPolling = () => {
+      if (pollId !== undefined || cancelled) return;
+      void tick();
+      pollId = window.setInterval(tick, 2000);
+    };
+
+    // Pushed updates; fall back to polling if the stream can't be used
+    if (typeof EventSource !== "undefined") {
+      source = new EventSource(`${apiRoot}/story/${storyId}/events`);
+      source.addEventListener("status", (e) => {
+        const data = JSON.parse((e as MessageEvent).data) as Status;
+        apply(data);
+        if (data.status === "ready" || data.status === "failed") {
+          source?.close();
+        }
+      });
+      source.onerror = () => {
+        source?.close();
+        startPolling();
+      };
+    } else {
+      startPolling();
+    }
+
     return () => {
       cancelled = true;
-      window.clearInterval(id);
+      source?.close();
+      if (pollId !== undefined) window.clearInterval(pollId);
     };
-  }, [storyId, router, apiRoot]);
+  }, [storyId, router, apiRoot, attempt]);
 
   const failed = status?.status === "failed";
   const progress = Math.round((status?.progress || 0) * 100);
@@ -100,18 +160,31 @@ export default function ProcessingPage() {
               <p className="text-sm font-medium text-brass-deep">
                 {STAGE_LABELS[stage] || stage}
               </p>
-              <p className="text-xs text-ink-soft mt-2">{progress}%</p>
+              <p className="text-xs text-ink-soft mt-2">
+                {progress}%
+                {status?.eta_sec != null && ` · ${formatEta(status.eta_sec)}`}
+              </p>
             </>
           )}
 
           {failed && (
-            <button
-              type="button"
-              onClick={() => router.push("/record")}
-              className="btn-primary mt-4"
-            >
-              Try again
-            </button>
+            <div className="flex items-center justify-center gap-3 mt-4">
+              <button
+                type="button"
+                onClick={() => void retry()}
+                disabled={retrying}
+                className="btn-primary"
+              >
+                {retrying ? "Retrying…" : "Try again"}
+              </button>
+              <button
+                type="button"
+                onClick={() => router.push("/record")}
+                className="text-sm text-ink-soft underline"
+              >
+                New recording
+              </button>
+            </div>
           )}
         </motion.div>
       </div>